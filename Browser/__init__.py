@@ -1,6 +1,24 @@
 from ._api_types import Error, TimeoutError, NoSuchOptionError
 from .data_types import SupportedBrowsers
 from .playwrightmanager import PlaywrightManager
+from ._api import ApiClient, ApiResult
+from ._bulk import BulkExecutor, read_rows
+from ._capture import GzipJsonlSink, JsonlSink, NetworkCapture, RingBufferSink
+from ._cdp import CdpFastPath
+from ._deadline import Deadline
+from ._density import DENSITY, LaunchProfile
+from ._downloads import DownloadManager, DownloadRecord
+from ._fanout import EngineResult, FanOut, FanOutReport
+from ._plan import Plan, PlanPlayer, PlanRecorder
+from ._prefetch import PrefetchPool
+from ._profiles import ProfileDirectory
+from ._profiling import StepProfiler
+from ._readiness import NavigationTiming
+from ._recovery import CrashRecovery
+from ._selectors import SelectorProfiler
+from ._snapshots import CapturePipeline, CaptureResult
+from ._timeouts import AdaptiveTimeouts
+from ._watchdog import MemoryWatchdog
 
 __all__ = [
     PlaywrightManager,
@@ -8,4 +26,34 @@ __all__ = [
     Error,
     TimeoutError,
     NoSuchOptionError,
+    AdaptiveTimeouts,
+    Deadline,
+    NetworkCapture,
+    JsonlSink,
+    GzipJsonlSink,
+    RingBufferSink,
+    DownloadManager,
+    DownloadRecord,
+    CapturePipeline,
+    CaptureResult,
+    MemoryWatchdog,
+    CrashRecovery,
+    ProfileDirectory,
+    CdpFastPath,
+    StepProfiler,
+    Plan,
+    PlanRecorder,
+    PlanPlayer,
+    BulkExecutor,
+    read_rows,
+    ApiClient,
+    ApiResult,
+    NavigationTiming,
+    FanOut,
+    FanOutReport,
+    EngineResult,
+    SelectorProfiler,
+    PrefetchPool,
+    LaunchProfile,
+    DENSITY,
 ]
@@ -0,0 +1,169 @@
+import json
+import time
+import urllib.parse
+from typing import Any, Dict, List, Optional
+
+from ._api_types import Error
+from ._concurrency import gather
+
+
+class ApiResult:
+    def __init__(self, method: str, url: str, status: int, status_text: str, headers: Dict[str, str],
+                 body: bytes, elapsed: float):
+        """一次 API 请求的结果。响应体已经读取，底层的 APIResponse 已经释放。
+
+        :param elapsed: 请求耗时（以毫秒为单位）。
+        """
+        self.method = method
+        self.url = url
+        self.status = status
+        self.status_text = status_text
+        self.headers = headers
+        self.body = body
+        self.elapsed = elapsed
+
+    @property
+    def ok(self) -> bool:
+        return 200 <= self.status <= 299
+
+    def text(self) -> str:
+        return self.body.decode("utf-8")
+
+    def json(self) -> Any:
+        return json.loads(self.body)
+
+    def __repr__(self):
+        return f"ApiResult({self.method} {self.url}, status={self.status})"
+
+
+class ApiClient:
+    def __init__(
+            self,
+            context,
+            *,
+            base_url: str = None,
+            headers: Dict[str, str] = None,
+            max_concurrent: int = 8,
+            timeout: float = None,
+            fail_on_status_code: bool = False,
+    ):
+        """与浏览器上下文共享 cookie 的 HTTP 客户端，基于上下文的 APIRequestContext（`context.request`）。
+
+        请求使用上下文的 cookie、extra_http_headers、http_credentials 和 base_url，
+        响应中的 Set-Cookie 也会写回上下文，因此可以用它完成登录后的数据准备和清理，而不需要渲染页面。
+
+        :param context: 要共享会话的 BrowserContext。
+        :param base_url: 相对 URL 的基础地址。默认使用上下文的 base_url。
+        :param headers: 每个请求附加的请求头。
+        :param max_concurrent: `batch` 中同时进行的请求数量上限。
+        :param timeout: 每个请求的超时时间（以毫秒为单位）。默认使用 Playwright 的默认值。
+        :param fail_on_status_code: 响应状态码不是 2xx 或 3xx 时是否抛出异常。
+        """
+        self._request = context.request
+        self.base_url = base_url
+        self.headers = headers or {}
+        self.max_concurrent = max_concurrent
+        self.timeout = timeout
+        self.fail_on_status_code = fail_on_status_code
+
+    def fetch(
+            self,
+            url: str,
+            *,
+            method: str = "GET",
+            params: Dict[str, Any] = None,
+            headers: Dict[str, str] = None,
+            data: Any = None,
+            form: Dict[str, Any] = None,
+            multipart: Dict[str, Any] = None,
+            timeout: float = None,
+            fail_on_status_code: bool = None,
+    ) -> ApiResult:
+        """发送请求并读取完整的响应。
+
+        :param url: 请求 URL，可以是相对于 `base_url` 的路径。
+        :param method: 请求方法。
+        :param params: 查询参数。
+        :param headers: 本次请求附加的请求头。
+        :param data: 请求体。字典和列表会序列化为 JSON 并设置 Content-Type。
+        :param form: 以 application/x-www-form-urlencoded 发送的表单。
+        :param multipart: 以 multipart/form-data 发送的表单，值可以是文件 {name, mimeType, buffer}。
+        :param timeout: 超时时间（以毫秒为单位）。
+        :param fail_on_status_code: 状态码不是 2xx 或 3xx 时是否抛出异常。
+        """
+        started = time.perf_counter()
+        response = self._request.fetch(
+            self._url(url),
+            method=method,
+            params=params,
+            headers={**self.headers, **(headers or {})} or None,
+            data=data,
+            form=form,
+            multipart=multipart,
+            timeout=timeout if timeout is not None else self.timeout,
+            fail_on_status_code=fail_on_status_code if fail_on_status_code is not None else self.fail_on_status_code,
+        )
+        try:
+            body = response.body()
+            return ApiResult(method, response.url, response.status, response.status_text, response.headers, body,
+                             (time.perf_counter() - started) * 1000)
+        finally:
+            response.dispose()
+
+    def get(self, url: str, **options) -> ApiResult:
+        return self.fetch(url, method="GET", **options)
+
+    def post(self, url: str, **options) -> ApiResult:
+        return self.fetch(url, method="POST", **options)
+
+    def put(self, url: str, **options) -> ApiResult:
+        return self.fetch(url, method="PUT", **options)
+
+    def patch(self, url: str, **options) -> ApiResult:
+        return self.fetch(url, method="PATCH", **options)
+
+    def delete(self, url: str, **options) -> ApiResult:
+        return self.fetch(url, method="DELETE", **options)
+
+    def batch(self, requests: List[Dict[str, Any]], *, return_exceptions: bool = False) -> List[Any]:
+        """并发发送多个请求，按顺序返回结果。同时进行的请求不超过 `max_concurrent` 个。
+
+        ```py
+        results = pm.api_client().batch([
+            {"method": "POST", "url": "/api/users", "data": {"name": "a"}},
+            {"method": "POST", "url": "/api/users", "data": {"name": "b"}},
+            {"url": "/api/users"},
+        ])
+        ```
+
+        :param requests: 每个元素是 `fetch` 的参数，必须包含 url。
+        :param return_exceptions: 是否将失败请求的异常放在结果中返回。默认在所有请求结束后抛出第一个异常。
+        """
+        results: List[Any] = [None] * len(requests)
+        errors: List[Optional[Exception]] = [None] * len(requests)
+        pending = iter(range(len(requests)))
+
+        def work():
+            for index in pending:
+                options = dict(requests[index])
+                try:
+                    results[index] = self.fetch(options.pop("url"), **options)
+                except Error as e:
+                    errors[index] = e
+                    results[index] = e
+
+        workers = min(self.max_concurrent, len(requests))
+        gather(self._request, [work for _ in range(workers)])
+        if not return_exceptions:
+            for error in errors:
+                if error is not None:
+                    raise error
+        return results
+
+    def _url(self, url: str) -> str:
+        if self.base_url is None:
+            return url
+        return urllib.parse.urljoin(self.base_url, url)
+
+    def __repr__(self):
+        return f"ApiClient(base_url={self.base_url!r}, max_concurrent={self.max_concurrent})"
@@ -1,9 +1,9 @@
 import sys
 
 if sys.version_info >= (3, 8):  # pragma: no cover
-    from typing import Literal, TypedDict, Optional, List
+    from typing import Any, Literal, TypedDict, Optional, List
 else:  # pragma: no cover
-    from typing import Optional, List
+    from typing import Any, Optional, List
     from typing_extensions import Literal, TypedDict
 
 
@@ -34,6 +34,13 @@ class OriginState(TypedDict):
     localStorage: List[LocalStorageEntry]
 
 
+class FloatRect(TypedDict):
+    x: float
+    y: float
+    width: float
+    height: float
+
+
 class Position(TypedDict):
     x: float
     y: float
@@ -54,3 +61,19 @@ class ViewportSize(TypedDict):
 class StorageState(TypedDict, total=False):
     cookies: Optional[List[Cookie]]
     origins: Optional[List[OriginState]]
+
+
+class AttributeChange(TypedDict):
+    target: Optional[str]
+    name: str
+
+
+class ChangeBatch(TypedDict):
+    generation: int
+    url: Optional[str]
+    frame: Any
+    added: int
+    removed: int
+    text: int
+    attributes: List[AttributeChange]
+    selectors: List[str]
@@ -0,0 +1,302 @@
+import collections
+import csv
+import json
+import logging
+import os
+import time
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+from ._api_types import Error
+from ._concurrency import gather
+from ._interaction import Interaction
+
+CHECKPOINT_VERSION = 1
+
+
+def read_rows(path: str, format: str = None) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """逐行读取 CSV 或 JSONL 文件，返回 (行号, 行) 的迭代器，不会一次性读入整个文件。行号从 0 开始，不包括 CSV 的表头。
+
+    :param path: 文件路径。
+    :param format: csv 或 jsonl。默认根据扩展名判断。
+    """
+    if format is None:
+        format = "jsonl" if path.endswith((".jsonl", ".ndjson", ".json")) else "csv"
+    with open(path, encoding="utf-8", newline="") as file:
+        if format == "csv":
+            for index, row in enumerate(csv.DictReader(file)):
+                yield index, row
+        elif format == "jsonl":
+            index = 0
+            for line in file:
+                if line.strip():
+                    yield index, json.loads(line)
+                    index += 1
+        else:
+            raise ValueError(f"format 应当是 csv 或 jsonl，而不是 {format}。")
+
+
+class BulkExecutor:
+    def __init__(
+            self,
+            manager,
+            task: Callable[[Interaction, Dict[str, Any]], Any],
+            *,
+            workers: int = 4,
+            isolation: str = "page",
+            max_retries: int = 2,
+            checkpoint_path: str = None,
+            checkpoint_every: int = 100,
+            progress_every: float = 10,
+            on_progress: Callable[[Dict[str, Any]], None] = None,
+    ):
+        """对大量输入行执行同一个 UI 流程。
+
+        输入按行流式读取，分发给 `workers` 个页面并发执行（同一线程中的 greenlet，见 `gather`），
+        每行的结果立即追加写入结果文件。失败的行进入重试队列，重试 `max_retries` 次后记为失败。
+        工作页面崩溃或被关闭时，在同一上下文中打开新的页面代替它；无法打开时该工作页面退出，其余的行由其他工作页面处理。
+        进度定期保存到检查点文件，中断后以相同的参数重新运行会跳过已完成的行。
+        检查点之后、中断之前完成的行在恢复后会再执行一次，结果文件中可能出现重复的行号。
+
+        :param manager: PlaywrightManager 实例，需要已经打开浏览器和上下文。
+        :param task: 处理一行的函数 `task(interaction, row)`，返回值需要可以序列化为 JSON。
+            interaction 绑定到工作页面，不经过管理器的中间件。
+        :param workers: 并发的页面数量。
+        :param isolation: page 表示在当前上下文中打开工作页面（共享 cookie），context 表示每个工作页面使用独立的上下文。
+        :param max_retries: 每行失败后最多重试的次数。
+        :param checkpoint_path: 检查点文件路径。默认不保存检查点。
+        :param checkpoint_every: 每完成多少行保存一次检查点。
+        :param progress_every: 每隔多少秒报告一次进度。
+        :param on_progress: 报告进度时调用，参数为 `stats()` 的返回值。默认写入日志。
+        """
+        if isolation not in ("page", "context"):
+            raise ValueError(f"isolation 应当是 page 或 context，而不是 {isolation}。")
+        self._manager = manager
+        self.task = task
+        self.workers = workers
+        self.isolation = isolation
+        self.max_retries = max_retries
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_every = checkpoint_every
+        self.progress_every = progress_every
+        self.on_progress = on_progress
+
+        self.succeeded = 0
+        self.failed = 0
+        self.retried = 0
+        self.skipped = 0  # 根据检查点跳过的行
+        self.replaced_pages = 0  # 因崩溃或关闭而替换的工作页面数
+        self._done_this_run = 0  # 本次运行完成的行数，不包括从检查点恢复的计数
+        self._retry_queue = collections.deque()  # (行号, 行, 已尝试次数)
+        self._rows: Optional[Iterator] = None
+        self._next_index = 0  # 输入中下一个未读取的行号
+        self._unfinished = set()  # 已读取但尚未完成的行号
+        self._finished_above = set()  # 已完成且不小于检查点水位的行号
+        self._since_checkpoint = 0
+        self._started: Optional[float] = None
+        self._last_progress = 0.0
+        self._results = None
+        self._source: Optional[str] = None
+        self._pages = []  # 所有打开过的工作页面，包括替换的页面
+
+    def stats(self) -> Dict[str, Any]:
+        """返回当前的吞吐量、失败率和重试队列长度。
+
+        succeeded、failed 和 failure_rate 包括从检查点恢复的计数，rows_per_second 只按本次运行完成的行计算。
+        """
+        elapsed = time.monotonic() - self._started if self._started is not None else 0.0
+        done = self.succeeded + self.failed
+        return {
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "retried": self.retried,
+            "skipped": self.skipped,
+            "in_progress": len(self._unfinished) - len(self._retry_queue),
+            "retry_queue": len(self._retry_queue),
+            "elapsed": elapsed,
+            "rows_per_second": self._done_this_run / elapsed if elapsed > 0 else 0.0,
+            "failure_rate": self.failed / done if done else 0.0,
+        }
+
+    def run(self, source: str, results_path: str, *, format: str = None) -> Dict[str, Any]:
+        """处理 `source` 中的所有行，结果逐行写入 `results_path`（JSONL），返回最终的统计信息。
+
+        :param source: CSV 或 JSONL 输入文件。
+        :param results_path: 结果文件。从检查点恢复时追加写入。
+        :param format: csv 或 jsonl。默认根据扩展名判断。
+        """
+        checkpoint = self._load_checkpoint(source)
+        watermark = checkpoint.get("watermark", 0)
+        done_above = set(checkpoint.get("done_above", []))
+        self._finished_above = set(done_above)
+        self._source = os.path.abspath(source)
+        self._rows = self._pending_rows(source, format, watermark, done_above)
+        self._next_index = watermark
+        self._started = time.monotonic()
+        self._results = open(results_path, "a" if checkpoint else "w", encoding="utf-8")
+        pages, contexts = self._open_pages()
+        self._pages = list(pages)
+        try:
+            gather(pages[0], [lambda page=page: self._work(page) for page in pages])
+        finally:
+            self._save_checkpoint()
+            self._results.close()
+            for page in self._pages:
+                try:
+                    page.close()
+                except Error:  # 页面已经崩溃
+                    ...
+            for context in contexts:
+                context.close()
+        if self._unfinished:
+            logging.getLogger(__name__).warning(
+                f"所有工作页面都已退出，还有 {len(self._unfinished)} 行未完成，可以从检查点恢复。")
+        stats = self.stats()
+        self._report(stats)
+        return stats
+
+    def _pending_rows(self, source: str, format: Optional[str], watermark: int, done_above: set):
+        """跳过检查点中已完成的行。"""
+        for index, row in read_rows(source, format):
+            if index < watermark or index in done_above:
+                self.skipped += 1
+                continue
+            yield index, row
+
+    def _open_pages(self):
+        manager = self._manager
+        if self.isolation == "context":
+            if manager._browser is None:
+                raise Error("isolation=context 需要通过 new_browser 打开浏览器。")
+            contexts = [manager._browser.new_context(**(manager._context_options or {})) for _ in range(self.workers)]
+            pages = [context.new_page() for context in contexts]
+        else:
+            context = manager._context if manager._context is not None else manager._page.context
+            contexts = []
+            pages = [context.new_page() for _ in range(self.workers)]
+        for page in pages:
+            page.set_default_timeout(manager.default_timeout)
+            page.set_default_navigation_timeout(manager.default_navigation_timeout)
+        return pages, contexts
+
+    def _next(self) -> Optional[Tuple[int, Dict[str, Any], int]]:
+        if self._retry_queue:
+            return self._retry_queue.popleft()
+        for index, row in self._rows:
+            self._next_index = index + 1
+            self._unfinished.add(index)
+            return index, row, 0
+        return None
+
+    def _replace_page(self, page):
+        """在同一上下文中打开新的页面代替崩溃或被关闭的工作页面。无法打开时返回 None。"""
+        try:
+            if not page.is_closed():
+                page.close()
+        except Error:
+            ...
+        try:
+            replacement = page.context.new_page()
+        except Error as e:  # 上下文或浏览器已经关闭
+            logging.getLogger(__name__).warning(f"无法替换崩溃的工作页面，该工作页面退出：{e}")
+            return None
+        replacement.set_default_timeout(self._manager.default_timeout)
+        replacement.set_default_navigation_timeout(self._manager.default_navigation_timeout)
+        self._pages.append(replacement)
+        self.replaced_pages += 1
+        return replacement
+
+    def _work(self, page):
+        crashed = []
+        page.once("crash", crashed.append)
+        interaction = Interaction(page, default_timeout=self._manager.default_timeout)
+        while True:
+            if crashed or page.is_closed():
+                # 不替换的话，这个工作页面会立即让之后的每一行都失败
+                page = self._replace_page(page)
+                if page is None:
+                    return
+                crashed.clear()
+                page.once("crash", crashed.append)
+                interaction = Interaction(page, default_timeout=self._manager.default_timeout)
+            item = self._next()
+            if item is None:
+                # 其他工作页面的行失败后可能重新进入重试队列
+                if not self._unfinished:
+                    return
+                page.wait_for_timeout(50)
+                continue
+            index, row, attempts = item
+            started = time.perf_counter()
+            try:
+                result = self.task(interaction, row)
+            except Exception as e:
+                if attempts < self.max_retries:
+                    self.retried += 1
+                    self._retry_queue.append((index, row, attempts + 1))
+                else:
+                    self.failed += 1
+                    self._finish(index, {"row": index, "status": "failed", "error": f"{type(e).__name__}: {e}",
+                                         "attempts": attempts + 1, "elapsed": (time.perf_counter() - started) * 1000})
+                continue
+            self.succeeded += 1
+            self._finish(index, {"row": index, "status": "succeeded", "result": result,
+                                 "attempts": attempts + 1, "elapsed": (time.perf_counter() - started) * 1000})
+
+    def _finish(self, index: int, record: Dict[str, Any]):
+        self._results.write(json.dumps(record, ensure_ascii=False, default=str))
+        self._results.write("\n")
+        self._unfinished.discard(index)
+        self._finished_above.add(index)
+        self._done_this_run += 1
+        self._since_checkpoint += 1
+        if self.checkpoint_path is not None and self._since_checkpoint >= self.checkpoint_every:
+            self._save_checkpoint()
+        now = time.monotonic()
+        if now - self._last_progress >= self.progress_every:
+            self._last_progress = now
+            self._report(self.stats())
+
+    def _report(self, stats: Dict[str, Any]):
+        if self.on_progress is not None:
+            self.on_progress(stats)
+        else:
+            logging.getLogger(__name__).info(
+                f"成功 {stats['succeeded']} 行，失败 {stats['failed']} 行，重试队列 {stats['retry_queue']} 行，"
+                f"{stats['rows_per_second']:.1f} 行/秒，失败率 {stats['failure_rate']:.1%}"
+            )
+
+    def _load_checkpoint(self, source: str) -> Dict[str, Any]:
+        if self.checkpoint_path is None or not os.path.exists(self.checkpoint_path):
+            return {}
+        with open(self.checkpoint_path, encoding="utf-8") as file:
+            checkpoint = json.load(file)
+        if checkpoint.get("version") != CHECKPOINT_VERSION or checkpoint.get("source") != os.path.abspath(source):
+            raise Error(f"检查点 {self.checkpoint_path} 不属于输入文件 {source}，请删除后重新运行。")
+        counts = checkpoint.get("stats", {})
+        self.succeeded = counts.get("succeeded", 0)
+        self.failed = counts.get("failed", 0)
+        self.retried = counts.get("retried", 0)
+        return checkpoint
+
+    def _save_checkpoint(self):
+        """保存检查点：水位以下的行都已完成，水位以上已完成的行记录在 done_above 中。"""
+        if self.checkpoint_path is None:
+            return
+        self._since_checkpoint = 0
+        self._results.flush()  # 先让结果落盘，检查点不能领先于结果文件
+        watermark = min(self._unfinished) if self._unfinished else self._next_index
+        self._finished_above = {index for index in self._finished_above if index >= watermark}
+        checkpoint = {
+            "version": CHECKPOINT_VERSION,
+            "source": self._source,
+            "watermark": watermark,
+            "done_above": sorted(self._finished_above),
+            "stats": {"succeeded": self.succeeded, "failed": self.failed, "retried": self.retried},
+        }
+        temporary = f"{self.checkpoint_path}.tmp"
+        with open(temporary, "w", encoding="utf-8") as file:
+            json.dump(checkpoint, file)
+        os.replace(temporary, self.checkpoint_path)
+
+    def __repr__(self):
+        return f"BulkExecutor(succeeded={self.succeeded}, failed={self.failed}, retry_queue={len(self._retry_queue)})"
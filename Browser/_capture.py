@@ -0,0 +1,270 @@
+import base64
+import collections
+import fnmatch
+import gzip
+import json
+import queue
+import re
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Pattern, Union
+
+from ._api_types import Error
+
+UrlFilter = Union[str, Pattern, Callable[[str], bool]]
+
+_STOP = object()  # 通知写入线程退出
+
+
+class JsonlSink:
+    def __init__(self, path: str):
+        """将每条记录作为一行 JSON 写入文件。
+
+        :param path: 文件路径。已有的文件会被覆盖。
+        """
+        self.path = path
+        self._file = open(path, "w", encoding="utf-8")
+
+    def write(self, record: Dict):
+        self._file.write(json.dumps(record, ensure_ascii=False))
+        self._file.write("\n")
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class GzipJsonlSink(JsonlSink):
+    def __init__(self, path: str, compresslevel: int = 6):
+        """与 JsonlSink 相同，但以 gzip 压缩写入。
+
+        :param path: 文件路径，通常以 .jsonl.gz 结尾。
+        :param compresslevel: 压缩级别，1 最快，9 压缩率最高。
+        """
+        self.path = path
+        self._file = gzip.open(path, "wt", encoding="utf-8", compresslevel=compresslevel)
+
+
+class RingBufferSink:
+    def __init__(self, capacity: int = 1000):
+        """在内存中只保留最近的 `capacity` 条记录。
+
+        :param capacity: 最多保留的记录数量。
+        """
+        self._records = collections.deque(maxlen=capacity)
+        self._lock = threading.Lock()
+
+    @property
+    def records(self) -> List[Dict]:
+        with self._lock:
+            return list(self._records)
+
+    def write(self, record: Dict):
+        with self._lock:
+            self._records.append(record)
+
+    def flush(self):
+        ...
+
+    def close(self):
+        ...
+
+
+class NetworkCapture:
+    def __init__(
+            self,
+            context,
+            sink,
+            *,
+            url: UrlFilter = None,
+            content_types: List[str] = None,
+            resource_types: List[str] = None,
+            include_requests: bool = False,
+            include_bodies: bool = False,
+            max_body_size: int = 1024 * 1024,
+            queue_size: int = 1000,
+            overflow: str = "drop",
+    ):
+        """将上下文中匹配的请求和响应以流的方式写入 `sink`，内存占用有上限。
+
+        事件处理函数只负责生成记录并放入有界队列，由后台线程写入 `sink`，不会阻塞页面。
+        队列已满时按 `overflow` 处理：`drop` 丢弃新记录并计数，`block` 阻塞自动化流程直到写入线程跟上。
+
+        :param context: 要捕获的 BrowserContext。
+        :param sink: JsonlSink、GzipJsonlSink、RingBufferSink，或任何实现了 write(record) 和 close() 的对象。
+        :param url: URL 过滤条件：glob 模式、正则表达式或接收 URL 的函数。默认为所有 URL。
+        :param content_types: 只捕获 Content-Type 以其中任意一项开头的响应，例如 ["application/json"]。
+        :param resource_types: 只捕获这些资源类型，例如 ["xhr", "fetch"]。
+        :param include_requests: 是否同时记录请求（包括请求体）。默认只记录响应。
+        :param include_bodies: 是否记录响应体。
+        :param max_body_size: 响应体的最大字节数，超过时只记录大小。
+        :param queue_size: 等待写入的记录数上限。
+        :param overflow: 队列已满时的处理方式，`drop` 或 `block`。
+        """
+        if overflow not in ("drop", "block"):
+            raise ValueError(f"overflow 应当是 drop 或 block，而不是 {overflow}。")
+        self._context = context
+        self.sink = sink
+        self._url_filter = _compile_url_filter(url)
+        self._content_types = [content_type.lower() for content_type in content_types or []]
+        self._resource_types = set(resource_types or [])
+        self._include_requests = include_requests
+        self._include_bodies = include_bodies
+        self._max_body_size = max_body_size
+        self._overflow = overflow
+
+        self.captured = 0  # 已放入队列的记录数
+        self.dropped = 0  # 因队列已满丢弃的记录数
+        self.bodies_skipped = 0  # 因超过大小或无法读取而未记录的响应体数
+        self._queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self._writer: Optional[threading.Thread] = None
+        self._write_error: Optional[BaseException] = None
+
+    @property
+    def running(self) -> bool:
+        return self._writer is not None
+
+    def start(self) -> "NetworkCapture":
+        """开始捕获。"""
+        if self._writer is not None:
+            return self
+        self._writer = threading.Thread(target=self._write_loop, name="network-capture", daemon=True)
+        self._writer.start()
+        self._context.on("response", self._on_response)
+        if self._include_requests:
+            self._context.on("request", self._on_request)
+        return self
+
+    def stop(self):
+        """停止捕获，等待队列中的记录写完并关闭 `sink`。"""
+        if self._writer is None:
+            return
+        self._context.remove_listener("response", self._on_response)
+        if self._include_requests:
+            self._context.remove_listener("request", self._on_request)
+        self._queue.put(_STOP)
+        self._writer.join()
+        self._writer = None
+        self.sink.close()
+        if self._write_error is not None:
+            raise Error(f"写入网络捕获记录失败：{self._write_error}")
+
+    def rebind(self, context):
+        """将捕获转移到新的上下文，例如回收或恢复上下文之后。"""
+        if self._writer is not None:
+            self._context.remove_listener("response", self._on_response)
+            if self._include_requests:
+                self._context.remove_listener("request", self._on_request)
+            context.on("response", self._on_response)
+            if self._include_requests:
+                context.on("request", self._on_request)
+        self._context = context
+
+    def __enter__(self) -> "NetworkCapture":
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def _matches(self, request) -> bool:
+        if self._resource_types and request.resource_type not in self._resource_types:
+            return False
+        return self._url_filter is None or self._url_filter(request.url)
+
+    def _on_request(self, request):
+        if not self._matches(request):
+            return
+        self._enqueue({
+            "type": "request",
+            "time": time.time(),
+            "url": request.url,
+            "method": request.method,
+            "resource_type": request.resource_type,
+            "headers": request.headers,
+            "post_data": request.post_data,
+        })
+
+    def _on_response(self, response):
+        request = response.request
+        if not self._matches(request):
+            return
+        headers = response.headers
+        content_type = headers.get("content-type", "")
+        if self._content_types and not content_type.lower().startswith(tuple(self._content_types)):
+            return
+        record = {
+            "type": "response",
+            "time": time.time(),
+            "url": response.url,
+            "method": request.method,
+            "resource_type": request.resource_type,
+            "status": response.status,
+            "headers": headers,
+            "content_type": content_type,
+        }
+        if self._include_bodies:
+            self._attach_body(record, response, headers)
+        self._enqueue(record)
+
+    def _attach_body(self, record: Dict, response, headers: Dict[str, str]):
+        # 先根据 Content-Length 判断，避免把过大的响应体从浏览器传输过来
+        declared_size = headers.get("content-length")
+        if declared_size and declared_size.isdigit() and int(declared_size) > self._max_body_size:
+            record["body_size"] = int(declared_size)
+            self.bodies_skipped += 1
+            return
+        try:
+            body = response.body()
+        except Error:  # 重定向响应或页面已关闭时无法读取响应体
+            self.bodies_skipped += 1
+            return
+        record["body_size"] = len(body)
+        if len(body) > self._max_body_size:
+            self.bodies_skipped += 1
+            return
+        try:
+            record["body"] = body.decode("utf-8")
+            record["body_encoding"] = "utf-8"
+        except UnicodeDecodeError:
+            record["body"] = base64.b64encode(body).decode("ascii")
+            record["body_encoding"] = "base64"
+
+    def _enqueue(self, record: Dict):
+        if self._overflow == "block":
+            self._queue.put(record)
+        else:
+            try:
+                self._queue.put_nowait(record)
+            except queue.Full:
+                self.dropped += 1
+                return
+        self.captured += 1
+
+    def _write_loop(self):
+        while True:
+            record = self._queue.get()
+            if record is _STOP:
+                break
+            if self._write_error is not None:
+                continue
+            try:
+                self.sink.write(record)
+                if self._queue.empty() and hasattr(self.sink, "flush"):
+                    self.sink.flush()
+            except Exception as e:  # 记录错误，在 stop() 时抛出
+                self._write_error = e
+
+    def __repr__(self):
+        return f"NetworkCapture(captured={self.captured}, dropped={self.dropped})"
+
+
+def _compile_url_filter(url: UrlFilter) -> Optional[Callable[[str], bool]]:
+    if url is None:
+        return None
+    if callable(url):
+        return url
+    if isinstance(url, re.Pattern):
+        return lambda candidate: url.search(candidate) is not None
+    return lambda candidate: fnmatch.fnmatchcase(candidate, url)
@@ -0,0 +1,157 @@
+import json
+from typing import Any, Dict, List, Optional
+
+from ._api_types import Error
+from ._waits import in_page_selector
+
+# CDP 鼠标事件的修饰键位掩码。
+_MODIFIER_BITS = {"Alt": 1, "Control": 2, "Meta": 4, "Shift": 8}
+
+# 不能用 Input.insertText 填充的 input 类型。
+_NON_TEXT_INPUTS = ["button", "checkbox", "color", "file", "hidden", "image", "radio", "range", "reset", "submit"]
+
+# 查找元素、滚动到可见区域并返回中心坐标。找不到元素时返回 null，由调用方回退到常规路径。
+# 需要聚焦时，元素必须是可编辑的 input、textarea 或 contenteditable 元素，并且聚焦后确实成为 activeElement，
+# 否则返回 null，避免把文本插入到之前拥有焦点的其他元素中。
+_LOCATE_EXPRESSION = """
+(() => {
+  const sel = %(selector)s;
+  const el = sel.kind === "xpath"
+    ? document.evaluate(sel.value, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue
+    : document.querySelector(sel.value);
+  if (!el) return null;
+  let rect = el.getBoundingClientRect();
+  if (rect.top < 0 || rect.left < 0 || rect.bottom > innerHeight || rect.right > innerWidth) {
+    el.scrollIntoView({block: "center", inline: "center"});
+    rect = el.getBoundingClientRect();
+  }
+  if (rect.width === 0 || rect.height === 0) return null;
+  if (%(focus)s) {
+    const editable = el.isContentEditable
+      || (el instanceof HTMLTextAreaElement && !el.disabled && !el.readOnly)
+      || (el instanceof HTMLInputElement && !el.disabled && !el.readOnly
+          && !%(non_text_inputs)s.includes(el.type));
+    if (!editable) return null;
+    el.focus();
+    if (document.activeElement !== el) return null;
+    if (typeof el.select === "function") el.select();
+    else document.getSelection().selectAllChildren(el);
+  }
+  return {x: rect.left, y: rect.top, width: rect.width, height: rect.height};
+})()
+"""
+
+
+class CdpFastPath:
+    def __init__(self, page):
+        """Chromium 的 CDP 快速通道，直接通过 CDPSession 发送 Input 和 Runtime 命令。
+
+        跳过 Playwright 的可操作性检查、重试和句柄往返，每个操作只需要一到两次协议往返，
+        只用于调用方已经声明跳过检查（`force=True`）的操作。只能操作页面的主 frame，
+        选择器只支持 CSS 和 XPath；不满足条件或找不到元素时返回 False，由调用方回退到常规路径。
+
+        :param page: Chromium 的 Page，包括通过 connect_over_cdp 连接的页面。
+        """
+        self.page = page
+        self._session = page.context.new_cdp_session(page)
+        self.commands = 0  # 已发送的 CDP 命令数
+
+    @staticmethod
+    def supports(page) -> bool:
+        """页面是否可以使用 CDP 快速通道。"""
+        browser = page.context.browser
+        return browser is not None and browser.browser_type.name == "chromium"
+
+    def send(self, method: str, params: Dict[str, Any] = None) -> Dict[str, Any]:
+        self.commands += 1
+        return self._session.send(method, params)
+
+    def locate(self, selector: str, focus: bool = False) -> Optional[Dict[str, float]]:
+        """返回元素在视口中的位置和大小。选择器不受支持或找不到元素时返回 None。
+
+        :param focus: 聚焦元素并选中已有内容。元素不可编辑或没有获得焦点时返回 None。
+        """
+        if ">>>" in selector:
+            return None
+        try:
+            sel = in_page_selector(selector)
+        except Error:
+            return None
+        expression = _LOCATE_EXPRESSION % {
+            "selector": json.dumps(sel),
+            "focus": "true" if focus else "false",
+            "non_text_inputs": json.dumps(_NON_TEXT_INPUTS),
+        }
+        result = self.send("Runtime.evaluate", {"expression": expression, "returnByValue": True})
+        if "exceptionDetails" in result:
+            return None
+        return result["result"].get("value")
+
+    def click(
+            self,
+            selector: str,
+            *,
+            button: str = None,
+            click_count: int = None,
+            modifiers: List[str] = None,
+            position: Dict[str, float] = None,
+    ) -> bool:
+        """在元素的中心（或 `position` 指定的点）发送鼠标事件。"""
+        rect = self.locate(selector)
+        if rect is None:
+            return False
+        if position is not None:
+            x, y = rect["x"] + position["x"], rect["y"] + position["y"]
+        else:
+            x, y = rect["x"] + rect["width"] / 2, rect["y"] + rect["height"] / 2
+        self.click_at(x, y, button=button, click_count=click_count, modifiers=modifiers)
+        return True
+
+    def click_at(self, x: float, y: float, *, button: str = None, click_count: int = None, modifiers: List[str] = None):
+        """在视口坐标 (x, y) 处单击，不查找元素。"""
+        params = {
+            "x": x,
+            "y": y,
+            "button": button or "left",
+            "clickCount": click_count or 1,
+            "modifiers": sum(_MODIFIER_BITS[modifier] for modifier in modifiers or []),
+        }
+        self.send("Input.dispatchMouseEvent", dict(params, type="mouseMoved", button="none", clickCount=0))
+        self.send("Input.dispatchMouseEvent", dict(params, type="mousePressed"))
+        self.send("Input.dispatchMouseEvent", dict(params, type="mouseReleased"))
+
+    def fill(self, selector: str, value: str) -> bool:
+        """聚焦元素、选中已有内容，然后一次性插入 `value`，会触发 beforeinput 和 input 事件。
+
+        元素不是可编辑的文本输入框、textarea 或 contenteditable 元素（例如 select），或者没有获得焦点时返回 False。
+        """
+        if not value or self.locate(selector, focus=True) is None:
+            return False
+        self.insert_text(value)
+        return True
+
+    def insert_text(self, text: str):
+        """在当前焦点处插入文本，相当于输入法提交，不逐个发送按键事件。"""
+        self.send("Input.insertText", {"text": text})
+
+    def evaluate_batch(self, expressions: List[str]) -> List[Any]:
+        """在一次 Runtime.evaluate 中计算多个 JavaScript 表达式，按顺序返回结果。表达式的值是 Promise 时会等待它完成。"""
+        expression = "Promise.all([%s])" % ",".join(f"(async () => ({expression}))()" for expression in expressions)
+        result = self.send("Runtime.evaluate", {
+            "expression": expression,
+            "returnByValue": True,
+            "awaitPromise": True,
+        })
+        if "exceptionDetails" in result:
+            details = result["exceptionDetails"]
+            raise Error(details.get("exception", {}).get("description") or details.get("text"))
+        return result["result"].get("value")
+
+    def detach(self):
+        try:
+            self._session.detach()
+        except Error:  # 页面已经关闭
+            ...
+
+    def __repr__(self):
+        return f"CdpFastPath({self.page.url!r}, commands={self.commands})"
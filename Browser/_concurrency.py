@@ -0,0 +1,21 @@
+import functools
+from typing import Any, Callable, List
+
+
+def gather(anchor, actions: List[Callable[[], Any]]) -> List[Any]:
+    """在同一个线程中并发执行多个使用同步 API 的函数，按顺序返回结果。
+
+    每个函数运行在独立的 greenlet 中，调用 Playwright 方法等待响应时会切换到其他函数，
+    因此多个页面上的操作可以同时进行。任何一个函数抛出异常时，等待所有函数结束后抛出第一个异常。
+
+    :param anchor: 任意 Playwright 同步 API 对象（Page、BrowserContext 等），用于取得事件循环。
+    :param actions: 不接受参数的函数。
+    """
+    if len(actions) <= 1 or not hasattr(anchor, "_gather"):
+        return [action() for action in actions]
+    # _gather 以函数对象作为结果的键，包装一层保证每个函数对象都不相同
+    return anchor._gather(*[functools.partial(_invoke, action) for action in actions])
+
+
+def _invoke(action: Callable[[], Any]) -> Any:
+    return action()
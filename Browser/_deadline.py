@@ -0,0 +1,72 @@
+import contextvars
+import time
+from typing import Optional
+
+from ._api_types import TimeoutError
+
+_current_deadline: contextvars.ContextVar = contextvars.ContextVar("browser_deadline", default=None)
+
+
+class Deadline:
+    def __init__(self, timeout: float):
+        """一次逻辑操作的截止时间。
+
+        在 `with Deadline(timeout):` 块中，或通过 `Interaction.within(deadline)` 传入后，
+        Interaction 方法内部的每一次驱动调用都只能使用剩余的时间，整个操作在截止时间失败，而不是每一步各自超时。
+        嵌套使用时以更早的截止时间为准。
+
+        :param timeout: 从现在起的总时长（以毫秒为单位）。
+        """
+        self.timeout = timeout
+        self.expires_at = time.monotonic() + timeout / 1000
+        self._tokens = []
+
+    @staticmethod
+    def current() -> Optional["Deadline"]:
+        """返回当前作用域中的截止时间。"""
+        return _current_deadline.get()
+
+    @property
+    def remaining(self) -> float:
+        """剩余的时间（以毫秒为单位），不小于 0。"""
+        return max(0.0, (self.expires_at - time.monotonic()) * 1000)
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+    def check(self, action: str = None):
+        """如果已经超过截止时间，则抛出 TimeoutError。"""
+        if self.expired:
+            self._expire(action)
+
+    def clamp(self, timeout: float = None, action: str = None) -> float:
+        """返回不超过剩余时间的超时时间。`timeout` 为 None 或 0（不限时）时返回剩余时间。
+        剩余时间为 0 时抛出 TimeoutError：Playwright 会把 timeout=0 当作不限时。
+        """
+        remaining = self.remaining
+        if remaining <= 0:
+            self._expire(action)
+        if not timeout:
+            return remaining
+        return min(timeout, remaining)
+
+    def _expire(self, action: str = None):
+        action = f"执行 {action} 时" if action else ""
+        raise TimeoutError(f"{action}已超过 {self.timeout}ms 的截止时间。")
+
+    def earlier(self, other: Optional["Deadline"]) -> "Deadline":
+        """返回两个截止时间中更早的一个。"""
+        if other is None or self.expires_at <= other.expires_at:
+            return self
+        return other
+
+    def __enter__(self) -> "Deadline":
+        self._tokens.append(_current_deadline.set(self.earlier(_current_deadline.get())))
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        _current_deadline.reset(self._tokens.pop())
+
+    def __repr__(self):
+        return f"Deadline(timeout={self.timeout}, remaining={self.remaining:.0f})"
@@ -0,0 +1,132 @@
+from typing import Any, Dict, List, Optional
+
+from ._api_structures import ViewportSize
+from .data_types import SupportedBrowsers
+
+
+class LaunchProfile:
+    def __init__(
+            self,
+            *,
+            headless: bool = True,
+            viewport: ViewportSize = None,
+            device_scale_factor: float = 1,
+            disable_gpu: bool = True,
+            background_throttling: bool = True,
+            renderer_process_limit: int = None,
+            js_heap_size: int = None,
+            reduced_motion: bool = True,
+            block_service_workers: bool = True,
+            extra_args: List[str] = None,
+    ):
+        """面向服务器的浏览器启动和上下文设置，目标是在一台机器上运行尽可能多的页面。
+
+        与 `new_browser` 的默认值（有头、最大化窗口，适合桌面调试）不同，它使用无头模式、较小的视口、
+        关闭 GPU 和不需要的后台服务，并可以限制渲染进程数量和每个页面的 JS 堆大小。
+        通过 `PlaywrightManager.new_browser(profile=...)` 使用，之后创建的上下文也会应用上下文设置；
+        显式传入的参数优先。`benchmarks/density.py` 可以测量不同设置下每个页面的内存和吞吐量。
+
+        :param headless: 是否使用无头模式。
+        :param viewport: 视口大小。默认为 800x600。
+        :param device_scale_factor: 设备像素比。1 可以减少截图和合成的内存。
+        :param disable_gpu: 是否关闭 GPU 加速（服务器上通常没有 GPU，软件合成反而更省内存）。
+        :param background_throttling: 是否保留浏览器对后台页面的节流。
+            并发页面都在“后台”运行，节流会推迟它们的定时器和动画，需要它们全速运行时设为 False。
+        :param renderer_process_limit: 渲染进程数量上限（仅 Chromium）。超过后多个站点共享进程，内存更少但隔离更弱。
+        :param js_heap_size: 每个渲染进程的 V8 老生代堆上限（以 MB 为单位，仅 Chromium）。
+        :param reduced_motion: 是否模拟 prefers-reduced-motion，减少页面动画。
+        :param block_service_workers: 是否阻止注册 Service Worker。
+        :param extra_args: 附加的浏览器启动参数。
+        """
+        self.headless = headless
+        self.viewport = viewport or ViewportSize(width=800, height=600)
+        self.device_scale_factor = device_scale_factor
+        self.disable_gpu = disable_gpu
+        self.background_throttling = background_throttling
+        self.renderer_process_limit = renderer_process_limit
+        self.js_heap_size = js_heap_size
+        self.reduced_motion = reduced_motion
+        self.block_service_workers = block_service_workers
+        self.extra_args = extra_args or []
+
+    def launch_args(self, browser: SupportedBrowsers) -> List[str]:
+        """返回浏览器的启动参数。"""
+        args = []
+        if browser is SupportedBrowsers.chromium:
+            args += [
+                "--disable-dev-shm-usage",  # 容器中 /dev/shm 通常很小
+                "--disable-extensions",
+                "--disable-background-networking",
+                "--disable-component-update",
+                "--disable-default-apps",
+                "--disable-sync",
+                "--no-first-run",
+                "--mute-audio",
+            ]
+            if self.disable_gpu:
+                args.append("--disable-gpu")
+            if not self.background_throttling:
+                args += [
+                    "--disable-background-timer-throttling",
+                    "--disable-backgrounding-occluded-windows",
+                    "--disable-renderer-backgrounding",
+                ]
+            if self.renderer_process_limit is not None:
+                args.append(f"--renderer-process-limit={self.renderer_process_limit}")
+            if self.js_heap_size is not None:
+                args.append(f"--js-flags=--max-old-space-size={self.js_heap_size}")
+        return args + self.extra_args
+
+    def firefox_user_prefs(self) -> Dict[str, Any]:
+        """返回 Firefox 的首选项。"""
+        prefs: Dict[str, Any] = {
+            "media.autoplay.default": 5,
+            "browser.cache.memory.capacity": 16384,
+        }
+        if self.disable_gpu:
+            prefs["layers.acceleration.disabled"] = True
+        if self.renderer_process_limit is not None:
+            prefs["dom.ipc.processCount"] = self.renderer_process_limit
+        if not self.background_throttling:
+            prefs["dom.min_background_timeout_value"] = 4
+            prefs["dom.timeout.enable_budget_timer_throttling"] = False
+        return prefs
+
+    def launch_options(self, browser: SupportedBrowsers) -> Dict[str, Any]:
+        """返回 `BrowserType.launch` 的参数。"""
+        options: Dict[str, Any] = {"headless": self.headless, "args": self.launch_args(browser)}
+        if browser is SupportedBrowsers.firefox:
+            options["firefox_user_prefs"] = self.firefox_user_prefs()
+        return options
+
+    def context_options(self) -> Dict[str, Any]:
+        """返回 `Browser.new_context` 的参数。"""
+        options: Dict[str, Any] = {
+            "viewport": self.viewport,
+            "no_viewport": False,
+            "device_scale_factor": self.device_scale_factor,
+        }
+        if self.reduced_motion:
+            options["reduced_motion"] = "reduce"
+        if self.block_service_workers:
+            options["service_workers"] = "block"
+        return options
+
+    def __repr__(self):
+        return (f"LaunchProfile(headless={self.headless}, viewport={self.viewport}, "
+                f"renderer_process_limit={self.renderer_process_limit})")
+
+
+# 默认的高密度设置。
+DENSITY = LaunchProfile()
+
+
+def apply_context_profile(options: Dict[str, Any], profile: Optional[LaunchProfile]) -> Dict[str, Any]:
+    """用启动配置的上下文设置填充 `options` 中未显式指定（值为 None）的参数。"""
+    if profile is None:
+        return options
+    merged = dict(options)
+    for name, value in profile.context_options().items():
+        if merged.get(name) is None:
+            merged[name] = value
+    return merged
@@ -0,0 +1,338 @@
+import concurrent.futures
+import contextlib
+import hashlib
+import os
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional
+
+from ._api_types import Error, TimeoutError
+
+_CHUNK_SIZE = 1024 * 1024
+_SAVE_POLL_INTERVAL = 20  # 等待事件处理函数保存文件时的检查间隔（以毫秒为单位）
+_MAX_OVERSIZED_URLS = 256  # 最多记录的超过大小限制的响应 URL 数量
+
+
+class DownloadRecord:
+    def __init__(self, url: str, suggested_filename: str):
+        """一个下载任务的状态和耗时。
+
+        status 取值：
+            pending - 正在下载。
+            completed - 已保存到目标目录。
+            duplicate - 内容与已保存的文件相同，未重复保存，见 `duplicate_of`。
+            too_large - 超过大小限制，已取消或删除。
+            rejected - 超过并发限制，已取消。
+            failed - 下载或保存失败，或者关闭时仍未完成而被取消，见 `error`。
+        """
+        self.url = url
+        self.suggested_filename = suggested_filename
+        self.status = "pending"
+        self.path: Optional[str] = None  # 保存后的文件路径
+        self.sha256: Optional[str] = None
+        self.size: Optional[int] = None
+        self.duplicate_of: Optional[str] = None
+        self.error: Optional[str] = None
+        self.started_at = time.time()  # 浏览器开始下载的时间
+        self.downloaded_at: Optional[float] = None  # 浏览器完成下载、文件已写入目标目录的时间
+        self.finished_at: Optional[float] = None  # 完成校验和去重的时间
+        self._future: Optional[concurrent.futures.Future] = None
+        self._download = None
+
+    @property
+    def done(self) -> bool:
+        return self.status != "pending"
+
+    @property
+    def elapsed(self) -> Optional[float]:
+        """从开始下载到处理完成的耗时（以秒为单位）。"""
+        if self.finished_at is None:
+            return None
+        return self.finished_at - self.started_at
+
+    def as_dict(self) -> Dict:
+        return {
+            "url": self.url,
+            "suggested_filename": self.suggested_filename,
+            "status": self.status,
+            "path": self.path,
+            "sha256": self.sha256,
+            "size": self.size,
+            "duplicate_of": self.duplicate_of,
+            "error": self.error,
+            "started_at": self.started_at,
+            "downloaded_at": self.downloaded_at,
+            "finished_at": self.finished_at,
+            "elapsed": self.elapsed,
+        }
+
+    def __repr__(self):
+        return f"DownloadRecord({self.suggested_filename!r}, status={self.status})"
+
+
+class DownloadManager:
+    def __init__(
+            self,
+            context,
+            target_dir: str,
+            *,
+            max_concurrent: int = 8,
+            max_size: int = None,
+            deduplicate: bool = True,
+            hash_workers: int = 2,
+            timeout: float = 30000,
+    ):
+        """跟踪上下文中所有页面的下载，同时处理多个下载并保存到 `target_dir`。
+
+        每个下载在各自的事件处理函数中等待完成并直接写入目标目录（通过 `save_as`，远程连接的浏览器同样适用），
+        哈希计算和去重在后台线程中进行，不阻塞自动化流程。
+        注意，同步 API 只在调用 Playwright 方法期间处理事件，`wait_for_downloads` 会驱动所有未完成的下载。
+
+        :param context: 要跟踪的 BrowserContext，需要以 `accept_downloads=True` 创建。
+        :param target_dir: 保存下载文件的目录，不存在时自动创建。
+        :param max_concurrent: 同时进行的下载数量上限，超过时新的下载会被取消。
+        :param max_size: 单个文件的最大字节数，超过时删除文件。默认不限制。
+            响应头中的 Content-Length 超过限制时在下载过程中立即取消，没有 Content-Length 时在保存之后检查。
+        :param deduplicate: 是否按 SHA-256 去重，内容相同的文件只保存一份。
+        :param hash_workers: 计算哈希的线程数。
+        :param timeout: `stop` 等待已开始的下载的最长时间（以毫秒为单位）。
+        """
+        self._context = context
+        self.target_dir = os.path.abspath(target_dir)
+        self.max_concurrent = max_concurrent
+        self.max_size = max_size
+        self.deduplicate = deduplicate
+        self.timeout = timeout
+
+        self.records: List[DownloadRecord] = []
+        self._hashes: Dict[str, str] = {}  # sha256 => 已保存的文件路径
+        self._lock = threading.Lock()
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=hash_workers, thread_name_prefix="download-hash"
+        )
+        self._pages = []
+        self._oversized: Dict[str, int] = {}  # 超过大小限制的响应 URL => Content-Length
+        self._started = False
+
+    @property
+    def in_progress(self) -> int:
+        return sum(1 for record in self.records if record.status == "pending" and record.downloaded_at is None)
+
+    def start(self) -> "DownloadManager":
+        """开始跟踪已打开的页面和之后打开的页面。"""
+        if self._started:
+            return self
+        os.makedirs(self.target_dir, exist_ok=True)
+        for page in self._context.pages:
+            self._attach(page)
+        self._context.on("page", self._attach)
+        if self.max_size is not None:
+            self._context.on("response", self._on_response)
+        self._started = True
+        return self
+
+    def stop(self, wait: bool = True, timeout: float = None):
+        """停止跟踪新的下载。
+
+        :param wait: 是否等待已开始的下载处理完成。
+        :param timeout: 等待的最长时间（以毫秒为单位），默认为创建时的 `timeout`。超时后取消仍未完成的下载，不再等待。
+        """
+        if not self._started:
+            return
+        self._detach()
+        finished = True
+        if wait:
+            try:
+                self.wait_for_downloads(self.timeout if timeout is None else timeout)
+            except TimeoutError:
+                finished = False
+                self._cancel_pending("关闭时下载仍未完成，已取消。")
+        # 超时后不等待后台线程，哈希计算完成后线程自行退出
+        self._executor.shutdown(wait=wait and finished)
+
+    def _detach(self):
+        self._context.remove_listener("page", self._attach)
+        if self.max_size is not None:
+            self._context.remove_listener("response", self._on_response)
+        for page in self._pages:
+            page.remove_listener("download", self._on_download)
+        self._pages = []
+        self._started = False
+
+    def _cancel_pending(self, reason: str, status: str = "failed"):
+        """取消所有尚未完成下载的记录。"""
+        for record in self.records:
+            if record.status == "pending" and record._future is None:
+                self._cancel(record, reason, status)
+
+    def _cancel(self, record: DownloadRecord, reason: str, status: str):
+        download, record._download = record._download, None
+        record.status = status
+        record.error = reason
+        record.finished_at = time.time()
+        if download is not None:
+            try:
+                download.cancel()
+            except Error:  # 下载已经结束或上下文已经关闭
+                ...
+
+    def rebind(self, context):
+        """将下载跟踪转移到新的上下文，例如回收或恢复上下文之后。已有的下载记录和去重信息会保留。"""
+        started = self._started
+        if started:
+            self._detach()
+        self._context = context
+        if started:
+            self.start()
+
+    def wait_for_downloads(self, timeout: float = None) -> List[DownloadRecord]:
+        """等待所有已开始的下载处理完成，返回全部下载记录。
+
+        :param timeout: 以毫秒为单位的最长时间。默认一直等待。
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout / 1000
+        for record in list(self.records):
+            download = record._download
+            # 轮询直到事件处理函数完成下载和保存（download.failure() 会一直阻塞到下载结束，不受 timeout 约束）。
+            # 同步 API 只在调用 Playwright 方法期间分发事件，wait_for_timeout 让各个下载的事件处理函数继续执行
+            while download is not None and record._future is None and record.status == "pending":
+                if deadline is not None and time.monotonic() > deadline:
+                    raise TimeoutError(f"等待下载 {record.suggested_filename} 完成超时（{timeout}ms）。")
+                if self._check_oversized(record):
+                    break
+                self._poll(download)
+            future = record._future
+            if future is not None:
+                remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+                try:
+                    future.result(timeout=remaining)
+                except concurrent.futures.TimeoutError:
+                    raise TimeoutError(f"等待下载 {record.suggested_filename} 处理完成超时（{timeout}ms）。")
+        return list(self.records)
+
+    def _poll(self, download):
+        """等待 `_SAVE_POLL_INTERVAL` 毫秒，期间分发事件。"""
+        for page in [download.page, *self._context.pages]:
+            if not page.is_closed():
+                page.wait_for_timeout(_SAVE_POLL_INTERVAL)
+                return
+        # 上下文中已经没有打开的页面，改为在上下文上等待新页面，同样只等待一个检查间隔
+        try:
+            self._context.wait_for_event("page", timeout=_SAVE_POLL_INTERVAL)
+        except TimeoutError:
+            ...
+        except Error:  # 上下文已经关闭，浏览器会取消下载，failure() 立即返回
+            download.failure()
+
+    def _on_response(self, response):
+        length = response.headers.get("content-length")
+        if length is None or not length.isdigit() or int(length) <= self.max_size:
+            return
+        self._oversized[response.url] = int(length)
+        while len(self._oversized) > _MAX_OVERSIZED_URLS:
+            self._oversized.pop(next(iter(self._oversized)))
+        for record in self.records:
+            self._check_oversized(record)
+
+    def _check_oversized(self, record: DownloadRecord) -> bool:
+        """响应的 Content-Length 超过大小限制时取消下载。返回是否已取消。"""
+        if record.status != "pending" or record.downloaded_at is not None or record.url not in self._oversized:
+            return False
+        record.size = self._oversized[record.url]
+        self._cancel(record, f"Content-Length 为 {record.size}，超过 {self.max_size} 字节。", "too_large")
+        return True
+
+    def summary(self) -> Dict[str, int]:
+        """按状态统计下载数量。"""
+        counts: Dict[str, int] = {}
+        for record in self.records:
+            counts[record.status] = counts.get(record.status, 0) + 1
+        return counts
+
+    def _attach(self, page):
+        page.on("download", self._on_download)
+        self._pages.append(page)
+        page.once("close", lambda _: self._pages.remove(page) if page in self._pages else None)
+
+    def _on_download(self, download):
+        record = DownloadRecord(download.url, download.suggested_filename)
+        if self.in_progress >= self.max_concurrent:
+            record.status = "rejected"
+            record.error = f"同时进行的下载超过 {self.max_concurrent} 个。"
+            record.finished_at = time.time()
+            self.records.append(record)
+            download.cancel()
+            return
+        record._download = download
+        self.records.append(record)
+        if self._check_oversized(record):
+            return
+        partial_path = os.path.join(self.target_dir, f".{uuid.uuid4().hex}.part")
+        try:
+            # 每个事件处理函数运行在独立的 greenlet 中，这里等待不会阻塞其他下载
+            download.save_as(partial_path)
+        except Error as e:
+            if record.status == "pending":
+                record.status = "failed"
+                record.error = download.failure() or str(e)
+                record.finished_at = time.time()
+                record._download = None
+            return
+        if record.status != "pending":  # 等待期间已经被取消（超过大小限制或关闭时超时）
+            with contextlib.suppress(OSError):
+                os.remove(partial_path)
+            return
+        record.downloaded_at = time.time()
+        record._future = self._executor.submit(self._finalize, record, partial_path)
+
+    def _finalize(self, record: DownloadRecord, partial_path: str):
+        try:
+            size = os.path.getsize(partial_path)
+            record.size = size
+            if self.max_size is not None and size > self.max_size:
+                os.remove(partial_path)
+                record.status = "too_large"
+                return
+            record.sha256 = _file_sha256(partial_path)
+            with self._lock:
+                existing = self._hashes.get(record.sha256) if self.deduplicate else None
+                if existing is not None:
+                    os.remove(partial_path)
+                    record.status = "duplicate"
+                    record.duplicate_of = existing
+                    return
+                final_path = _unique_path(self.target_dir, record.suggested_filename)
+                os.replace(partial_path, final_path)
+                self._hashes[record.sha256] = final_path
+            record.path = final_path
+            record.status = "completed"
+        except OSError as e:
+            record.status = "failed"
+            record.error = str(e)
+        finally:
+            record.finished_at = time.time()
+            record._download = None
+
+    def __repr__(self):
+        return f"DownloadManager({self.target_dir!r}, {self.summary()})"
+
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _unique_path(directory: str, filename: str) -> str:
+    """返回目录中不存在的文件路径，重名时追加序号。"""
+    filename = os.path.basename(filename) or "download"
+    stem, extension = os.path.splitext(filename)
+    path = os.path.join(directory, filename)
+    index = 1
+    while os.path.exists(path):
+        path = os.path.join(directory, f"{stem} ({index}){extension}")
+        index += 1
+    return path
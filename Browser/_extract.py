@@ -0,0 +1,142 @@
+import collections
+import json
+import uuid
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+from ._api_types import Error
+from ._runtime import call
+from ._waits import in_page_selector
+
+# 字段说明：
+#   "text" / "html" / "value" / "box"      - 元素本身的 innerText、innerHTML、value、位置和大小
+#   "@href"                                 - 元素本身的属性
+#   "prop:checked"                          - 元素本身的 JS 属性（只返回可以序列化的值）
+#   ".price::text"、"a::@href"              - `::` 之前是相对于元素的 CSS/XPath 选择器，之后是上面的取值方式
+#   {"selector": "li", "get": "text", "all": True}  - 字典形式，all 为 True 时返回所有匹配元素的值组成的列表
+# 字典形式中 get 可以是 text、html、value、box、attr（配合 "attr": 名称）或 prop（配合 "prop": 名称）。
+FieldSpec = Union[str, Dict[str, Any]]
+
+_GETTERS = ("text", "html", "value", "box")
+
+
+def compile_fields(fields: Optional[Dict[str, FieldSpec]]) -> List[Dict[str, Any]]:
+    """将字段说明转换为页面内脚本使用的格式。默认只读取元素的 innerText。"""
+    if fields is None:
+        fields = {"text": "text"}
+    compiled = []
+    for name, spec in fields.items():
+        if isinstance(spec, str):
+            selector, _, getter = spec.rpartition("::")
+            spec = {"selector": selector or None, **_parse_getter(getter)}
+        else:
+            spec = dict(spec)
+            if "attr" in spec:
+                spec.setdefault("get", "attr")
+                spec["key"] = spec.pop("attr")
+            elif "prop" in spec:
+                spec.setdefault("get", "prop")
+                spec["key"] = spec.pop("prop")
+            spec.setdefault("get", "text")
+            if spec["get"] not in _GETTERS + ("attr", "prop"):
+                raise Error(f"字段 {name} 的取值方式 {spec['get']} 无效。")
+        selector = spec.get("selector")
+        compiled.append({
+            "name": name,
+            "selector": in_page_selector(selector) if selector else None,
+            "get": spec["get"],
+            "key": spec.get("key"),
+            "all": bool(spec.get("all")),
+        })
+    return compiled
+
+
+def _identity(record: Dict[str, Any], key: Optional[str]) -> tuple:
+    """返回记录的去重标识。没有指定去重字段或该字段为空（null）时使用整条记录，避免缺少该字段的记录被合并为一条。"""
+    value = record.get(key) if key is not None else None
+    if value is None:
+        return "record", json.dumps(record, sort_keys=True)
+    return "key", value if isinstance(value, (str, int, float)) else json.dumps(value, sort_keys=True)
+
+
+def _parse_getter(getter: str) -> Dict[str, Any]:
+    if getter.startswith("@"):
+        return {"get": "attr", "key": getter[1:]}
+    if getter.startswith("prop:"):
+        return {"get": "prop", "key": getter[5:]}
+    if getter in _GETTERS:
+        return {"get": getter}
+    raise Error(f"无效的取值方式 {getter}，应当是 {'、'.join(_GETTERS)}、@属性名或 prop:属性名。")
+
+
+def extract(frame, item_selector: str, fields: Optional[Dict[str, FieldSpec]] = None, *,
+            limit: int = None) -> List[Dict[str, Any]]:
+    """在 `frame` 中通过一次 evaluate 读取所有匹配元素的字段，参见 `Interaction.query_extract`。"""
+    return call(frame, "extract", {
+        "item": in_page_selector(item_selector),
+        "fields": compile_fields(fields),
+        "limit": limit,
+    })
+
+
+def stream_extract(
+        frame,
+        item_selector: str,
+        fields: Optional[Dict[str, FieldSpec]] = None,
+        *,
+        key: str = None,
+        batch_size: int = 50,
+        limit: int = None,
+        load_more: str = None,
+        scroll: bool = True,
+        idle_timeout: float = 2000,
+        max_idle_rounds: int = 2,
+        max_seen: int = 100000,
+) -> Iterator[List[Dict[str, Any]]]:
+    """在 `frame` 中逐批读取列表项，参见 `Interaction.extract_stream`。"""
+    item = in_page_selector(item_selector)
+    compiled = compile_fields(fields)
+    if key is not None and key not in {field["name"] for field in compiled}:
+        raise Error(f"去重字段 {key} 不在字段说明中。")
+    more = in_page_selector(load_more) if load_more is not None else None
+    session = uuid.uuid4().hex
+    seen = collections.OrderedDict()  # 最近见过的键，数量不超过 max_seen
+    batch: List[Dict[str, Any]] = []
+    total = 0
+    idle_rounds = 0
+    try:
+        while True:
+            fresh = 0
+            for record in call(frame, "streamExtract", {"item": item, "fields": compiled, "session": session}):
+                identity = _identity(record, key)
+                if identity in seen:
+                    seen.move_to_end(identity)
+                    continue
+                seen[identity] = None
+                if len(seen) > max_seen:
+                    seen.popitem(last=False)
+                batch.append(record)
+                fresh += 1
+                total += 1
+                if limit is not None and total >= limit:
+                    yield batch
+                    return
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+            if not scroll and more is None:
+                break
+            idle_rounds = 0 if fresh else idle_rounds + 1
+            if idle_rounds >= max_idle_rounds:
+                break
+            advanced = call(frame, "advance", {"item": item, "loadMore": more, "timeout": idle_timeout})
+            if advanced["exhausted"]:
+                # 没有“加载更多”按钮了，再读取一次最后加载的内容
+                more = None
+                scroll = False
+        if batch:
+            yield batch
+    finally:
+        try:
+            call(frame, "endStream", session)
+        except Error:  # 页面已经关闭或导航
+            ...
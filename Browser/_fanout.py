@@ -0,0 +1,206 @@
+import collections
+import json
+import logging
+import threading
+import time
+import traceback
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from .data_types import SupportedBrowsers
+
+
+class EngineResult:
+    def __init__(self, browser: SupportedBrowsers):
+        """一个浏览器引擎上的执行结果。
+
+        :param browser: 浏览器引擎。
+        """
+        self.browser = browser
+        self.ok = False
+        self.result: Any = None  # 脚本的返回值
+        self.error: Optional[str] = None  # 失败时的异常，格式为 "类型: 信息"
+        self.traceback: Optional[str] = None
+        self.launch_time: Optional[float] = None  # 启动浏览器和打开页面的毫秒数
+        self.elapsed: Optional[float] = None  # 执行脚本的毫秒数
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "browser": self.browser.name,
+            "ok": self.ok,
+            "result": self.result,
+            "error": self.error,
+            "launch_time": self.launch_time,
+            "elapsed": self.elapsed,
+        }
+
+    def __repr__(self):
+        state = "ok" if self.ok else f"failed: {self.error}"
+        return f"EngineResult({self.browser.name}, {state}, elapsed={self.elapsed})"
+
+
+class FanOutReport:
+    def __init__(self, results: Dict[SupportedBrowsers, EngineResult], wall_time: float):
+        """多个浏览器引擎上的执行结果。
+
+        :param results: 每个引擎的结果，按启动顺序排列。
+        :param wall_time: 从开始到所有引擎结束的毫秒数。
+        """
+        self.results = results
+        self.wall_time = wall_time
+
+    def __getitem__(self, browser: SupportedBrowsers) -> EngineResult:
+        return self.results[browser]
+
+    @property
+    def ok(self) -> bool:
+        """是否所有引擎都执行成功。"""
+        return all(result.ok for result in self.results.values())
+
+    @property
+    def failures(self) -> Dict[SupportedBrowsers, EngineResult]:
+        return {browser: result for browser, result in self.results.items() if not result.ok}
+
+    @property
+    def sequential_time(self) -> float:
+        """依次在每个引擎上运行所需的毫秒数（启动和执行时间之和），用于和 `wall_time` 比较。"""
+        return sum((result.launch_time or 0) + (result.elapsed or 0) for result in self.results.values())
+
+    def divergent(self) -> Dict[SupportedBrowsers, EngineResult]:
+        """返回执行成功、但返回值与多数引擎不同的引擎。没有多数时以第一个成功的引擎为准。"""
+        succeeded = [(browser, result) for browser, result in self.results.items() if result.ok]
+        if not succeeded:
+            return {}
+        keys = [_comparable(result.result) for _, result in succeeded]
+        majority = collections.Counter(keys).most_common(1)[0]
+        expected = majority[0] if majority[1] > 1 else keys[0]
+        return {browser: result for (browser, result), key in zip(succeeded, keys) if key != expected}
+
+    def table(self) -> str:
+        """返回逐个引擎对比结果的文本表格。"""
+        divergent = self.divergent()
+        rows = [("browser", "status", "launch(ms)", "run(ms)", "result")]
+        for browser, result in self.results.items():
+            if not result.ok:
+                status = "failed"
+            elif browser in divergent:
+                status = "divergent"
+            else:
+                status = "ok"
+            detail = result.error if not result.ok else _comparable(result.result)
+            rows.append((
+                browser.name,
+                status,
+                f"{result.launch_time:.0f}" if result.launch_time is not None else "-",
+                f"{result.elapsed:.0f}" if result.elapsed is not None else "-",
+                detail if len(detail) <= 80 else detail[:77] + "...",
+            ))
+        widths = [max(len(row[i]) for row in rows) for i in range(4)]
+        lines = ["  ".join(cell.ljust(width) for cell, width in zip(row[:4], widths)) + "  " + row[4] for row in rows]
+        lines.append(f"wall {self.wall_time:.0f}ms, sequential {self.sequential_time:.0f}ms")
+        return "\n".join(lines)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "ok": self.ok,
+            "wall_time": self.wall_time,
+            "sequential_time": self.sequential_time,
+            "divergent": [browser.name for browser in self.divergent()],
+            "results": [result.as_dict() for result in self.results.values()],
+        }
+
+    def __repr__(self):
+        return f"FanOutReport(ok={self.ok}, wall_time={self.wall_time:.0f}, engines={len(self.results)})"
+
+
+class FanOut:
+    def __init__(
+            self,
+            script: Callable[[Any], Any],
+            *,
+            browsers: Iterable[SupportedBrowsers] = tuple(SupportedBrowsers),
+            manager_options: Dict[str, Any] = None,
+            browser_options: Dict[str, Any] = None,
+            context_options: Dict[str, Any] = None,
+    ):
+        """在多个浏览器引擎上同时运行同一个交互脚本。
+
+        Playwright 的同步 API 不能跨线程共享，因此每个引擎在独立的线程中使用自己的 PlaywrightManager
+        （以及自己的 Playwright 进程），互不影响。总耗时取决于最慢的引擎，而不是所有引擎之和。
+
+        ```py
+        def login(pm):
+            pm.interaction.goto("https://example.com/login")
+            pm.interaction.fill("#user", "test")
+            pm.interaction.click("#submit")
+            return pm.interaction.inner_text(".welcome")
+
+        report = FanOut(login).run()
+        print(report.table())
+        ```
+
+        :param script: 在每个引擎上执行的函数 `script(manager)`，manager 已经打开浏览器、上下文和页面。
+            返回值用于比较各引擎的结果，应当可以比较或序列化为 JSON。
+        :param browsers: 要运行的浏览器引擎。默认为所有支持的引擎。
+        :param manager_options: 创建 PlaywrightManager 的参数。
+        :param browser_options: `new_browser` 的参数（browser 除外）。默认以无头模式启动。
+        :param context_options: `new_context` 的参数。
+        """
+        self.script = script
+        self.browsers = list(browsers)
+        self.manager_options = manager_options or {}
+        self.browser_options = {"headless": True, **(browser_options or {})}
+        self.context_options = context_options or {}
+
+    def run(self) -> FanOutReport:
+        """在每个引擎上执行脚本，等待全部结束后返回结果。单个引擎失败不影响其他引擎。"""
+        results = collections.OrderedDict((browser, EngineResult(browser)) for browser in self.browsers)
+        threads = [
+            threading.Thread(target=self._work, args=(result,), name=f"fan-out-{browser.name}", daemon=True)
+            for browser, result in results.items()
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return FanOutReport(results, (time.perf_counter() - started) * 1000)
+
+    def _work(self, result: EngineResult):
+        # 避免循环导入：PlaywrightManager 通过 fan_out 使用本模块
+        from .playwrightmanager import PlaywrightManager
+
+        manager = PlaywrightManager(**self.manager_options)
+        options = dict(self.browser_options)
+        if result.browser is not SupportedBrowsers.chromium and options.get("profile") is None:
+            # new_browser 默认的 --start-maximized 只适用于 Chromium；启动配置会为每个引擎生成自己的参数
+            options.setdefault("args", [])
+        started = time.perf_counter()
+        try:
+            manager.start_playwright()
+            manager.new_browser(browser=result.browser, **options)
+            manager.new_context(**self.context_options)
+            manager.new_page()
+            result.launch_time = (time.perf_counter() - started) * 1000
+            started = time.perf_counter()
+            result.result = self.script(manager)
+            result.ok = True
+        except Exception as e:
+            result.error = f"{type(e).__name__}: {e}"
+            result.traceback = traceback.format_exc()
+            logging.getLogger(__name__).warning(f"{result.browser.name} 执行失败：{result.error}")
+        finally:
+            if result.launch_time is not None:
+                result.elapsed = (time.perf_counter() - started) * 1000
+            try:
+                manager.close_browser()
+            finally:
+                manager.stop_playwright()
+
+
+def _comparable(value: Any) -> str:
+    """将返回值转换为可以比较的文本。"""
+    try:
+        return json.dumps(value, sort_keys=True, ensure_ascii=False, default=str)
+    except (TypeError, ValueError):
+        return repr(value)
+
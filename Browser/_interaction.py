@@ -1,27 +1,94 @@
+import contextlib
 import sys
+import weakref
 
 if sys.version_info >= (3, 8):  # pragma: no cover
-    from typing import Literal, Optional, List, Dict, Union
+    from typing import Any, Iterator, Literal, Optional, List, Dict, Pattern, Union
 else:  # pragma: no cover
-    from typing import Optional, List, Dict, Union
+    from typing import Any, Iterator, Optional, List, Dict, Pattern, Union
     from typing_extensions import Literal
 
+from playwright.sync_api import Frame, Page
+
 from ._api_structures import Position
-from ._api_types import Error, NoSuchOptionError
-from ._invoke import determine_element, wait_for_element
+from ._api_types import Error, NoSuchOptionError, TimeoutError
+from ._deadline import Deadline
+from ._extract import FieldSpec, extract, stream_extract
+from ._invoke import determine_element, wait_for_element, resolve_frame
+from ._middleware import instrumented
+from ._readiness import NavigationTiming, ReadyRequests, request_matchers, watch_load
+from ._runtime import call, call_handle, call_on_element
+from ._waits import REQUEST_TRACKER_SCRIPT, effective_timeout, in_page_selector, pattern_source
 
 NoneType = type(None)
 
+_ANT_OPTIONS_QUIET_TIME = 100  # 认为 ant-design 下拉选项加载完成的安静时间（以毫秒为单位）
+
+_request_tracked_pages = weakref.WeakSet()  # 已安装请求跟踪初始化脚本的页面
+
+
+class _Delegated:
+    """直接委托给交互对象的 Page/Frame 属性或方法。"""
+    __slots__ = ("name",)
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        return getattr(instance._obj, self.name)
+
 
 class Interaction:
-    def __init__(self, obj):
-        self._obj = obj
+    # 使用 __slots__ 减少属性访问和创建对象的开销；管理器会缓存 Interaction，只在交互对象变化时重建
+    __slots__ = (
+        "_obj", "_target_page", "_navigable", "_deadline", "_change_feed", "_fast_path", "_middlewares",
+        "_dispatching", "_default_timeout", "__weakref__",
+    )
+
+    def __init__(
+            self,
+            obj,
+            change_feed=None,
+            middlewares=None,
+            deadline: Deadline = None,
+            fast_path=None,
+            default_timeout: float = None,
+    ):
+        self._bind(obj)
+        self._deadline = deadline  # 通过 within() 传入的截止时间
+        self._change_feed = change_feed  # 页面的 ChangeFeed，用于缓存只读方法的结果
+        self._fast_path = fast_path  # 页面的 CdpFastPath，用于 force=True 的操作
+        self._middlewares = middlewares or []  # 每次调用依次经过的中间件
+        self._dispatching = False  # 正在执行中间件链，内部调用不再经过中间件
+        self._default_timeout = default_timeout  # 页面内等待的默认超时时间，通常是管理器的 default_timeout
 
     def __getattr__(self, item):
-        if self.__dict__.get(item):
-            return self.item()
-        else:
-            return getattr(self._obj, item)
+        # 只有 Interaction 自身没有的属性才会到这里，委托给交互对象
+        if item == "_obj":  # 尚未绑定交互对象（例如复制对象时），避免无限递归
+            raise AttributeError(item)
+        return getattr(self._obj, item)
+
+    def _bind(self, obj):
+        """设置交互对象，并预先确定它所在的页面和是否可以导航，每次调用时不再判断类型。"""
+        kind = type(obj).__name__
+        self._obj = obj
+        self._navigable = kind in ("Page", "Frame")
+        self._target_page = obj.page if kind == "Frame" else obj
+
+    def _retarget(self, obj) -> "Interaction":
+        """返回作用于 `obj`（例如当前页面中的某个 frame）的 Interaction，中间件、截止时间等设置不变。"""
+        if obj is self._obj:
+            return self
+        return Interaction(
+            obj,
+            change_feed=self._change_feed,
+            middlewares=self._middlewares,
+            deadline=self._deadline,
+            fast_path=self._fast_path,
+            default_timeout=self._default_timeout
+        )
 
     def _find_element_cross_frame(self, selector: str, only=True):
         """跨frame搜索元素。
@@ -30,6 +97,65 @@ class Interaction:
         """
         return determine_element(self._obj, selector=selector, only=only)
 
+    def within(self, deadline: Union[Deadline, float]) -> "Interaction":
+        """返回受截止时间约束的 Interaction。之后的每一次调用（包括方法内部的每一次驱动调用）都只能使用剩余的时间。
+
+        ```py
+        step = pm.interaction.within(5000)
+        step.fill("#name", "test")
+        step.select_option_for_ant("#city", label="上海")
+        ```
+
+        :param deadline: Deadline 对象，或从现在起的总时长（以毫秒为单位）。
+        """
+        if not isinstance(deadline, Deadline):
+            deadline = Deadline(deadline)
+        return Interaction(
+            self._obj,
+            change_feed=self._change_feed,
+            middlewares=self._middlewares,
+            deadline=deadline.earlier(self._deadline),
+            fast_path=self._fast_path,
+            default_timeout=self._default_timeout
+        )
+
+    def _active_deadline(self) -> Optional[Deadline]:
+        """返回传入的截止时间与当前作用域截止时间中更早的一个。"""
+        scoped = Deadline.current()
+        if self._deadline is None:
+            return scoped
+        return self._deadline.earlier(scoped)
+
+    def _check_deadline(self, action: str):
+        """在没有超时参数的驱动调用之间检查截止时间，已经超过时抛出 TimeoutError。"""
+        deadline = self._active_deadline()
+        if deadline is not None:
+            deadline.check(action)
+
+    def _budget(self, timeout: float = None) -> Optional[float]:
+        """返回一次驱动调用可以使用的超时时间。没有截止时间时原样返回 `timeout`。"""
+        deadline = self._active_deadline()
+        if deadline is None:
+            return timeout
+        return deadline.clamp(timeout)
+
+    def _page(self):
+        """返回交互对象所在的页面。"""
+        return self._target_page
+
+    def _cdp(self, force: bool):
+        """调用方要求跳过检查、且交互对象是启用了 CDP 快速通道的页面时，返回 CdpFastPath。"""
+        if force and self._fast_path is not None and self._obj is self._fast_path.page:
+            return self._fast_path
+        return None
+
+    def _memoize(self, method: str, selector: str, args: tuple, producer):
+        """如果页面已订阅 DOM 变更，则缓存只读方法的结果，直到相关子树发生变化。"""
+        if self._change_feed is None:
+            return producer()
+        return self._change_feed.memoize(self._obj, method, selector, args, producer)
+
+    @instrumented
     def check(
             self,
             selector: str,
@@ -57,9 +183,10 @@ class Interaction:
             force=force,
             no_wait_after=no_wait_after,
             position=position,
-            timeout=timeout
+            timeout=self._budget(timeout)
         )
 
+    @instrumented
     def click(
             self,
             selector: str,
@@ -91,6 +218,11 @@ class Interaction:
         :param timeout: 以毫秒为单位的最长时间，默认为 30 秒，传递 0 以禁用超时。
             可以使用 browser_context.set_default_timeout(timeout) 或 page.set_default_timeout(timeout) 方法更改默认值。
         """
+        fast_path = self._cdp(force)
+        if fast_path is not None and not delay and fast_path.click(
+                selector, button=button, click_count=click_count, modifiers=modifiers, position=position
+        ):
+            return
         element = self._find_element_cross_frame(selector)
         element.click(
             button=button,
@@ -100,9 +232,10 @@ class Interaction:
             modifiers=modifiers,
             no_wait_after=no_wait_after,
             position=position,
-            timeout=timeout
+            timeout=self._budget(timeout)
         )
 
+    @instrumented
     def cell_inner_text(self, *, row_header: str = None, column_headers: List[str] = None):
         """根据列标题 `column_headers` 和行标题 `row_header` 获得文本值。
         仅提供行标题 `row_header` 时，将获得其右侧最近的一个字段的文本值。
@@ -112,6 +245,7 @@ class Interaction:
         """
         return self.get_table_cell(row_header=row_header, column_headers=column_headers).inner_text()
 
+    @instrumented
     def cell_input_value(self, *, row_header: str = None, column_headers: List[str] = None):
         """根据列标题 `column_headers` 和行标题 `row_header` 获得 <input> 或 <textarea> 或 <select> 的 `value` 属性值。
         仅提供行标题 `row_header` 时，将获得其右侧最近的一个输入字段的 `value` 属性值。
@@ -121,13 +255,16 @@ class Interaction:
         :param row_header: 行标题
         """
         _el = self.get_table_cell(row_header=row_header, column_headers=column_headers)
+        self._check_deadline("cell_input_value")
         tag_name = str(_el.get_property("tagName")).lower()
         if tag_name not in ["input", "textarea", "select"]:
             raise Error(
                 "cell_input_value 仅作用于 <input>|<textarea>|<select> 元素，"
                 f"不支持 <{tag_name}>。")
+        self._check_deadline("cell_input_value")
         return _el.get_attribute("value")
 
+    @instrumented
     def dblclick(
             self,
             selector: str,
@@ -164,11 +301,12 @@ class Interaction:
             position=position,
             delay=delay,
             button=button,
-            timeout=timeout,
+            timeout=self._budget(timeout),
             force=force,
             no_wait_after=no_wait_after,
         )
 
+    @instrumented
     def dispatch_event(
             self,
             selector: str,
@@ -207,6 +345,7 @@ class Interaction:
             event_init=event_init,
         )
 
+    @instrumented
     def drag_and_drop(
             self,
             source: str,
@@ -234,9 +373,73 @@ class Interaction:
             target=target,
             source_position=source_position,
             target_position=target_position,
-            timeout=timeout,
+            timeout=self._budget(timeout),
+        )
+
+    @instrumented
+    def evaluate_batch(self, expressions: List[str], *, force: bool = None) -> list:
+        """在一次往返中计算多个 JavaScript 表达式，按顺序返回结果。表达式的值是 Promise 时会等待它完成。
+
+        :param expressions: JavaScript 表达式，例如 `document.title`、`fetch("/api").then(r => r.status)`。
+        :param force: 启用了 CDP 快速通道时通过 Runtime.evaluate 直接计算。
+        """
+        fast_path = self._cdp(force)
+        if fast_path is not None:
+            return fast_path.evaluate_batch(expressions)
+        return self._obj.evaluate(
+            "Promise.all([%s])" % ",".join(f"(async () => ({expression}))()" for expression in expressions)
         )
 
+    def extract_stream(
+            self,
+            item_selector: str,
+            fields: Dict[str, FieldSpec] = None,
+            *,
+            key: str = None,
+            batch_size: int = 50,
+            limit: int = None,
+            load_more: str = None,
+            scroll: bool = True,
+            idle_timeout: float = 2000,
+            max_idle_rounds: int = 2,
+            max_seen: int = 100000,
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """逐批读取无限滚动列表或“加载更多”列表中的数据，返回生成器，每次产生一批字典。
+
+        每一轮通过一次 evaluate 读取当前已渲染、且上次读取后有变化的列表项，按 `key` 去重后攒成批次，
+        然后滚动到最后一个列表项（或点击 `load_more`），等待列表变化后进入下一轮。
+        连续 `max_idle_rounds` 轮没有新数据、没有“加载更多”按钮或达到 `limit` 时结束。
+        去重只保留最近 `max_seen` 个键，页面中也不保存读取结果，适合虚拟列表和很长的列表。
+
+        ```py
+        for batch in interaction.extract_stream(
+                "iframe[name=main] >>> .result-item",
+                {"id": "@data-id", "title": ".title::text", "url": "a::@href"},
+                key="id", limit=1000):
+            save(batch)
+        ```
+
+        生成器不经过中间件，也不受 `within` 的截止时间限制。
+
+        :param item_selector: 列表项的选择器，支持 `>>>` 跨 frame，元素部分需要是 CSS 或 XPath。
+        :param fields: 字段名到字段说明的映射，格式见 `_extract.FieldSpec`。默认只读取 innerText。
+        :param key: 用于去重的字段名。默认使用整条记录，该字段为空（null）的记录同样按整条记录去重。
+        :param batch_size: 每批的最大条数。
+        :param limit: 最多读取的条数。
+        :param load_more: “加载更多”按钮的选择器（与列表项在同一个 frame 中）。默认通过滚动加载。
+        :param scroll: 是否滚动加载。为 False 且没有 `load_more` 时只读取当前已渲染的列表项。
+        :param idle_timeout: 每轮滚动或点击后等待列表变化的时间（以毫秒为单位）。
+        :param max_idle_rounds: 连续多少轮没有新数据时认为列表已经结束。
+        :param max_seen: 去重时记住的键的数量上限。
+        """
+        frame, element_selector = resolve_frame(self._obj, item_selector)
+        return stream_extract(
+            frame, element_selector, fields,
+            key=key, batch_size=batch_size, limit=limit, load_more=load_more, scroll=scroll,
+            idle_timeout=idle_timeout, max_idle_rounds=max_idle_rounds, max_seen=max_seen,
+        )
+
+    @instrumented
     def fill(
             self,
             selector: str,
@@ -245,6 +448,7 @@ class Interaction:
             no_wait_after: bool = None,
             timeout: float = None,
             clear: bool = True,
+            force: bool = None,
     ) -> NoneType:
         """清空 `selector` 找到的文本字段，然后使用 `value` 填充它。
         此方法等待元素匹配选择器，等待可操作性检查，聚焦元素，填充它并在填充后触发输入事件。
@@ -260,7 +464,11 @@ class Interaction:
             browser_context.set_default_timeout(timeout)
             或 page.set_default_timeout(timeout) 方法更改默认值。
         :param clear: 如果在填充之前不应清除该字段，则设置为 false。 默认为 true。
+        :param force: 启用了 CDP 快速通道时，通过 CDP 直接插入文本，不等待元素。找不到元素时仍使用常规方式填充。
         """
+        fast_path = self._cdp(force)
+        if fast_path is not None and clear and fast_path.fill(selector, value):
+            return
         element = self._find_element_cross_frame(selector)
         if clear:
             # 清空
@@ -268,16 +476,17 @@ class Interaction:
                 value='',
                 force=True,
                 no_wait_after=no_wait_after,
-                timeout=timeout,
+                timeout=self._budget(timeout),
             )
-        # 填充
+        # 填充，与清空共用同一个截止时间
         element.fill(
             value=value,
             force=True,
             no_wait_after=no_wait_after,
-            timeout=0,
+            timeout=self._budget(timeout),
         )
 
+    @instrumented
     def focus(self, selector: str):
         """此方法使用选择器 `selector` 获取元素并聚焦它。
         如果没有与选择器匹配的元素，该方法将等待匹配元素出现在 DOM 中。
@@ -287,79 +496,47 @@ class Interaction:
         element = self._find_element_cross_frame(selector)
         element.focus()
 
+    @instrumented
     def get_attribute(self, selector: str, name: str) -> Union[NoneType, str]:
         """返回元素属性值。
 
         :param selector: 用于搜索元素的选择器。 如果有多个元素满足选择器，将使用第一个。
         :param name: 要获取其值的属性名称。
         """
-        element = self._find_element_cross_frame(selector)
-        return element.get_attribute(name)
+        return self._memoize(
+            "get_attribute", selector, (name,),
+            lambda: self._find_element_cross_frame(selector).get_attribute(name)
+        )
 
+    @instrumented
     def get_table_cell(self, row_header: str, column_headers: List[str] = None):
         """获得单元格。
         如果有一个东西看起来像二维表，那么就可以使用行标题或列标题去取得单元格。
-        如果不提供 `column_headers` ，那么将返回文本值匹配 `row_header` 的元素右侧的一个元素。
+        如果不提供 `column_headers` ，那么将返回文本包含 `row_header`（不区分大小写，与 `:text()` 相同）的元素右侧的一个元素，
+        找不到时返回 None。提供 `column_headers` 时，行标题和列标题按完整文本精确匹配（与 `text='...'` 相同）。
+        标题只匹配可见的文本，不包括脚本和样式的内容。
+
+        定位在页面内一次完成，不再为每个候选标题单独读取位置。
 
         :param column_headers: 列标题
         :param row_header: 行标题
         """
-
-        def get_top_column_header_element(cell_text, limit_x):
-            __column_header_elements = self._obj.query_selector_all(f"text='{cell_text}'")
-            for __column_header_element in __column_header_elements:
-                if __column_header_element.bounding_box()["x"] >= limit_x:
-                    return __column_header_element
-
-        def get_target_column_header_element(cell_text, limit_min_x, limit_max_x):
-            __column_header_elements = self._obj.query_selector_all(f"text='{cell_text}'")
-            for __column_header_element in __column_header_elements:
-                if (
-                        __column_header_element.bounding_box()["x"] >= limit_min_x
-                        and __column_header_element.bounding_box()["x"]
-                        + __column_header_element.bounding_box()["width"] <= limit_max_x
-                ):
-                    return __column_header_element
-
-        row_header_element = self._obj.query_selector(f"text='{row_header}'")
-        if not column_headers:
-            return self._obj.query_selector(f"*:right-of(:text('{row_header}'))")
-        row_header_element_box = row_header_element.bounding_box()
-        row_header_element_position = Position(
-            x=row_header_element_box["x"] + row_header_element_box["width"] / 2,
-            y=row_header_element_box["y"] + row_header_element_box["height"] / 2
-        )
-        column_min_x = row_header_element_box["x"] + row_header_element_box["width"]
-        if len(column_headers) > 1:
-            top_column_header_element = get_top_column_header_element(column_headers[0], column_min_x)
-            coordinate_range = (
-                top_column_header_element.bounding_box()["x"],
-                top_column_header_element.bounding_box()["x"] + top_column_header_element.bounding_box()["width"]
-            )
-            target_column_header_element = get_target_column_header_element(
-                column_headers[1],
-                coordinate_range[0],
-                coordinate_range[1]
-            )
-        else:
-            target_column_header_element = get_top_column_header_element(column_headers[0], column_min_x)
-        target_column_header_element_position = Position(
-            x=target_column_header_element.bounding_box()["x"] + target_column_header_element.bounding_box()[
-                "width"] / 2,
-            y=target_column_header_element.bounding_box()["y"] + target_column_header_element.bounding_box()[
-                "height"] / 2
-        )
-        cell_position = Position(
-            x=target_column_header_element_position.get("x"),
-            y=row_header_element_position.get("y")
-        )
-        return self._obj.evaluate_handle(
-            f"document.elementFromPoint({cell_position.get('x')}, {cell_position.get('y')})")
-
+        cell = call_handle(self._obj, "tableCell", {"rowHeader": row_header, "columnHeaders": column_headers})
+        self._check_deadline("get_table_cell")
+        element = cell.as_element()
+        if element is None:  # 找不到元素
+            cell.dispose()
+        return element
+
+    @instrumented
     def go_back(
             self,
             timeout: float = None,
-            wait_until: Literal["domcontentloaded", "load", "networkidle"] = None
+            wait_until: Literal["commit", "domcontentloaded", "load", "networkidle"] = None,
+            *,
+            ready_selector: str = None,
+            ready_function: str = None,
+            ready_requests: ReadyRequests = None,
     ):
         """导航到历史记录的上一页。
         返回主要资源响应。
@@ -375,24 +552,32 @@ class Interaction:
             'domcontentloaded' - 当 DOMContentLoaded 事件被触发时，认为操作完成。
             'load' - 当加载事件被触发时，认为操作已经完成。
             'networkidle' - 当至少 500 毫秒没有网络连接时，认为操作完成。
+            'commit' - 当收到网络响应并且文档开始加载时，认为操作完成。
+        :param ready_selector: 就绪条件：该选择器对应的元素变为可见。
+        :param ready_function: 就绪条件：该 JavaScript 表达式或函数的值为真。
+        :param ready_requests: 就绪条件：每个 URL 正则表达式都至少有一个匹配的请求完成。
         """
-        if type(self._obj).__name__ == "Page":
-            return self._obj.go_back(
-                timeout=timeout,
-                wait_until=wait_until,
-            )
-        elif type(self._obj).__name__ == "Frame":
-            return self._obj.page.go_back(
-                timeout=timeout,
-                wait_until=wait_until,
-            )
-        else:
+        if not self._navigable:
             raise TypeError(f"{self._obj}的类型应当是 Page 类型或 Frame 类型。")
+        return self._navigate(
+            NavigationTiming("go_back"),
+            self._page().go_back,
+            timeout=timeout,
+            wait_until=wait_until,
+            ready_selector=ready_selector,
+            ready_function=ready_function,
+            ready_requests=ready_requests,
+        )
 
+    @instrumented
     def go_forward(
             self,
             timeout: float = None,
-            wait_until: Literal["domcontentloaded", "load", "networkidle"] = None
+            wait_until: Literal["commit", "domcontentloaded", "load", "networkidle"] = None,
+            *,
+            ready_selector: str = None,
+            ready_function: str = None,
+            ready_requests: ReadyRequests = None,
     ):
         """导航到历史记录的下一页。
         返回主要资源响应。
@@ -408,27 +593,34 @@ class Interaction:
             'domcontentloaded' - 当 DOMContentLoaded 事件被触发时，认为操作完成。
             'load' - 当加载事件被触发时，认为操作已经完成。
             'networkidle' - 当至少 500 毫秒没有网络连接时，认为操作完成。
+            'commit' - 当收到网络响应并且文档开始加载时，认为操作完成。
+        :param ready_selector: 就绪条件：该选择器对应的元素变为可见。
+        :param ready_function: 就绪条件：该 JavaScript 表达式或函数的值为真。
+        :param ready_requests: 就绪条件：每个 URL 正则表达式都至少有一个匹配的请求完成。
         """
-        if type(self._obj).__name__ == "Page":
-            return self._obj.go_forward(
-                timeout=timeout,
-                wait_until=wait_until,
-            )
-        elif type(self._obj).__name__ == "Frame":
-            return self._obj.page.go_forward(
-                timeout=timeout,
-                wait_until=wait_until,
-            )
-        else:
+        if not self._navigable:
             raise TypeError(f"{self._obj}的类型应当是 Page 类型或 Frame 类型。")
+        return self._navigate(
+            NavigationTiming("go_forward"),
+            self._page().go_forward,
+            timeout=timeout,
+            wait_until=wait_until,
+            ready_selector=ready_selector,
+            ready_function=ready_function,
+            ready_requests=ready_requests,
+        )
 
+    @instrumented
     def goto(
             self,
             url: str,
             *,
             timeout: float = None,
-            wait_until: Literal["domcontentloaded", "load", "networkidle"] = None,
-            referer: str = None
+            wait_until: Literal["commit", "domcontentloaded", "load", "networkidle"] = None,
+            referer: str = None,
+            ready_selector: str = None,
+            ready_function: str = None,
+            ready_requests: ReadyRequests = None,
     ):
         """导航到 `url`
         返回主要资源响应。 在多次重定向的情况下，导航将使用上次重定向的响应进行解析。
@@ -454,15 +646,69 @@ class Interaction:
             'domcontentloaded' - 当 DOMContentLoaded 事件被触发时，认为操作完成。
             'load' - 当加载事件被触发时，认为操作已经完成。
             'networkidle' - 当至少 500 毫秒没有网络连接时，认为操作完成。
+            'commit' - 当收到网络响应并且文档开始加载时，认为操作完成。
         :param referer: 引用标头值。 如果提供，它将优先于 page.set_extra_http_headers(headers) 设置的引用标头值.
+        :param ready_selector: 就绪条件：该选择器对应的元素变为可见。
+        :param ready_function: 就绪条件：该 JavaScript 表达式或函数的值为真。
+        :param ready_requests: 就绪条件：每个 URL 正则表达式都至少有一个匹配的请求完成。
+
+        提供任意一个就绪条件时，导航在提交（commit）后开始等待就绪条件，全部满足即返回，而不再等待 load 事件。
+        这对持续轮询的单页应用（networkidle 永远不会到来）或包含大量无关资源的页面很有用。
+        就绪条件与导航共用同一个超时时间，每次导航的耗时和节省的等待时间记录在
+        `PlaywrightManager.navigation_timings()` 中。
+
+        ```py
+        pm.interaction.goto("https://example.com/app", ready_selector="#dashboard", ready_requests=r"/api/profile")
+        ```
         """
-        return self._obj.goto(
-            url=url,
+        return self._navigate(
+            NavigationTiming("goto", url),
+            lambda **options: self._obj.goto(url=url, referer=referer, **options),
             timeout=timeout,
             wait_until=wait_until,
-            referer=referer,
+            ready_selector=ready_selector,
+            ready_function=ready_function,
+            ready_requests=ready_requests,
         )
 
+    def _navigate(
+            self,
+            timing: NavigationTiming,
+            navigate,
+            *,
+            timeout: Optional[float],
+            wait_until: Optional[str],
+            ready_selector: Optional[str],
+            ready_function: Optional[str],
+            ready_requests: Optional[ReadyRequests],
+    ):
+        """执行导航。有就绪条件时以 commit 导航，然后等待所有就绪条件满足，并记录耗时。"""
+        if ready_selector is None and ready_function is None and ready_requests is None:
+            return navigate(timeout=self._budget(timeout), wait_until=wait_until)
+        page = self._page()
+        matchers = request_matchers(ready_requests)
+        with contextlib.ExitStack() as stack:
+            if timeout:
+                stack.enter_context(Deadline(timeout))
+            # 请求可能在提交之前就已经发出，需要在导航之前开始等待
+            for matches in matchers:
+                stack.enter_context(page.expect_event(
+                    "requestfinished",
+                    predicate=lambda request, matches=matches: matches(request.url),
+                    timeout=self._budget(timeout),
+                ))
+            response = navigate(timeout=self._budget(timeout), wait_until=wait_until or "commit")
+            timing.mark("committed")
+            if ready_selector is not None:
+                wait_for_element(self._obj, ready_selector, timeout=self._budget(timeout), state="visible")
+            if ready_function is not None:
+                self._obj.wait_for_function(ready_function, timeout=self._budget(timeout))
+        timing.mark("ready")
+        timing.url = self._obj.url
+        watch_load(page, self._obj, timing)
+        return response
+
+    @instrumented
     def hover(
             self,
             selector: str,
@@ -491,26 +737,33 @@ class Interaction:
         element = self._find_element_cross_frame(selector=selector)
         element.hover(
             modifiers=modifiers,
-            timeout=timeout,
+            timeout=self._budget(timeout),
             position=position,
         )
 
+    @instrumented
     def inner_html(self, selector: str) -> str:
         """元素的 innerHTML 值。
 
         :param selector: 用于搜索元素的选择器。 如果有多个元素满足选择器，将使用第一个。
         """
-        element = self._find_element_cross_frame(selector)
-        return element.inner_html()
+        return self._memoize(
+            "inner_html", selector, (),
+            lambda: self._find_element_cross_frame(selector).inner_html()
+        )
 
+    @instrumented
     def inner_text(self, selector: str) -> str:
         """元素的 innerText 值。
 
         :param selector: 用于搜索元素的选择器。 如果有多个元素满足选择器，将使用第一个。
         """
-        element = self._find_element_cross_frame(selector)
-        return element.inner_text()
+        return self._memoize(
+            "inner_text", selector, (),
+            lambda: self._find_element_cross_frame(selector).inner_text()
+        )
 
+    @instrumented
     def input_value(self, selector: str, timeout: float = None) -> str:
         """元素的 value 属性的值。
 
@@ -522,32 +775,48 @@ class Interaction:
             或 page.set_default_timeout(timeout) 方法更改默认值
         """
         element = self._find_element_cross_frame(selector)
-        return element.input_value(timeout=timeout)
+        return element.input_value(timeout=self._budget(timeout))
 
+    @instrumented
     def is_checked(self, selector: str) -> bool:
         """返回是否选中元素。如果元素不是复选框或单选输入，则引发异常。"""
         return self._find_element_cross_frame(selector).is_checked()
 
+    @instrumented
     def is_disabled(self, selector: str) -> bool:
         """返回元素是否被禁用，与启用相反。"""
-        return self._find_element_cross_frame(selector).is_disabled()
+        return self._memoize(
+            "is_disabled", selector, (),
+            lambda: self._find_element_cross_frame(selector).is_disabled()
+        )
 
+    @instrumented
     def is_editable(self, selector: str) -> bool:
         """返回元素是否可编辑。"""
-        return self._find_element_cross_frame(selector).is_editable()
+        return self._memoize(
+            "is_editable", selector, (),
+            lambda: self._find_element_cross_frame(selector).is_editable()
+        )
 
+    @instrumented
     def is_enabled(self, selector: str) -> bool:
         """返回元素是否被启用。"""
-        return self._find_element_cross_frame(selector).is_enabled()
+        return self._memoize(
+            "is_enabled", selector, (),
+            lambda: self._find_element_cross_frame(selector).is_enabled()
+        )
 
+    @instrumented
     def is_hidden(self, selector: str) -> bool:
         """返回元素是否隐藏，与可见相反。 不匹配任何元素的选择器被认为是隐藏的。"""
         return self._find_element_cross_frame(selector).is_hidden()
 
+    @instrumented
     def is_visible(self, selector: str) -> bool:
         """返回元素是否可见。 不匹配任何元素的选择器被认为是不可见的。"""
         return self._find_element_cross_frame(selector).is_visible()
 
+    @instrumented
     def press(
             self,
             selector: str,
@@ -583,10 +852,11 @@ class Interaction:
         element.press(
             key=key,
             delay=delay,
-            timeout=timeout,
+            timeout=self._budget(timeout),
             no_wait_after=no_wait_after,
         )
 
+    @instrumented
     def select_option(
             self,
             selector: str,
@@ -615,13 +885,14 @@ class Interaction:
         """
         element = self._find_element_cross_frame(selector=selector)
         return element.select_option(
-            timeout=timeout,
+            timeout=self._budget(timeout),
             element=option_element,
             index=index,
             value=value,
             label=label
         )
 
+    @instrumented
     def select_option_for_ant(
             self,
             selector: str,
@@ -631,13 +902,15 @@ class Interaction:
             delay: float = None
     ):
         """仅供使用了Ant-Design的站点使用。
+
+        :param delay: 搜索后等待选项加载的最长时间（以毫秒为单位）。下拉框的 DOM 安静下来后立即继续，不会等满 `delay`。
         """
         select = self._find_element_cross_frame(selector)
         if not select:
             raise Error(f"未找到匹配选择器 {selector} 的元素")
         if "ant-" not in select.get_attribute("class"):
             raise Error("select_option_for_ant 只适用于使用 ant-design 组件的站点")
-        select.click()
+        select.click(timeout=self._budget())
         if select.content_frame():
             select_dropdown = select.content_frame().query_selector(
                 ".ant-select-dropdown:not(.ant-select-dropdown-hidden)")
@@ -646,28 +919,49 @@ class Interaction:
             select_dropdown = self._obj.query_selector(".ant-select-dropdown:not(.ant-select-dropdown-hidden)")
             search_filed = self._obj.query_selector(".ant-select-search__field >> visible=true")
         if search_filed:
-            with self._obj.expect_request_finished():
-                search_filed.fill("")
-                search_filed.fill(search_content)
-        if delay:
-            self._obj.wait_for_timeout(delay)
+            with self._obj.expect_request_finished(timeout=self._budget()):
+                search_filed.fill("", timeout=self._budget())
+                search_filed.fill(search_content, timeout=self._budget())
+        if delay and select_dropdown:
+            # 选项列表停止变化即视为加载完成，`delay` 只作为上限
+            call_on_element(select_dropdown, "domQuiet", {"quiet": min(_ANT_OPTIONS_QUIET_TIME, delay), "timeout": delay})
         options = select_dropdown.query_selector_all("li")
         matched = False
         if label:
             for opt in options:
                 if label == opt.inner_text():
-                    opt.click()
+                    opt.click(timeout=self._budget())
                     return
         elif index:
             try:
                 opt = options[index]
-                opt.click()
+                opt.click(timeout=self._budget())
                 return
             except AssertionError:  # 压制数组越界异常
                 ...
         if not matched:
             raise NoSuchOptionError(f"无法找到选项值")
 
+    @instrumented
+    def query_extract(self, selector: str, fields: Dict[str, FieldSpec] = None, *,
+                      limit: int = None) -> List[Dict[str, Any]]:
+        """通过一次 evaluate 读取所有匹配元素的文本、属性、JS 属性或位置，返回字典列表，不创建元素句柄。
+
+        ```py
+        rows = interaction.query_extract(
+            "iframe[name=main] >>> table tbody tr",
+            {"name": "td:nth-child(1)::text", "link": "a::@href", "checked": "input::prop:checked", "box": "box"},
+        )
+        ```
+
+        :param selector: 元素选择器，支持 `>>>` 跨 frame，元素部分需要是 CSS 或 XPath。
+        :param fields: 字段名到字段说明的映射，格式见 `_extract.FieldSpec`。默认只读取 innerText。
+        :param limit: 最多读取的元素数量。
+        """
+        frame, element_selector = resolve_frame(self._obj, selector)
+        return extract(frame, element_selector, fields, limit=limit)
+
+    @instrumented
     def query_selector(self, selector: str):
         """该方法在页面中查找与指定选择器匹配的元素。
         如果没有元素与选择器匹配，则返回值解析为 null。
@@ -675,15 +969,25 @@ class Interaction:
         """
         return self._find_element_cross_frame(selector)
 
+    @instrumented
     def query_selector_all(self, selector: str):
         """该方法查找页面内与指定选择器匹配的所有元素。 如果没有元素与选择器匹配，则返回值解析为 []。"""
         return self._find_element_cross_frame(selector, False)
 
+    @instrumented
+    def state_snapshot(self) -> Dict[str, Any]:
+        """返回页面状态快照：URL、标题、readyState、滚动位置、视口、焦点元素以及表单控件（密码和隐藏字段除外）的值。
+        可以用来比较操作前后的状态，或在失败时记录现场。
+        """
+        return call(self._obj, "snapshot")
+
+    @instrumented
     def uncheck(self, selector: str):
         """此方法取消选中元素匹配选择器。"""
         element = self._find_element_cross_frame(selector)
         element.uncheck()
 
+    @instrumented
     def wait_for_selector(self, selector: str, timeout: float = None,
                           state: Literal["attached", "detached", "hidden", "visible"] = None):
         """返回选择器指定的元素满足状态选项时。 如果等待隐藏或分离，则返回 null。
@@ -691,4 +995,198 @@ class Interaction:
         如果在调用方法选择器的那一刻已经满足条件，该方法将立即返回。
         如果选择器不满足超时毫秒的条件，该函数将抛出。
         """
-        return wait_for_element(self._obj, selector=selector, timeout=timeout, state=state)
+        return wait_for_element(self._obj, selector=selector, timeout=self._budget(timeout), state=state)
+
+    @instrumented
+    def wait_for_any(
+            self,
+            selectors: List[str],
+            *,
+            state: Literal["attached", "detached", "hidden", "visible"] = "visible",
+            timeout: float = None,
+    ) -> str:
+        """等待 `selectors` 中的任意一个满足状态，返回最先满足的选择器。
+        同一 frame 内的选择器由页面内的一个 MutationObserver 统一检查，条件满足后立即返回，不在 Python 端轮询。
+        选择器可以使用 `>>>` 指向不同的 frame，但 frame 内的部分只支持 CSS 或 XPath。
+
+        :param selectors: 选择器列表。
+        :param state: 要等待的状态。默认为 visible。
+        :param timeout: 以毫秒为单位的最长时间，默认为 30 秒，传递 0 以禁用超时。
+        """
+        timeout = self._budget(effective_timeout(timeout, self._default_timeout))
+        groups = self._group_selectors_by_frame(selectors)
+        if len(groups) == 1:
+            frame, items = groups[0]
+            result = call(frame, "waitForSelectors", {
+                "selectors": [selector for _, selector in items],
+                "state": state,
+                "mode": "any",
+                "timeout": timeout,
+            })
+            if result.get("timedOut"):
+                raise TimeoutError(f"等待 {selectors} 中的任意一个变为 {state} 超时（{timeout}ms）。")
+            return items[result["index"]][0]
+        # 多个 frame 中的观察者无法在同一次 evaluate 中等待，改为各自通过控制台消息通知
+        token = f"__browserWait{id(groups)}"
+        try:
+            with self._page().expect_event(
+                    "console",
+                    predicate=lambda message: message.text.startswith(token + ":"),
+                    timeout=timeout
+            ) as event_info:
+                for group, (frame, items) in enumerate(groups):
+                    call(frame, "watchSelectors", {
+                        "selectors": [selector for _, selector in items],
+                        "state": state,
+                        "mode": "any",
+                        "token": token,
+                        "group": group,
+                    })
+        except TimeoutError:
+            raise TimeoutError(f"等待 {selectors} 中的任意一个变为 {state} 超时（{timeout}ms）。")
+        finally:
+            for frame, _ in groups:
+                try:
+                    call(frame, "cancelWatch", token)
+                except Error:  # frame 可能已经分离
+                    ...
+        _, group, index = event_info.value.text.split(":")
+        return groups[int(group)][1][int(index)][0]
+
+    @instrumented
+    def wait_for_all(
+            self,
+            selectors: List[str],
+            *,
+            state: Literal["attached", "detached", "hidden", "visible"] = "visible",
+            timeout: float = None,
+    ) -> NoneType:
+        """等待 `selectors` 全部满足状态。
+        同一 frame 内的选择器由页面内的一个 MutationObserver 统一检查；多个 frame 依次等待，共用同一个超时时间。
+        选择器可以使用 `>>>` 指向不同的 frame，但 frame 内的部分只支持 CSS 或 XPath。
+
+        :param selectors: 选择器列表。
+        :param state: 要等待的状态。默认为 visible。
+        :param timeout: 以毫秒为单位的最长时间，默认为 30 秒，传递 0 以禁用超时。
+        """
+        timeout = self._budget(effective_timeout(timeout, self._default_timeout))
+        with Deadline(timeout) if timeout else contextlib.nullcontext():
+            for frame, items in self._group_selectors_by_frame(selectors):
+                result = call(frame, "waitForSelectors", {
+                    "selectors": [selector for _, selector in items],
+                    "state": state,
+                    "mode": "all",
+                    "timeout": self._budget(timeout),
+                })
+                if result.get("timedOut"):
+                    raise TimeoutError(f"等待 {selectors} 全部变为 {state} 超时（{timeout}ms）。")
+
+    @instrumented
+    def wait_for_dom_quiet(
+            self,
+            selector: str = None,
+            *,
+            quiet_time: float = 500,
+            timeout: float = None,
+    ) -> float:
+        """等待 DOM 在 `quiet_time` 毫秒内没有任何变化，返回实际等待的毫秒数。
+        适合替代“操作后固定等待一段时间”的写法：页面一旦安静下来就立即返回。
+
+        :param selector: 只观察该元素的子树。默认为整个文档。
+        :param quiet_time: 没有变化的持续时间（以毫秒为单位）。默认为 500。
+        :param timeout: 以毫秒为单位的最长时间，默认为 30 秒，传递 0 以禁用超时。
+        """
+        timeout = self._budget(effective_timeout(timeout, self._default_timeout))
+        arg = {"quiet": quiet_time, "timeout": timeout}
+        if selector is None:
+            result = call(self._obj, "domQuiet", None, arg)
+        else:
+            element = wait_for_element(self._obj, selector, timeout=timeout, state="attached")
+            result = call_on_element(element, "domQuiet", arg)
+        if result.get("timedOut"):
+            raise TimeoutError(f"等待 DOM 安静 {quiet_time}ms 超时（{timeout}ms）。")
+        return result["elapsed"]
+
+    @instrumented
+    def wait_for_element_stable(
+            self,
+            selector: str,
+            *,
+            frame_count: int = 2,
+            timeout: float = None,
+    ) -> float:
+        """等待元素的位置和尺寸在连续 `frame_count` 个动画帧内保持不变，返回实际等待的毫秒数。
+        适合等待展开动画、下拉框定位等布局变化结束。
+
+        :param selector: 用于搜索元素的选择器。 如果有多个元素满足选择器，将使用第一个。
+        :param frame_count: 保持不变的动画帧数。默认为 2。
+        :param timeout: 以毫秒为单位的最长时间，默认为 30 秒，传递 0 以禁用超时。
+        """
+        timeout = self._budget(effective_timeout(timeout, self._default_timeout))
+        element = wait_for_element(self._obj, selector, timeout=timeout, state="attached")
+        result = call_on_element(element, "elementStable", {"frames": frame_count, "timeout": timeout})
+        if result.get("detached"):
+            raise Error(f"等待元素 {selector} 稳定时元素已从 DOM 中移除。")
+        if result.get("timedOut"):
+            raise TimeoutError(f"等待元素 {selector} 稳定超时（{timeout}ms）。")
+        return result["elapsed"]
+
+    @instrumented
+    def wait_for_requests_idle(
+            self,
+            url_pattern: Union[str, Pattern] = None,
+            *,
+            idle_time: float = 0,
+            timeout: float = None,
+    ) -> float:
+        """等待页面中没有匹配 `url_pattern` 的未完成 fetch/XHR 请求，返回实际等待的毫秒数。
+        与 networkidle 不同，它只关心匹配的请求，持续轮询的接口不会阻止返回。
+
+        首次调用时会在页面中安装请求跟踪脚本，并在之后的每个文档中自动安装。安装之前已经发出的请求无法被跟踪。
+
+        :param url_pattern: 请求 URL 的正则表达式。默认为所有请求。
+        :param idle_time: 没有匹配请求的持续时间（以毫秒为单位）。默认为 0。
+        :param timeout: 以毫秒为单位的最长时间，默认为 30 秒，传递 0 以禁用超时。
+        """
+        timeout = self._budget(effective_timeout(timeout, self._default_timeout))
+        page = self._page()
+        if page not in _request_tracked_pages:
+            page.add_init_script(script=REQUEST_TRACKER_SCRIPT)
+            _request_tracked_pages.add(page)
+        self._obj.evaluate(REQUEST_TRACKER_SCRIPT)
+        result = call(self._obj, "requestsIdle", {
+            "pattern": pattern_source(url_pattern),
+            "idle": idle_time,
+            "timeout": timeout,
+        })
+        if result.get("timedOut"):
+            raise TimeoutError(f"等待请求完成超时（{timeout}ms），仍未完成的请求：{result.get('pending')}")
+        return result["elapsed"]
+
+    @instrumented
+    def wait_for_timeout(self, timeout: float):
+        """固定等待 `timeout` 毫秒。录制的计划回放时会替换为等待 DOM 安静，应尽量使用事件驱动的等待方法。
+
+        :param timeout: 等待的毫秒数。
+        """
+        self._page().wait_for_timeout(self._budget(timeout))
+
+    def _group_selectors_by_frame(self, selectors: List[str]):
+        """按所在 frame 对选择器分组。返回 [(frame, [(原选择器, 页面内选择器), ...]), ...]。"""
+        groups = []
+        for selector in selectors:
+            frame, element_selector = resolve_frame(self._obj, selector)
+            for group_frame, items in groups:
+                if group_frame is frame:
+                    items.append((selector, in_page_selector(element_selector)))
+                    break
+            else:
+                groups.append((frame, [(selector, in_page_selector(element_selector))]))
+        return groups
+
+
+# 预先为 Page 和 Frame 的公开属性和方法生成委托：属性查找失败后才会调用 __getattr__，
+# 而失败的查找需要创建 AttributeError，在频繁调用时开销明显
+for _name in sorted({name for target in (Page, Frame) for name in dir(target) if not name.startswith("_")}):
+    if not hasattr(Interaction, _name):
+        setattr(Interaction, _name, _Delegated(_name))
@@ -8,15 +8,8 @@ else:  # pragma: no cover
 
 
 def determine_element(active, selector: str, only: bool = True):
-    if is_frame_piercing_selector(selector):
-        frame_selector, element_selector = split_frame_and_element_selector(selector)
-        frame = find_frame(active, frame_selector)
-        while is_frame_piercing_selector(element_selector):
-            frame_selector, element_selector = split_frame_and_element_selector(element_selector)
-            frame = find_frame(frame, frame_selector)
-        elements = frame.query_selector_all(element_selector)
-    else:
-        elements = active.query_selector_all(selector)
+    frame, element_selector = resolve_frame(active, selector)
+    elements = frame.query_selector_all(element_selector)
     if only:
         if len(elements) == 0:
             return None
@@ -27,15 +20,20 @@ def determine_element(active, selector: str, only: bool = True):
 
 def wait_for_element(active, selector: str, timeout: float = None,
                      state: Literal["attached", "detached", "hidden", "visible"] = None):
-    if is_frame_piercing_selector(selector):
-        frame_selector, element_selector = split_frame_and_element_selector(selector)
-        frame = find_frame(active, frame_selector)
-        while is_frame_piercing_selector(element_selector):
-            frame_selector, element_selector = split_frame_and_element_selector(element_selector)
-            frame = find_frame(frame, frame_selector)
-        return frame.wait_for_selector(element_selector, timeout=timeout, state=state)
-    else:
-        return active.wait_for_selector(selector, timeout=timeout, state=state)
+    frame, element_selector = resolve_frame(active, selector)
+    return frame.wait_for_selector(element_selector, timeout=timeout, state=state)
+
+
+def resolve_frame(active, selector: str):
+    """解析跨 frame 选择器，返回元素所在的 frame 以及 frame 内的元素选择器。
+    不包含 `>>>` 的选择器返回 `active` 本身。
+    """
+    frame = active
+    element_selector = selector
+    while is_frame_piercing_selector(element_selector):
+        frame_selector, element_selector = split_frame_and_element_selector(element_selector)
+        frame = find_frame(frame, frame_selector)
+    return frame, element_selector
 
 
 def find_frame(parent, frame_selector: str):
@@ -0,0 +1,89 @@
+import functools
+import inspect
+from typing import Any, Callable, Dict
+
+# 这些方法会触发导航，超时时间的上限应使用导航超时。
+NAVIGATION_METHODS = frozenset(["goto", "go_back", "go_forward"])
+
+
+class InteractionCall:
+    __slots__ = ("interaction", "method", "arguments", "original_arguments", "accepts_timeout")
+
+    def __init__(self, interaction, method: str, arguments: Dict[str, Any], accepts_timeout: bool):
+        """一次 Interaction 方法调用，中间件可以读取或修改 `arguments`。
+
+        :param interaction: 发起调用的 Interaction。
+        :param method: 方法名。
+        :param arguments: 调用方显式传入的参数（按参数名）。
+        :param accepts_timeout: 方法是否接受 `timeout` 参数。
+        """
+        self.interaction = interaction
+        self.method = method
+        self.arguments = arguments
+        self.original_arguments = dict(arguments)  # 调用方传入的参数，不受中间件修改的影响
+        self.accepts_timeout = accepts_timeout
+
+    @property
+    def target(self):
+        """实际执行调用的 Page 或 Frame。"""
+        return self.interaction._obj
+
+    @property
+    def selector(self):
+        """调用的选择器。导航方法返回目标 URL。"""
+        for name in ("selector", "source", "url"):
+            if self.arguments.get(name) is not None:
+                return self.arguments[name]
+        return None
+
+    @property
+    def url(self) -> str:
+        """发起调用时页面的 URL。"""
+        try:
+            return self.target.url
+        except Exception:
+            return ""
+
+    @property
+    def is_navigation(self) -> bool:
+        return self.method in NAVIGATION_METHODS
+
+    def __repr__(self):
+        return f"InteractionCall({self.method}, selector={self.selector!r})"
+
+
+def instrumented(func: Callable) -> Callable:
+    """让 Interaction 的方法依次经过 `Interaction._middlewares` 中的中间件。
+
+    中间件是可调用对象 `middleware(call, proceed)`，必须调用 `proceed()` 并返回它的结果。
+    方法内部调用的其他 Interaction 方法不会再次经过中间件。
+    如果已经超过截止时间，调用会在进入中间件之前失败。
+    """
+    signature = inspect.signature(func)
+    method = func.__name__
+    accepts_timeout = "timeout" in signature.parameters
+
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        deadline = self._active_deadline()
+        if deadline is not None:
+            deadline.check(method)
+        middlewares = self._middlewares
+        if not middlewares or self._dispatching:
+            return func(self, *args, **kwargs)
+        arguments = signature.bind(self, *args, **kwargs).arguments
+        arguments.pop("self")
+        call = InteractionCall(self, method, dict(arguments), accepts_timeout)
+
+        def proceed_from(index: int):
+            if index == len(middlewares):
+                return func(self, **call.arguments)
+            return middlewares[index](call, lambda: proceed_from(index + 1))
+
+        self._dispatching = True
+        try:
+            return proceed_from(0)
+        finally:
+            self._dispatching = False
+
+    return wrapper
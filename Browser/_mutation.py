@@ -0,0 +1,406 @@
+import collections
+from typing import Callable, Dict, List, Optional
+
+from ._api_structures import ChangeBatch
+from ._api_types import Error
+from ._invoke import is_frame_piercing_selector
+from ._waits import in_page_selector
+
+BINDING_NAME = "__browserChangeFeedBinding"
+
+# 安装在每个文档中的观察者脚本。
+# 脚本通过绑定向 Python 端“握手”以获取当前关注的选择器，因此 watch() 之后导航到的新文档也会使用最新的配置；
+# 订阅已停止时握手返回 null，新文档不会启动观察者。
+# 观察者总是观察整个文档，缓存不会因为读取 root 之外的元素而过期；root 只限定批次中统计的变更。
+OBSERVER_SCRIPT = """
+(() => {
+  const BINDING = "%(binding)s";
+  if (window.__browserChangeFeed) return;
+  const state = {
+    selectors: [], root: null, interval: 50, maxAttributes: 50,
+    observer: null, records: [], timer: null, ready: null,
+    matched: new Map(),  // 每个选择器在上一个批次之后匹配的元素
+  };
+  const describe = (el) => {
+    if (!el || el.nodeType !== 1) return null;
+    let text = el.tagName.toLowerCase();
+    if (el.id) text += "#" + el.id;
+    if (typeof el.className === "string" && el.className.trim())
+      text += "." + el.className.trim().split(/\\s+/).join(".");
+    return text;
+  };
+  // 选择器无法在页面内执行时视为受影响，宁可多失效也不返回过期的值
+  const hits = (node, selector) => {
+    if (!node || node.nodeType !== 1) return false;
+    try {
+      return node.matches(selector) || !!node.querySelector(selector);
+    } catch (e) {
+      return true;
+    }
+  };
+  const inside = (node, selector) => {
+    const el = node && node.nodeType === 1 ? node : node && node.parentElement;
+    try {
+      return !!(el && el.closest(selector));
+    } catch (e) {
+      return true;
+    }
+  };
+  // 变化的节点是之前匹配的元素、它的祖先或后代：元素可能不再匹配（例如移除了 class），
+  // 祖先的属性和子树变化也会影响 innerText 和禁用状态
+  const touches = (node, selector) => {
+    const el = node && node.nodeType === 1 ? node : node && node.parentElement;
+    if (!el) return false;
+    for (const previous of state.matched.get(selector) || []) {
+      if (el === previous || el.contains(previous) || previous.contains(el)) return true;
+    }
+    return false;
+  };
+  const remember = () => {
+    state.matched = new Map();
+    for (const {selector} of state.selectors) {
+      try {
+        state.matched.set(selector, [...document.querySelectorAll(selector)]);
+      } catch (e) {
+        state.matched.set(selector, []);
+      }
+    }
+  };
+  const collect = (records) => {
+    const batch = {added: 0, removed: 0, text: 0, attributes: [], selectors: [], scoped: false};
+    const affected = new Set();
+    for (const record of records) {
+      if (state.root && !inside(record.target, state.root)) {
+        // root 之外的变更不计入统计，但仍然要判断关注的选择器是否受影响
+      } else if (record.type === "childList") {
+        batch.scoped = true;
+        batch.added += record.addedNodes.length;
+        batch.removed += record.removedNodes.length;
+      } else if (record.type === "characterData") {
+        batch.scoped = true;
+        batch.text += 1;
+      } else if (record.type === "attributes") {
+        batch.scoped = true;
+        if (batch.attributes.length < state.maxAttributes)
+          batch.attributes.push({target: describe(record.target), name: record.attributeName});
+      }
+      for (const {name, selector} of state.selectors) {
+        if (affected.has(name)) continue;
+        if (inside(record.target, selector) || touches(record.target, selector)) {
+          affected.add(name);
+          continue;
+        }
+        for (const node of [...record.addedNodes, ...record.removedNodes]) {
+          if (hits(node, selector)) {
+            affected.add(name);
+            break;
+          }
+        }
+      }
+    }
+    batch.selectors = [...affected];
+    remember();
+    return batch;
+  };
+  const flush = async () => {
+    if (state.ready) await state.ready;
+    if (state.timer !== null) {
+      clearTimeout(state.timer);
+      state.timer = null;
+    }
+    if (state.observer) state.records.push(...state.observer.takeRecords());
+    if (!state.records.length) return;
+    const records = state.records;
+    state.records = [];
+    await window[BINDING]({type: "batch", url: location.href, batch: collect(records)});
+  };
+  const observe = () => {
+    if (state.observer) state.observer.disconnect();
+    const root = document.documentElement;
+    if (!root) return;
+    state.observer = new MutationObserver((records) => {
+      state.records.push(...records);
+      if (state.timer === null) state.timer = setTimeout(flush, state.interval);
+    });
+    state.observer.observe(root, {
+      subtree: true, childList: true, attributes: true, characterData: true,
+    });
+    remember();
+  };
+  const configure = (config) => {
+    state.selectors = config.selectors || [];
+    state.root = config.root || null;
+    state.interval = config.interval;
+    state.maxAttributes = config.maxAttributes;
+    observe();
+  };
+  const start = async () => {
+    const config = await window[BINDING]({type: "hello", url: location.href});
+    if (config) configure(config);
+  };
+  window.__browserChangeFeed = {
+    flush,
+    configure,
+    disconnect: () => {
+      if (state.observer) state.observer.disconnect();
+      state.observer = null;
+      state.records = [];
+    },
+  };
+  if (document.documentElement) {
+    state.ready = start();
+  } else {
+    state.ready = new Promise((resolve) =>
+      document.addEventListener("DOMContentLoaded", () => start().then(resolve), {once: true}));
+  }
+})();
+"""
+
+# Interaction 中可以缓存结果的只读方法。
+# input_value、is_checked 等取决于 DOM 属性（property）的方法不会产生变更记录，因此不进行缓存。
+MEMOIZABLE_METHODS = frozenset([
+    "inner_text",
+    "inner_html",
+    "get_attribute",
+    "is_disabled",
+    "is_enabled",
+    "is_editable",
+])
+
+
+class ChangeFeed:
+    def __init__(
+            self,
+            page,
+            *,
+            selectors: List[str] = None,
+            root: str = None,
+            interval: float = 50,
+            max_batches: int = 1000,
+            max_attributes: int = 50,
+            max_memo_entries: int = 1024,
+            flush_on_read: bool = True,
+    ):
+        """通过 MutationObserver 订阅页面的 DOM 变更。
+
+        页面内的变更会按 `interval` 毫秒合并为批次，再通过绑定函数推送到 Python 端。
+        每收到一个批次，代数计数器 `generation` 加一；被关注的选择器所在子树发生变化时，该选择器的代数也会更新。
+        Interaction 的只读方法据此缓存结果，直到相关子树真正发生变化。
+        为了让缓存的代数覆盖整个文档，观察者总是观察整个文档，`root` 只决定哪些批次记录到 `batches` 并通知订阅者。
+
+        注意，同步 API 只在调用 Playwright 方法期间分发绑定消息。
+
+        :param page: 要观察的页面，页面内的所有 frame 都会被观察。
+        :param selectors: 关注的 CSS 选择器。不支持跨 frame 语法 `>>>` 和 Playwright 特有的选择器引擎（text= 等）。
+        :param root: 关注的根元素的 CSS 选择器，默认为整个文档。只包含 root 之外变更的批次仍然会更新代数，
+            但不会记录到 `batches`，也不会通知订阅者。
+        :param interval: 合并变更记录的时间窗口（以毫秒为单位）。
+        :param max_batches: `batches` 中最多保留的批次数量。
+        :param max_attributes: 每个批次中最多记录的属性变更数量。
+        :param max_memo_entries: 最多缓存的只读结果数量。
+        :param flush_on_read: 读取缓存之前是否先让页面推送尚未发送的变更。关闭后读取更快，但可能读到过期的值。
+        """
+        self._page = page
+        self._selectors: List[str] = []
+        self._css: Dict[str, str] = {}  # 关注的选择器在页面内使用的 CSS 选择器
+        self._root = root
+        self._interval = interval
+        self._max_attributes = max_attributes
+        self._max_memo_entries = max_memo_entries
+        self.flush_on_read = flush_on_read
+
+        self.generation = 0  # 收到的批次总数
+        self.batches = collections.deque(maxlen=max_batches)  # 最近收到的批次
+        self.active = False
+        self._selector_generations: Dict[str, int] = {}
+        self._subscribers: List[Callable[[ChangeBatch], None]] = []
+        self._memo = collections.OrderedDict()
+        self._installed = False
+        for selector in selectors or []:
+            self._add_selector(selector)
+
+    @property
+    def page(self):
+        return self._page
+
+    @property
+    def selectors(self) -> List[str]:
+        return list(self._selectors)
+
+    def start(self):
+        """在页面中安装观察者并开始接收变更。"""
+        if not self._installed:
+            self._page.expose_binding(BINDING_NAME, self._on_message)
+            self._page.add_init_script(script=OBSERVER_SCRIPT % {"binding": BINDING_NAME})
+            self._installed = True
+        self.active = True
+        for frame in self._page.frames:
+            try:
+                frame.evaluate(OBSERVER_SCRIPT % {"binding": BINDING_NAME})
+                frame.evaluate("config => window.__browserChangeFeed.configure(config)", self._config())
+            except Exception:  # frame 可能已经分离
+                ...
+        return self
+
+    def stop(self):
+        """断开页面中的观察者，并清空缓存。
+        绑定函数和初始化脚本无法从页面移除，之后可以再次调用 `start`。
+        """
+        self.active = False
+        self._memo.clear()
+        for frame in self._page.frames:
+            try:
+                frame.evaluate("() => window.__browserChangeFeed && window.__browserChangeFeed.disconnect()")
+            except Exception:
+                ...
+
+    def configure(self, *, root: str = None, interval: float = None):
+        """修改关注的根元素和合并变更记录的时间窗口，立即应用到页面中已有的文档。
+
+        :param root: 关注的根元素的 CSS 选择器。
+        :param interval: 合并变更记录的时间窗口（以毫秒为单位）。
+        """
+        if root is not None:
+            self._root = root
+        if interval is not None:
+            self._interval = interval
+        self._reconfigure()
+
+    def watch(self, selector: str):
+        """关注 `selector` 所在的子树。"""
+        self._add_selector(selector)
+        self._reconfigure()
+
+    def unwatch(self, selector: str):
+        """不再关注 `selector`。"""
+        if selector in self._selectors:
+            self._selectors.remove(selector)
+            self._css.pop(selector, None)
+            self._selector_generations.pop(selector, None)
+            self._reconfigure()
+
+    def subscribe(self, callback: Callable[[ChangeBatch], None]) -> Callable[[], None]:
+        """每收到一个批次就调用 `callback`。返回取消订阅的函数。"""
+        self._subscribers.append(callback)
+
+        def unsubscribe():
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+
+        return unsubscribe
+
+    def flush(self, frame=None):
+        """让页面立即推送尚未发送的变更。返回时所有已发生的变更都已计入 `generation`。
+
+        :param frame: 要推送的 frame，默认为主 frame。
+        """
+        target = frame or self._page
+        if self.active:
+            target.evaluate("() => window.__browserChangeFeed && window.__browserChangeFeed.flush()")
+
+    def generation_of(self, selector: str = None) -> int:
+        """返回 `selector` 的代数。未关注的选择器返回全局代数。"""
+        if selector is not None and selector in self._selector_generations:
+            return self._selector_generations[selector]
+        return self.generation
+
+    def memoize(self, active, method: str, selector: str, args: tuple, producer: Callable):
+        """返回缓存的只读结果，子树发生变化后重新调用 `producer`。
+
+        :param active: 执行读取的 Page 或 Frame。
+        :param method: Interaction 的方法名。
+        :param selector: 元素选择器。
+        :param args: 其他影响结果的参数。
+        :param producer: 实际读取结果的函数。
+        """
+        if (
+                not self.active
+                or method not in MEMOIZABLE_METHODS
+                or is_frame_piercing_selector(selector)
+        ):
+            return producer()
+        if self.flush_on_read:
+            self.flush(active)
+        key = (id(active), method, selector, args)
+        generation = self.generation_of(selector)
+        cached = self._memo.get(key)
+        if cached is not None and cached[0] == generation:
+            self._memo.move_to_end(key)
+            return cached[1]
+        value = producer()
+        self._memo[key] = (generation, value)
+        self._memo.move_to_end(key)
+        while len(self._memo) > self._max_memo_entries:
+            self._memo.popitem(last=False)
+        return value
+
+    def _add_selector(self, selector: str):
+        if is_frame_piercing_selector(selector):
+            raise ValueError(f"ChangeFeed 不支持跨 frame 选择器：{selector}")
+        # 页面内通过 matches()/closest() 判断变更是否相关，只能使用 CSS 选择器
+        try:
+            converted = in_page_selector(selector)
+        except Error as e:
+            raise ValueError(f"ChangeFeed 只支持 CSS 选择器：{e}") from e
+        if converted["kind"] != "css":
+            raise ValueError(f"ChangeFeed 只支持 CSS 选择器：{selector}")
+        if selector not in self._selectors:
+            self._selectors.append(selector)
+            self._css[selector] = converted["value"]
+            self._selector_generations[selector] = self.generation
+
+    def _config(self) -> Dict:
+        return {
+            "selectors": [{"name": selector, "selector": self._css[selector]} for selector in self._selectors],
+            "root": self._root,
+            "interval": self._interval,
+            "maxAttributes": self._max_attributes,
+        }
+
+    def _reconfigure(self):
+        if not self.active:
+            return
+        for frame in self._page.frames:
+            try:
+                frame.evaluate(
+                    "config => window.__browserChangeFeed && window.__browserChangeFeed.configure(config)",
+                    self._config()
+                )
+            except Exception:
+                ...
+
+    def _on_message(self, source: Dict, message: Dict) -> Optional[Dict]:
+        if message.get("type") == "hello":
+            # 新文档替换了旧文档，所有缓存都失效
+            self._bump(self._selectors)
+            # 订阅已停止时不在新文档中启动观察者
+            return self._config() if self.active else None
+        if not self.active:
+            return None
+        raw = message.get("batch") or {}
+        self._bump(raw.get("selectors", []))
+        if not raw.get("scoped", True):
+            return None
+        batch = ChangeBatch(
+            generation=self.generation,
+            url=message.get("url"),
+            frame=source.get("frame"),
+            added=raw.get("added", 0),
+            removed=raw.get("removed", 0),
+            text=raw.get("text", 0),
+            attributes=raw.get("attributes", []),
+            selectors=raw.get("selectors", []),
+        )
+        self.batches.append(batch)
+        for subscriber in list(self._subscribers):
+            subscriber(batch)
+        return None
+
+    def _bump(self, selectors: List[str]):
+        self.generation += 1
+        for selector in selectors:
+            if selector in self._selector_generations:
+                self._selector_generations[selector] = self.generation
+
+    def __repr__(self):
+        return f"ChangeFeed(selectors={self._selectors!r}, generation={self.generation})"
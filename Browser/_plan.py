@@ -0,0 +1,367 @@
+import json
+import re
+import time
+from typing import Any, Dict, List, Optional
+
+from ._api_types import Error, TimeoutError
+from ._invoke import is_frame_piercing_selector, resolve_frame
+from ._middleware import InteractionCall
+from ._waits import in_page_selector
+
+PLAN_VERSION = 1
+
+# 可以在一次 evaluate 中合并执行的只读方法。
+BATCHABLE_READS = frozenset([
+    "inner_text",
+    "inner_html",
+    "get_attribute",
+    "input_value",
+    "is_checked",
+    "is_disabled",
+    "is_enabled",
+    "is_hidden",
+    "is_visible",
+])
+
+# 按顺序填充多个字段。使用原型上的 value setter，React 等框架也能收到 input 事件。
+# 遇到找不到的元素时停止，返回已填充的数量，剩余的步骤由调用方逐个执行。
+_BATCH_FILL_SCRIPT = """
+(items) => {
+  const query = (sel) => sel.kind === "xpath"
+    ? document.evaluate(sel.value, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue
+    : document.querySelector(sel.value);
+  for (let i = 0; i < items.length; i++) {
+    const el = query(items[i].selector);
+    if (!el) return i;
+    el.focus();
+    if (el instanceof HTMLInputElement || el instanceof HTMLTextAreaElement) {
+      const proto = el instanceof HTMLInputElement ? HTMLInputElement.prototype : HTMLTextAreaElement.prototype;
+      Object.getOwnPropertyDescriptor(proto, "value").set.call(el, items[i].value);
+    } else if (el.isContentEditable) {
+      el.textContent = items[i].value;
+    } else {
+      return i;
+    }
+    el.dispatchEvent(new Event("input", {bubbles: true}));
+    el.dispatchEvent(new Event("change", {bubbles: true}));
+  }
+  return items.length;
+}
+"""
+
+# 一次读取多个元素的状态。找不到的元素返回 {found: false}，由调用方逐个等待。
+_BATCH_READ_SCRIPT = """
+(items) => {
+  const query = (sel) => sel.kind === "xpath"
+    ? document.evaluate(sel.value, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue
+    : document.querySelector(sel.value);
+  const visible = (el) => {
+    const rect = el.getBoundingClientRect();
+    return rect.width > 0 && rect.height > 0 && getComputedStyle(el).visibility !== "hidden";
+  };
+  return items.map(({method, selector, name}) => {
+    const el = query(selector);
+    if (method === "is_hidden") return {found: true, value: !el || !visible(el)};
+    if (!el) return {found: false};
+    switch (method) {
+      case "inner_text": return {found: true, value: el.innerText};
+      case "inner_html": return {found: true, value: el.innerHTML};
+      case "get_attribute": return {found: true, value: el.getAttribute(name)};
+      case "input_value": return {found: true, value: el.value};
+      case "is_checked": return {found: true, value: !!el.checked};
+      case "is_disabled": return {found: true, value: !!el.disabled};
+      case "is_enabled": return {found: true, value: !el.disabled};
+      case "is_visible": return {found: true, value: visible(el)};
+    }
+    return {found: false};
+  });
+}
+"""
+
+
+class Plan:
+    def __init__(self, steps: List[Dict[str, Any]] = None, metadata: Dict[str, Any] = None):
+        """录制得到的交互计划，可以保存为 JSON 并回放。
+
+        每个步骤包含 method、arguments、frame（录制时交互对象所在的子 frame）、url、started（相对录制开始的毫秒数）
+        和 elapsed（耗时毫秒数）。
+        """
+        self.steps = steps or []
+        self.metadata = metadata or {}
+
+    def save(self, path: str):
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump({"version": PLAN_VERSION, "metadata": self.metadata, "steps": self.steps}, file,
+                      ensure_ascii=False, indent=2)
+
+    @classmethod
+    def load(cls, path: str) -> "Plan":
+        with open(path, encoding="utf-8") as file:
+            data = json.load(file)
+        if data.get("version") != PLAN_VERSION:
+            raise Error(f"不支持的计划版本 {data.get('version')}，当前版本为 {PLAN_VERSION}。")
+        return cls(data["steps"], data.get("metadata"))
+
+    @property
+    def recorded_time(self) -> float:
+        """录制时从第一个步骤开始到最后一个步骤结束的毫秒数。"""
+        if not self.steps:
+            return 0
+        last = self.steps[-1]
+        return last["started"] + last["elapsed"]
+
+    def __len__(self):
+        return len(self.steps)
+
+    def __repr__(self):
+        return f"Plan({len(self.steps)} steps)"
+
+
+class PlanRecorder:
+    def __init__(self):
+        """记录每一次 Interaction 调用的中间件，录制结果为 `plan`。
+
+        参数中的正则表达式会被保存为 {"$regex": 表达式}，无法序列化的参数（例如函数）会使该步骤无法回放。
+        失败的调用同样会被记录，步骤中的 error 为异常信息。外层中间件（例如 CrashRecovery）重试同一个调用时，
+        只保留最后一次尝试。
+        """
+        self.plan = Plan()
+        self._origin: Optional[float] = None
+        self._last: Optional[tuple] = None  # 最近记录的 (调用, 步骤)
+
+    def __call__(self, call: InteractionCall, proceed):
+        now = time.perf_counter()
+        if self._origin is None:
+            self._origin = now
+        if self._last is not None and self._last[0] is call:
+            # 同一个调用再次经过中间件，是外层中间件的重试，丢弃之前失败的尝试
+            previous = self._last[1]
+            self.plan.steps = [step for step in self.plan.steps if step is not previous]
+        step = {
+            "method": call.method,
+            # 记录调用方传入的参数：外层中间件（例如 AdaptiveTimeouts 注入的 timeout）的修改不属于计划
+            "arguments": {name: _encode(value) for name, value in call.original_arguments.items()},
+            "frame": _frame_of(call.target),
+            "url": call.url,
+            "started": (now - self._origin) * 1000,
+        }
+        try:
+            return proceed()
+        except Exception as e:
+            step["error"] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            step["elapsed"] = (time.perf_counter() - now) * 1000
+            self.plan.steps.append(step)
+            self._last = (call, step)
+
+
+class PlanPlayer:
+    def __init__(
+            self,
+            manager,
+            *,
+            batch_fills: bool = True,
+            batch_reads: bool = True,
+            replace_sleeps: bool = True,
+            quiet_time: float = 100,
+            skip_failed: bool = False,
+    ):
+        """加速回放录制的计划。
+
+        回放前按步骤预先解析选择器：`>>>` 选择器所在的 frame 只解析一次并在之后的步骤中复用，
+        同一 frame 中连续的 fill 和连续的只读调用分别合并为一次 evaluate，
+        固定等待（wait_for_timeout）替换为等待 DOM 安静，最长不超过录制时的等待时间。
+        无法合并的步骤、选择器不是 CSS/XPath 的步骤或找不到元素的步骤，都回退为普通的 Interaction 调用。
+        注意，合并执行的步骤不经过中间件。
+        录制时失败的步骤（例如点击可能不存在的弹窗）单独执行且容忍失败，异常记录在结果的 errors 中，不会中止回放。
+
+        :param manager: PlaywrightManager 实例，回放使用它当前的页面或 frame。
+        :param batch_fills: 是否合并连续的 fill。合并后通过原生 value setter 赋值并触发 input 和 change 事件。
+        :param batch_reads: 是否合并连续的只读调用。
+        :param replace_sleeps: 是否将固定等待替换为等待 DOM 安静。
+        :param quiet_time: 替换固定等待时要求的 DOM 安静时间（以毫秒为单位）。
+        :param skip_failed: 是否跳过录制时失败的步骤。默认执行这些步骤并容忍失败。
+        """
+        self._manager = manager
+        self.batch_fills = batch_fills
+        self.batch_reads = batch_reads
+        self.replace_sleeps = replace_sleeps
+        self.quiet_time = quiet_time
+        self.skip_failed = skip_failed
+        self._frames: Dict[Any, Any] = {}  # (交互对象, frame 选择器) => Frame
+
+    def run(self, plan: Plan) -> Dict[str, Any]:
+        """回放计划，返回每个步骤的结果和统计信息。
+
+        返回值包含 results（与步骤一一对应的返回值）、elapsed（回放耗时）、recorded（录制耗时）、
+        batched（合并执行的步骤数）、sleep_saved（替换固定等待节省的毫秒数）、
+        errors（录制时失败、回放时再次失败的步骤序号 => 异常信息）和 skipped（跳过的步骤序号）。
+        """
+        steps = plan.steps
+        for step in steps:
+            for value in step["arguments"].values():
+                if isinstance(value, dict) and "$opaque" in value:
+                    raise Error(f"步骤 {step['method']} 包含无法序列化的参数 {value['$opaque']}，不能回放。")
+        report = {
+            "results": [None] * len(steps),
+            "batched": 0,
+            "sleep_saved": 0.0,
+            "recorded": plan.recorded_time,
+            "errors": {},
+            "skipped": [],
+        }
+        started = time.perf_counter()
+        index = 0
+        while index < len(steps):
+            index = self._run_from(steps, index, report)
+        report["elapsed"] = (time.perf_counter() - started) * 1000
+        return report
+
+    def _run_from(self, steps: List[Dict[str, Any]], index: int, report: Dict[str, Any]) -> int:
+        """从 `index` 开始执行一个步骤或一组合并的步骤，返回下一个步骤的位置。"""
+        step = steps[index]
+        method = step["method"]
+        if "error" in step:
+            if self.skip_failed:
+                report["skipped"].append(index)
+                return index + 1
+            try:
+                report["results"][index] = self._call(step)
+            except Exception as e:  # 录制时就失败的步骤，回放时失败同样是预期的
+                report["errors"][index] = f"{type(e).__name__}: {e}"
+            return index + 1
+        if method == "fill" and self.batch_fills:
+            group = self._group(steps, index, lambda item: item["method"] == "fill" and _simple_fill(item))
+            if len(group) > 1:
+                return index + self._batch_fill(steps, index, group, report)
+        if method in BATCHABLE_READS and self.batch_reads:
+            group = self._group(steps, index, lambda item: item["method"] in BATCHABLE_READS and "error" not in item)
+            if len(group) > 1:
+                return index + self._batch_read(steps, index, group, report)
+        if method == "wait_for_timeout" and self.replace_sleeps:
+            timeout = _decode(step["arguments"]["timeout"])
+            if timeout > 0:
+                try:
+                    waited = self._interaction(step).wait_for_dom_quiet(
+                        quiet_time=min(self.quiet_time, timeout), timeout=timeout
+                    )
+                except TimeoutError:  # 页面一直在变化，等满录制时的时间
+                    waited = timeout
+                report["sleep_saved"] += max(0.0, timeout - waited)
+            return index + 1
+        report["results"][index] = self._call(step)
+        return index + 1
+
+    def _group(self, steps, index: int, accepts) -> List[tuple]:
+        """收集从 `index` 开始、同一 frame 中满足 `accepts` 的连续步骤，返回 [(frame, 页面内选择器), ...]。"""
+        group = []
+        frame = None
+        for step in steps[index:]:
+            if not accepts(step):
+                break
+            resolved = self._resolve(step)
+            if resolved is None or (frame is not None and resolved[0] is not frame):
+                break
+            frame = resolved[0]
+            group.append(resolved)
+        return group
+
+    def _batch_fill(self, steps, index: int, group: List[tuple], report: Dict[str, Any]) -> int:
+        frame = group[0][0]
+        items = [
+            {"selector": selector, "value": _decode(steps[index + offset]["arguments"]["value"])}
+            for offset, (_, selector) in enumerate(group)
+        ]
+        filled = frame.evaluate(_BATCH_FILL_SCRIPT, items)
+        report["batched"] += filled
+        if filled < len(group):
+            # 找不到的元素交给常规路径等待
+            report["results"][index + filled] = self._call(steps[index + filled])
+            return filled + 1
+        return filled
+
+    def _batch_read(self, steps, index: int, group: List[tuple], report: Dict[str, Any]) -> int:
+        frame = group[0][0]
+        items = []
+        for offset, (_, selector) in enumerate(group):
+            arguments = steps[index + offset]["arguments"]
+            items.append({"method": steps[index + offset]["method"], "selector": selector, "name": arguments.get("name")})
+        values = frame.evaluate(_BATCH_READ_SCRIPT, items)
+        for offset, value in enumerate(values):
+            if value["found"]:
+                report["results"][index + offset] = value["value"]
+                report["batched"] += 1
+            else:
+                report["results"][index + offset] = self._call(steps[index + offset])
+        return len(group)
+
+    def _resolve(self, step: Dict[str, Any]) -> Optional[tuple]:
+        """返回步骤的元素所在的 frame 和页面内选择器。不能在页面内查询时返回 None。"""
+        selector = step["arguments"].get("selector")
+        if not isinstance(selector, str):
+            return None
+        target = self._target(step)
+        frame = target
+        element_selector = selector
+        if is_frame_piercing_selector(selector):
+            frame_selector, element_selector = selector.rsplit(" >>> ", 1)
+            key = (target, frame_selector)
+            frame = self._frames.get(key)
+            if frame is None or frame.is_detached():
+                frame, _ = resolve_frame(target, f"{frame_selector} >>> *")
+                self._frames[key] = frame
+        try:
+            return frame, in_page_selector(element_selector)
+        except Error:
+            return None
+
+    def _target(self, step: Dict[str, Any]):
+        """返回步骤的交互对象：录制时在子 frame 中的步骤使用同一 frame，否则使用当前的交互对象。"""
+        active = self._manager._interaction
+        recorded = step.get("frame")
+        if recorded is None or type(active).__name__ == "Frame":
+            return active
+        key = (active, recorded["name"], recorded["url"])
+        frame = self._frames.get(key)
+        if frame is None or frame.is_detached():
+            frame = active.frame(name=recorded["name"] or None, url=None if recorded["name"] else recorded["url"])
+            if frame is None:
+                return active
+            self._frames[key] = frame
+        return frame
+
+    def _interaction(self, step: Dict[str, Any]):
+        return self._manager.interaction._retarget(self._target(step))
+
+    def _call(self, step: Dict[str, Any]):
+        arguments = {name: _decode(value) for name, value in step["arguments"].items()}
+        return getattr(self._interaction(step), step["method"])(**arguments)
+
+
+def _simple_fill(step: Dict[str, Any]) -> bool:
+    """只有使用默认选项、录制时成功的 fill 可以合并。"""
+    arguments = step["arguments"]
+    return "error" not in step and set(arguments) <= {"selector", "value", "clear"} and arguments.get("clear", True)
+
+
+def _frame_of(target) -> Optional[Dict[str, str]]:
+    if type(target).__name__ != "Frame" or target.parent_frame is None:
+        return None
+    return {"name": target.name, "url": target.url}
+
+
+def _encode(value):
+    if isinstance(value, re.Pattern):
+        return {"$regex": value.pattern, "flags": value.flags}
+    try:
+        json.dumps(value)
+    except (TypeError, ValueError):
+        return {"$opaque": repr(value)}
+    return value
+
+
+def _decode(value):
+    if isinstance(value, dict) and "$regex" in value:
+        return re.compile(value["$regex"], value.get("flags", 0))
+    return value
@@ -0,0 +1,125 @@
+import collections
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+from ._api_types import Error
+
+# 在后台页面中开始导航。evaluate 在设置 location 后立即返回，不等待页面加载，
+# 因此预取不会阻塞当前步骤；导航在浏览器中继续进行。
+_NAVIGATE_SCRIPT = "url => { location.href = url; }"
+
+
+class _Prefetched:
+    __slots__ = ("url", "page", "started")
+
+    def __init__(self, url: str, page):
+        self.url = url
+        self.page = page
+        self.started = time.perf_counter()
+
+
+class PrefetchPool:
+    def __init__(self, context, *, max_pages: int = 3, timeout: float = None, navigation_timeout: float = None):
+        """在同一个上下文的后台页面中提前加载接下来要访问的 URL。
+
+        预取的页面与当前页面共享 cookie 和存储。需要访问某个 URL 时，如果它已经预取，
+        直接取出已经（或正在）加载的页面（命中），否则由调用方正常导航（未命中）。
+        预取的页面超过 `max_pages` 时关闭最早的一个。预取的页面也会出现在 `context.pages` 中。
+
+        :param context: 打开后台页面的 BrowserContext。
+        :param max_pages: 同时保留的预取页面数量上限。
+        :param timeout: 后台页面的默认超时时间（以毫秒为单位）。
+        :param navigation_timeout: 后台页面的默认导航超时时间（以毫秒为单位）。
+        """
+        self._context = context
+        self.max_pages = max_pages
+        self.timeout = timeout
+        self.navigation_timeout = navigation_timeout
+        self._pages: "collections.OrderedDict[str, _Prefetched]" = collections.OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.cancelled = 0  # 调用方取消的预取
+        self.evicted = 0  # 因超过 max_pages 被关闭的预取
+        self.head_start = 0.0  # 命中的页面在被取出前已经加载的总毫秒数
+
+    @property
+    def context(self):
+        return self._context
+
+    @property
+    def pending(self) -> List[str]:
+        """尚未取出的预取 URL，最早的在前。"""
+        return list(self._pages)
+
+    def prefetch(self, url: str) -> bool:
+        """在后台页面中开始加载 `url`，不等待加载完成。已经预取的 URL 不会重复加载。返回是否开始了新的预取。
+
+        :param url: 绝对 URL。
+        """
+        if url in self._pages:
+            return False
+        while len(self._pages) >= self.max_pages:
+            _, oldest = self._pages.popitem(last=False)
+            self._close(oldest)
+            self.evicted += 1
+        page = self._context.new_page()
+        if self.timeout is not None:
+            page.set_default_timeout(self.timeout)
+        if self.navigation_timeout is not None:
+            page.set_default_navigation_timeout(self.navigation_timeout)
+        try:
+            page.evaluate(_NAVIGATE_SCRIPT, url)
+        except Error:  # 导航开始得很快时执行上下文会在返回前销毁，此时导航已经开始
+            ...
+        self._pages[url] = _Prefetched(url, page)
+        return True
+
+    def take(self, url: str) -> Optional[Any]:
+        """取出 `url` 的预取页面并计为命中；没有预取时返回 None 并计为未命中。取出的页面不再属于预取池。
+
+        :param url: 与 `prefetch` 时相同的绝对 URL。
+        """
+        entry = self._pages.pop(url, None)
+        if entry is None or entry.page.is_closed():
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.head_start += (time.perf_counter() - entry.started) * 1000
+        return entry.page
+
+    def cancel(self, url: str = None):
+        """取消 `url` 的预取并关闭页面。默认取消所有预取。"""
+        urls = [url] if url is not None else list(self._pages)
+        for key in urls:
+            entry = self._pages.pop(key, None)
+            if entry is not None:
+                self._close(entry)
+                self.cancelled += 1
+
+    def close(self):
+        """取消所有预取。"""
+        self.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "cancelled": self.cancelled,
+            "evicted": self.evicted,
+            "pending": len(self._pages),
+            "head_start": self.head_start,
+        }
+
+    @staticmethod
+    def _close(entry: _Prefetched):
+        try:
+            entry.page.close()
+        except Error as e:  # 上下文已经关闭
+            logging.getLogger(__name__).debug(f"关闭预取页面 {entry.url} 失败：{e}")
+
+    def __repr__(self):
+        return f"PrefetchPool(pending={len(self._pages)}, hits={self.hits}, misses={self.misses})"
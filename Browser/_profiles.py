@@ -0,0 +1,340 @@
+import contextlib
+import logging
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from typing import List, Optional
+
+from ._api_types import Error
+
+_MB = 1024 * 1024
+
+# 浏览器运行时创建的锁文件，复制配置文件时必须跳过，否则新进程会认为配置文件正在使用。
+_LOCK_FILES = ("SingletonLock", "SingletonSocket", "SingletonCookie", "lock", ".parentlock", "parent.lock")
+
+_CACHE_LOCK = ".browser-cache.lock"  # 共享缓存目录中标记正在使用的锁文件
+_WORKER_CACHE_PREFIX = ".worker-"  # 共享缓存目录被占用时，工作进程临时缓存的目录名前缀
+_PUBLISH_WAIT = 10  # 更新模板时等待正在读取模板的进程完成复制的最长秒数
+_READ_WAIT = 30  # 读取模板时等待其他进程完成更新的最长秒数
+_ABANDONED_TAKEOVER = 30  # 接管标记超过该秒数仍然存在时，视为创建它的进程已经退出
+
+# 配置文件中 HTTP 缓存所在的子目录。
+_CACHE_SUBDIRS = {
+    "chromium": [os.path.join("Default", "Cache"), os.path.join("Default", "Code Cache")],
+    "firefox": ["cache2"],
+    "webkit": ["WebKitCache", "CacheStorage"],
+}
+
+
+class ProfileDirectory:
+    def __init__(
+            self,
+            user_data_dir: str = None,
+            *,
+            browser: str = "chromium",
+            template_dir: str = None,
+            cache_dir: str = None,
+            cache_size: float = None,
+            update_template: bool = False,
+    ):
+        """持久化上下文使用的配置文件目录。
+
+        多个并行的工作进程不能同时使用同一个配置文件目录。指定 `template_dir` 时，每次启动都从模板复制一份
+        （写时复制），工作进程各自使用自己的副本，同时都能从模板中已经缓存的资源开始。
+
+        :param user_data_dir: 配置文件目录。默认创建临时目录，关闭后删除。
+        :param browser: 浏览器类型名称，chromium、firefox 或 webkit。
+        :param template_dir: 模板配置文件目录。`user_data_dir` 为空或不存在时从模板复制。
+        :param cache_dir: HTTP 缓存目录（仅 Chromium，通过 `--disk-cache-dir`）。默认使用配置文件中的缓存目录。
+            Chromium 的磁盘缓存不支持多个进程同时使用，同一时间只有一个工作进程使用该目录（通过锁文件判断），
+            其他并行的工作进程改用该目录下各自的临时缓存，关闭后删除。
+            在 Windows 上无法判断持有锁的进程是否已经退出，异常退出后遗留的锁文件需要手动删除。
+        :param cache_size: HTTP 缓存的大小上限（以 MB 为单位）。Chromium 通过 `--disk-cache-size` 限制，
+            其他浏览器在关闭后删除最久未使用的缓存文件。
+        :param update_template: 关闭后是否用本次的配置文件替换模板，让之后启动的工作进程使用更新的缓存。
+            多个工作进程同时更新时，只有一个会替换模板，其他的放弃本次更新；替换之前会等待正在复制模板的工作进程完成复制。
+        """
+        if update_template and template_dir is None:
+            raise Error("update_template 需要同时指定 template_dir。")
+        self.browser = browser
+        self.template_dir = template_dir
+        self.cache_dir = os.path.abspath(cache_dir) if cache_dir is not None else None
+        self._shared_cache_dir = self.cache_dir  # 调用方指定的缓存目录
+        self._cache_lock: Optional[str] = None  # 持有的共享缓存锁文件
+        self.cache_size = cache_size
+        self.update_template = update_template
+        self.temporary = user_data_dir is None
+        self.path = os.path.abspath(user_data_dir) if user_data_dir is not None else None
+
+    def prepare(self) -> str:
+        """准备配置文件目录并返回其路径。"""
+        if self.path is None:
+            self.path = tempfile.mkdtemp(prefix="browser-profile-")
+        is_empty = not os.path.exists(self.path) or not os.listdir(self.path)
+        if self.template_dir is not None and is_empty:
+            # 复制期间登记为模板的读者，其他进程不会在复制过程中替换模板
+            with reading_template(self.template_dir):
+                if os.path.isdir(self.template_dir):
+                    if os.path.isdir(self.path):
+                        os.rmdir(self.path)
+                    shutil.copytree(self.template_dir, self.path, ignore=shutil.ignore_patterns(*_LOCK_FILES))
+        os.makedirs(self.path, exist_ok=True)
+        if self._shared_cache_dir is not None and self._cache_lock is None and self.cache_dir == self._shared_cache_dir:
+            os.makedirs(self._shared_cache_dir, exist_ok=True)
+            lock = os.path.join(self._shared_cache_dir, _CACHE_LOCK)
+            if acquire_lock(lock):
+                self._cache_lock = lock
+            else:
+                self.cache_dir = tempfile.mkdtemp(prefix=_WORKER_CACHE_PREFIX, dir=self._shared_cache_dir)
+                logging.getLogger(__name__).warning(
+                    f"缓存目录 {self._shared_cache_dir} 正在被其他进程使用，改用临时缓存 {self.cache_dir}")
+        return self.path
+
+    def launch_args(self) -> List[str]:
+        """返回启动浏览器需要的附加参数。"""
+        if self.browser != "chromium":
+            return []
+        args = []
+        if self.cache_dir is not None:
+            args.append(f"--disk-cache-dir={self.cache_dir}")
+        if self.cache_size is not None:
+            args.append(f"--disk-cache-size={int(self.cache_size * _MB)}")
+        return args
+
+    def cache_dirs(self) -> List[str]:
+        """返回 HTTP 缓存所在的目录。"""
+        if self.cache_dir is not None:
+            return [self.cache_dir]
+        return [os.path.join(self.path, subdir) for subdir in _CACHE_SUBDIRS.get(self.browser, [])]
+
+    def cleanup(self):
+        """在上下文关闭之后调用：限制缓存大小、更新模板、删除临时目录。"""
+        if self.path is None:
+            return
+        if self.cache_size is not None:
+            prune_cache(self.cache_dirs(), self.cache_size)
+        if self._cache_lock is not None:
+            release_lock(self._cache_lock)
+            self._cache_lock = None
+        elif self.cache_dir != self._shared_cache_dir:
+            shutil.rmtree(self.cache_dir, ignore_errors=True)
+            self.cache_dir = self._shared_cache_dir
+        if self.update_template:
+            publish_template(self.path, self.template_dir)
+        if self.temporary:
+            shutil.rmtree(self.path, ignore_errors=True)
+            self.path = None
+
+    def __repr__(self):
+        return f"ProfileDirectory({self.path!r}, template={self.template_dir!r})"
+
+
+def directory_size(path: str) -> int:
+    """返回目录中所有文件的总字节数。"""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                ...
+    return total
+
+
+def prune_cache(directories: List[str], max_size: float) -> int:
+    """删除最久未使用的缓存文件，直到总大小不超过 `max_size`（以 MB 为单位）。返回删除的字节数。
+
+    只能在浏览器关闭后调用。其他工作进程的临时缓存和缓存锁文件不会被删除。
+    """
+    entries = []
+    for directory in directories:
+        for root, subdirs, files in os.walk(directory):
+            subdirs[:] = [name for name in subdirs if not name.startswith(_WORKER_CACHE_PREFIX)]
+            for name in files:
+                if name == _CACHE_LOCK:
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((max(stat.st_atime, stat.st_mtime), stat.st_size, path))
+    total = sum(size for _, size, _ in entries)
+    limit = max_size * _MB
+    freed = 0
+    for _, size, path in sorted(entries):
+        if total - freed <= limit:
+            break
+        try:
+            os.remove(path)
+            freed += size
+        except OSError:
+            ...
+    return freed
+
+
+def publish_template(profile_dir: str, template_dir: str) -> bool:
+    """用 `profile_dir` 替换 `template_dir`。返回是否替换了模板。
+
+    先完整复制到临时目录，然后在锁文件 `<template_dir>.lock` 的保护下等待正在读取模板的进程
+    （见 `reading_template`）完成复制，再通过重命名替换，读取模板的进程不会看到替换到一半的模板。
+    其他进程正在替换、或者等待读者超过 `_PUBLISH_WAIT` 秒时放弃本次更新。
+    """
+    template_dir = os.path.abspath(template_dir)
+    parent = os.path.dirname(template_dir)
+    os.makedirs(parent, exist_ok=True)
+    staging = os.path.join(parent, f".{os.path.basename(template_dir)}.{uuid.uuid4().hex}")
+    try:
+        shutil.copytree(profile_dir, staging, ignore=shutil.ignore_patterns(*_LOCK_FILES))
+    except OSError as e:
+        logging.getLogger(__name__).info(f"更新配置文件模板失败：{e}")
+        shutil.rmtree(staging, ignore_errors=True)
+        return False
+    lock = f"{template_dir}.lock"
+    if not acquire_lock(lock):
+        logging.getLogger(__name__).info(f"其他进程正在更新配置文件模板 {template_dir}，放弃本次更新")
+        shutil.rmtree(staging, ignore_errors=True)
+        return False
+    retired: Optional[str] = None
+    try:
+        if not _wait_for_readers(template_dir):
+            logging.getLogger(__name__).info(f"其他进程正在读取配置文件模板 {template_dir}，放弃本次更新")
+            shutil.rmtree(staging, ignore_errors=True)
+            return False
+        if os.path.exists(template_dir):
+            retired = f"{staging}.old"
+            os.rename(template_dir, retired)
+        os.rename(staging, template_dir)
+    except OSError as e:
+        logging.getLogger(__name__).info(f"更新配置文件模板失败：{e}")
+        shutil.rmtree(staging, ignore_errors=True)
+        if retired is not None and not os.path.exists(template_dir):
+            os.rename(retired, template_dir)  # 恢复原来的模板
+            retired = None
+        return False
+    finally:
+        release_lock(lock)
+        if retired is not None:
+            shutil.rmtree(retired, ignore_errors=True)
+    return True
+
+
+@contextlib.contextmanager
+def reading_template(template_dir: str):
+    """在读取模板期间登记为读者，`publish_template` 会等待所有读者完成后再替换模板。
+
+    读者先在 `<template_dir>.readers` 中创建记录当前进程号的标记，再检查是否有进程正在替换模板；
+    替换模板的进程先取得锁，再检查读者标记。两者的顺序相反，因此不会同时进行。
+    其他进程正在替换模板时等待，超过 `_READ_WAIT` 秒时抛出 Error。
+    """
+    template_dir = os.path.abspath(template_dir)
+    readers = f"{template_dir}.readers"
+    lock = f"{template_dir}.lock"
+    os.makedirs(readers, exist_ok=True)
+    marker = os.path.join(readers, f"{os.getpid()}-{uuid.uuid4().hex}")
+    deadline = time.monotonic() + _READ_WAIT
+    while True:
+        with open(marker, "w") as file:
+            file.write(str(os.getpid()))
+        if not (os.path.exists(lock) and _lock_held(lock)):
+            break
+        release_lock(marker)
+        if time.monotonic() > deadline:
+            raise Error(f"等待其他进程更新配置文件模板 {template_dir} 超时（{_READ_WAIT} 秒）。")
+        time.sleep(0.05)
+    try:
+        yield
+    finally:
+        release_lock(marker)
+
+
+def acquire_lock(path: str) -> bool:
+    """以独占方式创建锁文件并写入当前进程号。锁被其他仍在运行的进程持有时返回 False，持有者已经退出时接管锁。
+
+    多个进程可能同时发现持有者已经退出。只有以独占方式创建了接管标记 `<path>.takeover` 的进程可以删除旧锁，
+    并且在持有标记时重新检查，因此不会删除其他进程刚刚取得的锁。
+    """
+    if _create_lock(path):
+        return True
+    if _lock_held(path):
+        return False
+    marker = f"{path}.takeover"
+    if not _create_lock(marker):
+        _remove_abandoned(marker)
+        return False
+    try:
+        if os.path.exists(path):
+            if _lock_held(path):  # 其他进程已经接管
+                return False
+            release_lock(path)
+        return _create_lock(path)
+    finally:
+        release_lock(marker)
+
+
+def release_lock(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        ...
+
+
+def _create_lock(path: str) -> bool:
+    try:
+        fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        return False
+    with os.fdopen(fd, "w") as file:
+        file.write(str(os.getpid()))
+    return True
+
+
+def _remove_abandoned(marker: str):
+    """删除创建者在接管过程中退出而遗留的接管标记。"""
+    try:
+        if time.time() - os.path.getmtime(marker) > _ABANDONED_TAKEOVER:
+            os.remove(marker)
+    except OSError:
+        ...
+
+
+def _lock_held(path: str) -> bool:
+    """判断锁文件中记录的进程是否仍在运行。无法判断时视为仍在运行。"""
+    try:
+        with open(path) as file:
+            pid = int(file.read().strip() or 0)
+    except (OSError, ValueError):
+        return True
+    if not pid or os.name != "posix":  # 进程号尚未写入，或者无法检查进程
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        ...
+    return True
+
+
+def _wait_for_readers(template_dir: str) -> bool:
+    """等待所有读取模板的进程完成复制，最多等待 `_PUBLISH_WAIT` 秒。已经退出的进程遗留的标记会被删除。"""
+    readers = f"{template_dir}.readers"
+    deadline = time.monotonic() + _PUBLISH_WAIT
+    while True:
+        try:
+            markers = [os.path.join(readers, name) for name in os.listdir(readers)]
+        except FileNotFoundError:
+            return True
+        active = False
+        for marker in markers:
+            if _lock_held(marker):
+                active = True
+            else:
+                release_lock(marker)
+        if not active:
+            return True
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.05)
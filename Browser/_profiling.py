@@ -0,0 +1,277 @@
+import contextlib
+import json
+import logging
+import os
+import re
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+from ._api_types import Error
+from ._middleware import InteractionCall
+
+
+class StepProfiler:
+    def __init__(
+            self,
+            manager,
+            output_dir: str,
+            *,
+            playwright_trace: bool = True,
+            cpu_profile: bool = False,
+            chrome_trace: bool = False,
+            window: float = 30,
+            latency_threshold: float = None,
+            methods: Iterable[str] = None,
+            screenshots: bool = True,
+            snapshots: bool = True,
+            categories: List[str] = None,
+    ):
+        """在浏览器端持续录制，只保留失败或超过耗时阈值的步骤。
+
+        录制按时间窗口滚动：窗口超过 `window` 秒后，在下一个步骤开始前丢弃并重新开始录制，
+        因此平时只占用最近一个窗口的开销。步骤失败或耗时超过 `latency_threshold` 时，
+        将当前窗口（包括该步骤之前最多 `window` 秒）写入文件，文件名包含序号、方法名和选择器，
+        并在 `steps.jsonl` 中记录步骤的方法、选择器、URL、耗时、异常和文件路径。
+
+        :param manager: PlaywrightManager 实例。
+        :param output_dir: 输出目录，不存在时自动创建。
+        :param playwright_trace: 录制 Playwright trace（context.tracing 的分块），可以用 `playwright show-trace` 查看。
+        :param cpu_profile: 录制页面的 JS CPU profile（仅 Chromium，通过 CDP Profiler），可以在 DevTools 中加载。
+        :param chrome_trace: 录制 Chromium 性能跟踪（browser.start_tracing），可以在 DevTools 性能面板中加载。
+        :param window: 滚动窗口的长度（以秒为单位）。
+        :param latency_threshold: 步骤耗时超过该值（以毫秒为单位）时保留。默认只保留失败的步骤。
+        :param methods: 只录制这些 Interaction 方法。默认为所有方法。
+        :param screenshots: Playwright trace 和 Chromium 跟踪是否包含截图。
+        :param snapshots: Playwright trace 是否包含 DOM 快照。
+        :param categories: Chromium 跟踪的类别。默认使用 Playwright 的默认类别。
+        """
+        self._manager = manager
+        self.output_dir = output_dir
+        self.playwright_trace = playwright_trace
+        self.cpu_profile = cpu_profile
+        self.chrome_trace = chrome_trace
+        self.window = window
+        self.latency_threshold = latency_threshold
+        self.methods = frozenset(methods) if methods is not None else None
+        self.screenshots = screenshots
+        self.snapshots = snapshots
+        self.categories = categories
+
+        self.retained: List[Dict[str, Any]] = []  # 已保留的步骤
+        self._sequence = 0
+        self._running = False
+        self._block_depth = 0  # 正在执行的 block 层数，block 内的步骤不单独保留
+        self._window_started: Optional[float] = None
+        self._context = None  # 正在录制 Playwright trace 的上下文
+        self._tracing_started = False
+        self._page = None  # 正在录制 CPU profile 和 Chromium 跟踪的页面
+        self._session = None
+        self._browser = None
+
+    def start(self) -> "StepProfiler":
+        os.makedirs(self.output_dir, exist_ok=True)
+        self._running = True
+        return self
+
+    def stop(self):
+        """停止录制并丢弃当前窗口。"""
+        if self._tracing_started:
+            self._stop_tracing()
+        if self._window_started is not None:
+            try:
+                self._end_window(None)
+            except Error as e:
+                logging.getLogger(__name__).warning(f"结束性能录制窗口失败：{e}")
+                self._reset()
+        self._running = False
+
+    def _stop_tracing(self):
+        """停止 Playwright trace。tracing.stop 会结束当前分块，窗口之间没有分块时先开始一个空分块。"""
+        try:
+            if self._window_started is None:
+                self._context.tracing.start_chunk()
+            self._context.tracing.stop()
+        except Error:  # 上下文已经关闭
+            ...
+        self._context = None
+        self._tracing_started = False
+
+    def __call__(self, call: InteractionCall, proceed):
+        if not self._running or self._block_depth or (self.methods is not None and call.method not in self.methods):
+            return proceed()
+        self._ensure_window()
+        started = time.perf_counter()
+        try:
+            result = proceed()
+        except Exception as e:
+            self._finish(call.method, call.selector, call.url, started, e)
+            raise
+        self._finish(call.method, call.selector, call.url, started, None)
+        return result
+
+    @contextlib.contextmanager
+    def block(self, name: str, *, keep: bool = False):
+        """录制一段代码。代码块失败、超过耗时阈值或 `keep=True` 时保留整个窗口，代码块内的步骤不再单独保留。
+
+        :param name: 代码块的名称，用于文件名和记录。
+        :param keep: 是否总是保留。
+        """
+        if not self._running:
+            yield
+            return
+        if not self._block_depth:
+            self._ensure_window()
+        self._block_depth += 1
+        started = time.perf_counter()
+        error = None
+        try:
+            yield
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self._block_depth -= 1
+            if not self._block_depth:
+                self._finish(name, None, self._current_url(), started, error, keep=keep)
+
+    def _finish(self, name: str, selector, url: str, started: float, error: Optional[BaseException], keep=False):
+        elapsed = (time.perf_counter() - started) * 1000
+        slow = self.latency_threshold is not None and elapsed >= self.latency_threshold
+        if not (keep or slow or error is not None):
+            return
+        try:
+            self._retain(name, selector, url, elapsed, error)
+        except (Error, OSError) as e:  # 保存失败不影响自动化流程
+            logging.getLogger(__name__).warning(f"保存 {name} 的性能记录失败：{e}")
+            self._reset()
+
+    def _retain(self, name: str, selector, url: str, elapsed: float, error: Optional[BaseException]):
+        self._sequence += 1
+        prefix = os.path.join(self.output_dir, f"{self._sequence:04d}-{name}")
+        if selector is not None:
+            prefix += f"-{_slug(str(selector))}"
+        files = self._end_window(prefix)
+        entry = {
+            "sequence": self._sequence,
+            "time": time.time(),
+            "name": name,
+            "selector": selector if selector is None or isinstance(selector, str) else str(selector),
+            "url": url,
+            "elapsed": elapsed,
+            "error": None if error is None else f"{type(error).__name__}: {error}",
+            "files": files,
+        }
+        self.retained.append(entry)
+        with open(os.path.join(self.output_dir, "steps.jsonl"), "a", encoding="utf-8") as file:
+            file.write(json.dumps(entry, ensure_ascii=False))
+            file.write("\n")
+        logging.getLogger(__name__).info(f"已保存 {name} 的性能记录（{elapsed:.0f}ms）：{', '.join(files.values())}")
+
+    def _current_url(self) -> str:
+        page = self._manager._page
+        return page.url if page is not None else ""
+
+    def _ensure_window(self):
+        """开始录制，窗口过期或当前页面改变时丢弃旧窗口重新开始。
+
+        切换页面、关闭或回收上下文、页面崩溃之后，旧窗口的资源可能已经失效，
+        此时结束或开始录制会抛出 Error；录制失败不影响自动化流程，记录警告并重置录制状态。
+        """
+        page = self._manager._page
+        try:
+            if self._window_started is not None:
+                expired = time.monotonic() - self._window_started > self.window
+                if not expired and page is self._page:
+                    return
+                self._end_window(None)
+            self._begin_window()
+        except Error as e:
+            logging.getLogger(__name__).warning(f"切换性能录制窗口失败，已重置录制状态：{e}")
+            self._reset()
+
+    def _reset(self):
+        """丢弃所有录制状态，尽量释放 CDP 会话、Chromium 跟踪和 Playwright trace，释放失败时忽略。"""
+        self._window_started = None
+        self._page = None
+        session, self._session = self._session, None
+        if session is not None:
+            try:
+                session.detach()
+            except Error:
+                ...
+        browser, self._browser = self._browser, None
+        if browser is not None:
+            try:
+                browser.stop_tracing()
+            except Error:
+                ...
+        if self._tracing_started:
+            try:
+                self._context.tracing.stop()
+            except Error:
+                ...
+        self._context = None
+        self._tracing_started = False
+
+    def _begin_window(self):
+        manager = self._manager
+        page = manager._page
+        context = page.context if page is not None else manager._context
+        if context is None:
+            return
+        if self.playwright_trace:
+            if self._tracing_started and context is not self._context:
+                self._stop_tracing()
+            if self._tracing_started:
+                context.tracing.start_chunk()
+            else:
+                # tracing.start 同时开始第一个分块
+                context.tracing.start(screenshots=self.screenshots, snapshots=self.snapshots)
+                self._context = context
+                self._tracing_started = True
+        self._page = page
+        chromium = page is not None and context.browser is not None and context.browser.browser_type.name == "chromium"
+        if self.cpu_profile and chromium:
+            self._session = context.new_cdp_session(page)
+            self._session.send("Profiler.enable")
+            self._session.send("Profiler.start")
+        if self.chrome_trace and chromium:
+            self._browser = context.browser
+            self._browser.start_tracing(page=page, screenshots=self.screenshots, categories=self.categories)
+        self._window_started = time.monotonic()
+
+    def _end_window(self, prefix: Optional[str]) -> Dict[str, str]:
+        """结束当前窗口。`prefix` 不为空时写入文件并返回文件路径，否则丢弃。"""
+        files = {}
+        self._window_started = None
+        if self._tracing_started:
+            path = f"{prefix}.zip" if prefix is not None else None
+            self._context.tracing.stop_chunk(path=path)
+            if path is not None:
+                files["playwright_trace"] = path
+        if self._session is not None:
+            session, self._session = self._session, None
+            profile = session.send("Profiler.stop")["profile"]
+            session.detach()
+            if prefix is not None:
+                files["cpu_profile"] = _write(f"{prefix}.cpuprofile", json.dumps(profile).encode("utf-8"))
+        if self._browser is not None:
+            browser, self._browser = self._browser, None
+            data = browser.stop_tracing()
+            if prefix is not None:
+                files["chrome_trace"] = _write(f"{prefix}.trace.json", data)
+        return files
+
+    def __repr__(self):
+        return f"StepProfiler({self.output_dir!r}, retained={len(self.retained)})"
+
+
+def _slug(text: str, limit: int = 40) -> str:
+    """将选择器转换为可以用作文件名的片段。"""
+    return re.sub(r"[^\w.-]+", "_", text).strip("_")[:limit] or "_"
+
+
+def _write(path: str, data: bytes) -> str:
+    with open(path, "wb") as file:
+        file.write(data)
+    return path
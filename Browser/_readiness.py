@@ -0,0 +1,143 @@
+import collections
+import logging
+import re
+import time
+import weakref
+from typing import Callable, List, Optional, Pattern, Union
+
+from ._api_types import Error
+
+# 就绪条件中的请求：URL 的正则表达式，或它们的列表（每个都需要至少完成一个匹配的请求）
+ReadyRequests = Union[str, Pattern, List[Union[str, Pattern]]]
+
+_HISTORY_SIZE = 100  # 每个页面保留的导航耗时记录数量
+
+_timings = weakref.WeakKeyDictionary()  # 页面 -> 最近的 NavigationTiming
+_pending = weakref.WeakKeyDictionary()  # 页面 -> 取消上一次导航的 load 监听的函数
+
+
+class NavigationTiming:
+    def __init__(self, method: str, target: str = None):
+        """一次带就绪条件的导航的耗时，所有时间都是从开始导航起的毫秒数。
+
+        导航在就绪条件满足时返回，此后页面的 domcontentloaded 和 load 事件仍会被记录，
+        `saved` 就是相比等待 load 少等的时间。load 在导航返回后才会填写；
+        主 frame 在 load 之前开始加载新文档（任何方式的导航）时停止记录，load 保持为 None。
+
+        :param method: 导航方法，goto、go_back 或 go_forward。
+        :param target: goto 的目标 URL。
+        """
+        self.method = method
+        self.target = target
+        self.url: Optional[str] = None  # 就绪时页面的 URL
+        self.committed: Optional[float] = None  # 收到响应、开始加载新文档
+        self.ready: Optional[float] = None  # 所有就绪条件满足
+        self.dom_content_loaded: Optional[float] = None
+        self.load: Optional[float] = None
+        self._started = time.perf_counter()
+
+    def mark(self, name: str):
+        setattr(self, name, (time.perf_counter() - self._started) * 1000)
+
+    @property
+    def saved(self) -> Optional[float]:
+        """相比等待 load 事件节省的毫秒数。load 尚未触发时为 None。"""
+        if self.load is None or self.ready is None:
+            return None
+        return max(self.load - self.ready, 0.0)
+
+    def as_dict(self) -> dict:
+        return {
+            "method": self.method,
+            "target": self.target,
+            "url": self.url,
+            "committed": self.committed,
+            "ready": self.ready,
+            "dom_content_loaded": self.dom_content_loaded,
+            "load": self.load,
+            "saved": self.saved,
+        }
+
+    def __repr__(self):
+        return f"NavigationTiming({self.method} {self.url}, ready={self.ready}, load={self.load})"
+
+
+def request_matchers(ready_requests: Optional[ReadyRequests]) -> List[Callable[[str], bool]]:
+    """将请求 URL 的正则表达式（或它们的列表）转换为匹配函数。"""
+    if ready_requests is None:
+        return []
+    if not isinstance(ready_requests, (list, tuple)):
+        ready_requests = [ready_requests]
+    matchers = []
+    for pattern in ready_requests:
+        try:
+            compiled = re.compile(pattern) if isinstance(pattern, str) else pattern
+        except re.error as e:
+            raise Error(f"无效的请求 URL 正则表达式 {pattern}：{e}")
+        matchers.append(lambda url, compiled=compiled: compiled.search(url) is not None)
+    return matchers
+
+
+def watch_load(page, frame, timing: NavigationTiming):
+    """就绪之后继续记录页面的 domcontentloaded 和 load 时间，并保存到页面的导航记录中。"""
+    history = _timings.get(page)
+    if history is None:
+        history = _timings[page] = collections.deque(maxlen=_HISTORY_SIZE)
+    history.append(timing)
+    cancel = _pending.pop(page, None)
+    if cancel is not None:
+        cancel()
+    if frame is not page and frame != page.main_frame:
+        # 子 frame 的 load 事件无法单独监听，只记录就绪时间
+        return
+
+    def on_dom_content_loaded(_):
+        timing.mark("dom_content_loaded")
+
+    def on_load(_):
+        timing.mark("load")
+        if timing.dom_content_loaded is None:
+            timing.dom_content_loaded = timing.load
+        cancel()
+        logging.getLogger(__name__).debug(
+            f"{timing.method} {timing.url} 在 {timing.ready:.0f}ms 就绪，load 在 {timing.load:.0f}ms，"
+            f"节省 {timing.saved:.0f}ms"
+        )
+
+    def on_request(request):
+        # 主 frame 开始加载新文档（普通 goto、点击链接等），之后的 load 事件不再属于这次导航
+        if request.is_navigation_request() and request.frame == page.main_frame:
+            cancel()
+
+    def cancel():
+        for event, listener in (
+                ("domcontentloaded", on_dom_content_loaded), ("load", on_load), ("request", on_request)
+        ):
+            try:
+                page.remove_listener(event, listener)
+            except (KeyError, ValueError):
+                ...
+        if _pending.get(page) is cancel:
+            del _pending[page]
+
+    page.on("domcontentloaded", on_dom_content_loaded)
+    page.on("load", on_load)
+    page.on("request", on_request)
+    _pending[page] = cancel
+    try:
+        state = page.evaluate("document.readyState")
+    except Error:  # 页面已经关闭或再次导航
+        cancel()
+        return
+    if state != "loading" and timing.dom_content_loaded is None:
+        timing.dom_content_loaded = timing.ready
+    if state == "complete" and timing.load is None:
+        # load 在就绪之前已经触发，没有节省时间
+        timing.load = timing.ready
+        cancel()
+
+
+def navigation_timings(page) -> List[NavigationTiming]:
+    """返回页面最近的带就绪条件的导航耗时，最早的在前。"""
+    return list(_timings.get(page, ()))
+
@@ -0,0 +1,174 @@
+import logging
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from ._api_types import Error
+from ._middleware import InteractionCall
+
+# 重复执行不会改变结果的方法，恢复后可以安全重试。
+# click、press、go_back 等操作重复执行可能产生副作用，默认不重试。
+IDEMPOTENT_METHODS = frozenset([
+    "check",
+    "uncheck",
+    "fill",
+    "focus",
+    "hover",
+    "goto",
+    "select_option",
+    "get_attribute",
+    "get_table_cell",
+    "cell_inner_text",
+    "cell_input_value",
+    "inner_html",
+    "inner_text",
+    "input_value",
+    "is_checked",
+    "is_disabled",
+    "is_editable",
+    "is_enabled",
+    "is_hidden",
+    "is_visible",
+    "query_selector",
+    "query_selector_all",
+    "wait_for_selector",
+    "wait_for_any",
+    "wait_for_all",
+    "wait_for_dom_quiet",
+    "wait_for_element_stable",
+    "wait_for_requests_idle",
+])
+
+
+class CrashRecovery:
+    def __init__(
+            self,
+            manager,
+            *,
+            max_restarts: int = 3,
+            retry_methods: Iterable[str] = IDEMPOTENT_METHODS,
+            snapshot_every: int = 20,
+            on_restart: Callable[[Dict[str, Any]], None] = None,
+    ):
+        """浏览器崩溃、连接断开和页面崩溃的恢复中间件。
+
+        监听当前浏览器的 disconnected 事件和当前页面的 crash 事件。调用因此失败时，
+        以原来的选项重新启动浏览器（或只替换崩溃的页面），恢复会话后重试幂等操作。
+        浏览器崩溃后无法再读取 cookie 和 localStorage，因此每隔 `snapshot_every` 次调用以及每次导航后保存一次存储状态。
+
+        :param manager: PlaywrightManager 实例。
+        :param max_restarts: 最多恢复的次数。
+        :param retry_methods: 恢复后重试的方法。
+        :param snapshot_every: 每隔多少次调用保存一次存储状态。
+        :param on_restart: 恢复后调用，参数为恢复事件。
+        """
+        self._manager = manager
+        self.max_restarts = max_restarts
+        self.retry_methods = frozenset(retry_methods)
+        self.snapshot_every = snapshot_every
+        self.on_restart = on_restart
+
+        self.browser_restarts = 0  # 重新启动浏览器的次数
+        self.page_restarts = 0  # 替换崩溃页面的次数
+        self.retries = 0  # 恢复后重试的调用次数
+        self.events: List[Dict[str, Any]] = []  # 恢复事件
+        self._storage_state = None  # 最近保存的存储状态
+        self._calls = 0
+        self._disconnected = False
+        self._crashed_pages = set()
+        self._watched_browser = None
+        self._watched_page = None
+
+    @property
+    def restarts(self) -> int:
+        return self.browser_restarts + self.page_restarts
+
+    def __call__(self, call: InteractionCall, proceed):
+        self._watch()
+        while True:
+            try:
+                result = proceed()
+            except Error as e:
+                kind = self._failure_kind()
+                if kind is None:
+                    raise
+                if self.restarts >= self.max_restarts:
+                    raise Error(f"已恢复 {self.restarts} 次，达到上限，不再恢复：{e}") from e
+                self._recover(kind, call, e)
+                if call.method not in self.retry_methods:
+                    raise Error(f"浏览器已恢复，但 {call.method} 不是幂等操作，未重试：{e}") from e
+                self.retries += 1
+                continue
+            self._calls += 1
+            if call.is_navigation or self._storage_state is None or self._calls >= self.snapshot_every:
+                self.save_state()
+            return result
+
+    def save_state(self):
+        """保存当前上下文的存储状态，作为浏览器崩溃后恢复的依据。"""
+        self._calls = 0
+        manager = self._manager
+        try:
+            context = manager._context if manager._context is not None else manager._page.context
+            self._storage_state = context.storage_state()
+        except Error:  # 浏览器已经不可用，保留之前的存储状态
+            ...
+
+    def _watch(self):
+        """为当前的浏览器和页面注册事件。切换浏览器或页面后会重新注册。"""
+        browser = self._manager._browser
+        if browser is not None and browser is not self._watched_browser:
+            self._watched_browser = browser
+            self._disconnected = False
+            browser.once("disconnected", self._on_disconnected)
+        page = self._manager._page
+        if page is not None and page is not self._watched_page:
+            self._watched_page = page
+            page.once("crash", self._crashed_pages.add)
+
+    def _on_disconnected(self, browser):
+        if browser is self._watched_browser:
+            self._disconnected = True
+
+    def _failure_kind(self) -> Optional[str]:
+        """判断调用失败是否由浏览器断开或页面崩溃引起。"""
+        browser = self._manager._browser
+        if self._disconnected or (browser is not None and not browser.is_connected()):
+            return "browser"
+        if self._manager._page in self._crashed_pages:
+            return "page"
+        return None
+
+    def _recover(self, kind: str, call: InteractionCall, error: Error):
+        manager = self._manager
+        started = time.perf_counter()
+        if kind == "browser":
+            # 页面 URL 和 frame 保存在本地，仍然可以读取；存储状态只能使用最近的快照
+            snapshot = manager._snapshot_session(storage_state=self._storage_state or {})
+            manager._restart_browser(snapshot)
+            self.browser_restarts += 1
+        else:
+            snapshot = manager._snapshot_session()
+            self._crashed_pages.discard(manager._page)
+            manager._restart_page(snapshot)
+            self.page_restarts += 1
+        self._watch()
+        # 让同一个 Interaction 对象指向恢复后的页面或 frame
+        call.interaction._bind(manager._interaction)
+        call.interaction._change_feed = None
+        event = {
+            "time": time.time(),
+            "kind": kind,
+            "method": call.method,
+            "error": str(error),
+            "urls": snapshot["urls"],
+            "elapsed": (time.perf_counter() - started) * 1000,
+        }
+        self.events.append(event)
+        logging.getLogger(__name__).warning(
+            f"{'浏览器断开' if kind == 'browser' else '页面崩溃'}，已恢复（第 {self.restarts} 次），耗时 {event['elapsed']:.0f}ms"
+        )
+        if self.on_restart is not None:
+            self.on_restart(event)
+
+    def __repr__(self):
+        return f"CrashRecovery(browser_restarts={self.browser_restarts}, page_restarts={self.page_restarts})"
@@ -0,0 +1,426 @@
+import weakref
+from typing import Any
+
+from ._waits import (
+    CANCEL_WATCH_SCRIPT,
+    DOM_QUIET_SCRIPT,
+    ELEMENT_STABLE_SCRIPT,
+    REQUESTS_IDLE_SCRIPT,
+    WAIT_FOR_SELECTORS_SCRIPT,
+    WATCH_SELECTORS_SCRIPT,
+)
+
+# 页面内辅助函数的版本。修改任何辅助函数时都需要增加版本号，旧版本的运行时会被替换。
+RUNTIME_VERSION = 5
+
+_MISSING = "__browserRuntimeMissing"
+
+# 按字段说明读取元素的公共代码，格式见 `_extract.FieldSpec`。
+_FIELDS = """
+  // 与 Playwright 的 XPath 引擎相同：在元素内查询时，以 / 开头的表达式相对于该元素（//span 只查找后代）
+  const xpath = (root, value) => root.nodeType !== 9 && value.startsWith("/") ? "." + value : value;
+  const queryAll = (root, sel) => {
+    if (sel.kind === "xpath") {
+      const result = document.evaluate(
+        xpath(root, sel.value), root, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+      const nodes = [];
+      for (let i = 0; i < result.snapshotLength; i++) nodes.push(result.snapshotItem(i));
+      return nodes;
+    }
+    return Array.from(root.querySelectorAll(sel.value));
+  };
+  const queryOne = (root, sel) => sel.kind === "xpath"
+    ? document.evaluate(xpath(root, sel.value), root, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue
+    : root.querySelector(sel.value);
+  const serializable = (value) => {
+    if (value === undefined) return null;
+    if (value === null || ["string", "number", "boolean"].includes(typeof value)) return value;
+    try { return JSON.parse(JSON.stringify(value)); } catch (e) { return String(value); }
+  };
+  const read = (el, field) => {
+    if (!el) return null;
+    switch (field.get) {
+      case "text": return el.innerText;
+      case "html": return el.innerHTML;
+      case "value": return el.value === undefined ? null : el.value;
+      case "attr": return el.getAttribute(field.key);
+      case "prop": return serializable(el[field.key]);
+      case "box": {
+        const rect = el.getBoundingClientRect();
+        return {x: rect.x, y: rect.y, width: rect.width, height: rect.height};
+      }
+    }
+    return null;
+  };
+  const record = (el, fields) => {
+    const result = {};
+    for (const field of fields) {
+      if (!field.selector) result[field.name] = read(el, field);
+      else if (field.all) result[field.name] = queryAll(el, field.selector).map((child) => read(child, field));
+      else result[field.name] = read(queryOne(el, field.selector), field);
+    }
+    return result;
+  };
+"""
+
+# 读取所有匹配元素（最多 limit 个）的字段，不创建元素句柄。
+_EXTRACT = """
+({item, fields, limit}) => {
+  let elements = queryAll(document, item);
+  if (limit !== null) elements = elements.slice(0, limit);
+  return elements.map((el) => record(el, fields));
+}
+"""
+
+# 读取当前已渲染、且自上次读取后内容发生变化的元素。
+# 虚拟列表会复用 DOM 节点，因此按节点记录上次读取时的 textContent，而不是只记录节点本身。
+_STREAM_EXTRACT = """
+({item, fields, session}) => {
+  const seen = streams[session] || (streams[session] = new WeakMap());
+  const records = [];
+  for (const el of queryAll(document, item)) {
+    const text = el.textContent;
+    if (seen.get(el) === text) continue;
+    seen.set(el, text);
+    records.push(record(el, fields));
+  }
+  return records;
+}
+"""
+
+_END_STREAM = """
+(session) => { delete streams[session]; }
+"""
+
+# 点击“加载更多”或滚动到最后一个元素之后，等待列表发生变化。
+_ADVANCE = """
+async ({item, loadMore, timeout}) => {
+  const signature = () => {
+    const items = queryAll(document, item);
+    const last = items[items.length - 1];
+    return items.length + ":" + (last ? last.textContent : "");
+  };
+  const scrollable = (el) => {
+    for (let node = el && el.parentElement; node; node = node.parentElement) {
+      const style = getComputedStyle(node);
+      if (/(auto|scroll)/.test(style.overflowY) && node.scrollHeight > node.clientHeight) return node;
+    }
+    return document.scrollingElement || document.documentElement;
+  };
+  const before = signature();
+  if (loadMore) {
+    const button = queryOne(document, loadMore);
+    const rect = button && button.getBoundingClientRect();
+    if (!button || button.disabled || !rect.width || !rect.height) return {changed: false, exhausted: true};
+    button.scrollIntoView({block: "center"});
+    button.click();
+  } else {
+    const items = queryAll(document, item);
+    const last = items[items.length - 1];
+    if (last) last.scrollIntoView({block: "end"});
+    const scroller = scrollable(last);
+    const atBottom = scroller.scrollTop + scroller.clientHeight >= scroller.scrollHeight - 1;
+    scroller.scrollBy(0, scroller.clientHeight * 0.9);
+    if (atBottom) window.scrollBy(0, innerHeight * 0.9);
+  }
+  return await new Promise((resolve) => {
+    let timer = null;
+    const observer = new MutationObserver(() => {
+      if (signature() !== before) finish(true);
+    });
+    const finish = (changed) => {
+      observer.disconnect();
+      clearTimeout(timer);
+      resolve({changed, exhausted: false});
+    };
+    observer.observe(document, {subtree: true, childList: true, characterData: true});
+    timer = setTimeout(() => finish(signature() !== before), timeout);
+  });
+}
+"""
+
+# 与 Playwright 的 text='...' 相同：按规范化空白后的完整文本精确匹配，只返回最内层的元素。
+# loose 为 true 时与 :text('...') 相同：不区分大小写，包含该文本即匹配。
+_TEXT = """
+  const normalize = (text) => (text || "").replace(/\\s+/g, " ").trim();
+  // 与 Playwright 的 text 引擎一样，不计入脚本、样式等不显示的文本，并且只匹配可见的元素
+  const IGNORED = new Set(["SCRIPT", "STYLE", "NOSCRIPT", "TEMPLATE", "HEAD"]);
+  const textOf = (el) => {
+    let text = "";
+    for (const node of el.childNodes) {
+      if (node.nodeType === 3) text += node.data;
+      else if (node.nodeType === 1 && !IGNORED.has(node.tagName)) text += textOf(node);
+    }
+    return text;
+  };
+  const visible = (el) => el.getClientRects().length > 0 && getComputedStyle(el).visibility !== "hidden";
+  const byText = (text, loose = false) => {
+    const matched = [];
+    if (loose) text = text.toLowerCase();
+    const fold = loose ? (value) => normalize(value).toLowerCase() : normalize;
+    const matches = loose ? (value) => value.includes(text) : (value) => value === text;
+    const walk = (el) => {
+      // textContent 包含全部文本，用它排除不可能匹配的子树
+      if (IGNORED.has(el.tagName) || !fold(el.textContent).includes(text)) return false;
+      let inner = false;
+      for (const child of el.children) inner = walk(child) || inner;
+      if (!inner && matches(fold(textOf(el))) && visible(el)) {
+        matched.push(el);
+        return true;
+      }
+      return inner;
+    };
+    walk(document.documentElement);
+    return matched;  // 匹配的元素互不包含，后序遍历的顺序就是文档顺序
+  };
+"""
+
+# 根据行标题和列标题定位二维表中的单元格，参见 `Interaction.get_table_cell`。
+# 只提供行标题时，与 `*:right-of(:text(行标题))` 相同：行标题不区分大小写、包含即匹配，
+# 返回任意一个匹配的行标题右侧最近的元素（与 Playwright 的 :right-of() 相同的距离计算）。
+# 提供列标题时，行标题和列标题都与 text='...' 相同，按完整文本精确匹配。
+_TABLE_CELL = """
+({rowHeader, columnHeaders}) => {
+  const noColumns = !columnHeaders || !columnHeaders.length;
+  if (noColumns) {
+    // 与 query_selector 一样，找不到元素返回 null
+    const anchors = byText(normalize(rowHeader), true);
+    let best = null, bestScore = Infinity;
+    for (const el of document.querySelectorAll("*")) {
+      const box = el.getBoundingClientRect();
+      if (!box.width || !box.height) continue;
+      for (const anchor of anchors) {
+        if (el === anchor || el.contains(anchor) || anchor.contains(el)) continue;
+        const row = anchor.getBoundingClientRect();
+        if (box.left < row.right) continue;
+        const score = (box.left - row.right) + Math.max(row.top - box.top, 0) + Math.max(box.bottom - row.bottom, 0);
+        if (score < bestScore) {
+          best = el;
+          bestScore = score;
+        }
+      }
+    }
+    return best;
+  }
+  const rowElement = byText(normalize(rowHeader))[0];
+  if (!rowElement) throw new Error("找不到行标题 " + rowHeader);
+  const row = rowElement.getBoundingClientRect();
+  const header = (text, minX, maxX) => byText(normalize(text)).find((el) => {
+    const box = el.getBoundingClientRect();
+    return box.x >= minX && (maxX === undefined || box.x + box.width <= maxX);
+  });
+  let column = header(columnHeaders[0], row.x + row.width);
+  if (column && columnHeaders.length > 1) {
+    const top = column.getBoundingClientRect();
+    column = header(columnHeaders[1], top.x, top.x + top.width);
+  }
+  if (!column) throw new Error("找不到列标题 " + columnHeaders.join(" / "));
+  const box = column.getBoundingClientRect();
+  return document.elementFromPoint(box.x + box.width / 2, row.y + row.height / 2);
+}
+"""
+
+# 页面状态快照：URL、滚动位置、焦点元素和表单控件的值。用于比较操作前后的状态或记录失败现场。
+_SNAPSHOT = """
+() => {
+  const describe = (el) => {
+    if (!el || el === document.body) return null;
+    if (el.id) return "#" + CSS.escape(el.id);
+    const name = el.getAttribute("name");
+    return el.tagName.toLowerCase() + (name ? "[name=\\"" + name + "\\"]" : "");
+  };
+  const controls = [];
+  for (const el of document.querySelectorAll("input, select, textarea")) {
+    if (el.type === "password" || el.type === "hidden") continue;
+    controls.push({
+      selector: describe(el),
+      type: el.type,
+      value: el.value,
+      checked: el.type === "checkbox" || el.type === "radio" ? el.checked : null,
+      disabled: el.disabled,
+    });
+  }
+  return {
+    url: location.href,
+    title: document.title,
+    readyState: document.readyState,
+    scroll: {x: scrollX, y: scrollY},
+    viewport: {width: innerWidth, height: innerHeight},
+    focused: describe(document.activeElement),
+    controls,
+  };
+}
+"""
+
+# 为元素推荐更便宜且唯一的选择器：稳定的 id、测试属性、name 或 aria-label，其次是从带 id 的祖先开始的 CSS 路径。
+# 看起来是自动生成的 id（以数字开头或包含较长数字串）不会被推荐。
+_SUGGEST = """
+  const stableId = (id) => id && !/^[0-9]|[0-9]{3,}/.test(id);
+  const uniqueMatch = (selector) => {
+    try {
+      const matches = document.querySelectorAll(selector);
+      return matches.length === 1 ? matches[0] : null;
+    } catch (e) {
+      return null;
+    }
+  };
+  const suggestSelector = (el) => {
+    if (!el || el.nodeType !== Node.ELEMENT_NODE) return null;
+    const tag = el.tagName.toLowerCase();
+    const candidates = [];
+    if (stableId(el.id)) candidates.push("#" + CSS.escape(el.id));
+    for (const attr of ["data-testid", "data-test-id", "data-test", "data-qa", "data-cy", "name", "aria-label"]) {
+      const value = el.getAttribute(attr);
+      if (value) candidates.push(tag + "[" + attr + "=" + JSON.stringify(value) + "]");
+    }
+    for (const candidate of candidates) if (uniqueMatch(candidate) === el) return candidate;
+    const path = [];
+    for (let node = el; node && node !== document.documentElement && path.length < 6; node = node.parentElement) {
+      if (node !== el && stableId(node.id)) {
+        path.unshift("#" + CSS.escape(node.id));
+        const candidate = path.join(" > ");
+        return uniqueMatch(candidate) === el ? candidate : null;
+      }
+      const parent = node.parentElement;
+      const siblings = parent ? Array.from(parent.children).filter((child) => child.tagName === node.tagName) : [];
+      const name = node.tagName.toLowerCase();
+      path.unshift(siblings.length > 1 ? name + ":nth-of-type(" + (siblings.indexOf(node) + 1) + ")" : name);
+    }
+    return null;
+  };
+"""
+
+# 测量 CSS/XPath 选择器在页面内的查询耗时（重复 repeat 次取平均，减小计时精度的影响）和匹配数量。
+_SELECTOR_COST = """
+({selector, repeat, suggest}) => {
+  const run = selector.kind === "xpath"
+    ? () => queryAll(document, selector)
+    : () => document.querySelectorAll(selector.value);
+  let matches = run();
+  const started = performance.now();
+  for (let i = 0; i < repeat; i++) matches = run();
+  return {
+    elapsed: (performance.now() - started) / repeat,
+    matches: matches.length,
+    suggestion: suggest && matches.length ? suggestSelector(matches[0]) : null,
+  };
+}
+"""
+
+_SUGGEST_FOR_ELEMENT = """
+(el) => suggestSelector(el)
+"""
+
+_HELPERS = {
+    "advance": _ADVANCE,
+    "cancelWatch": CANCEL_WATCH_SCRIPT,
+    "domQuiet": DOM_QUIET_SCRIPT,
+    "elementStable": ELEMENT_STABLE_SCRIPT,
+    "endStream": _END_STREAM,
+    "extract": _EXTRACT,
+    "requestsIdle": REQUESTS_IDLE_SCRIPT,
+    "selectorCost": _SELECTOR_COST,
+    "snapshot": _SNAPSHOT,
+    "streamExtract": _STREAM_EXTRACT,
+    "suggestSelector": _SUGGEST_FOR_ELEMENT,
+    "tableCell": _TABLE_CELL,
+    "waitForSelectors": WAIT_FOR_SELECTORS_SCRIPT,
+    "watchSelectors": WATCH_SELECTORS_SCRIPT,
+}
+
+# 通过初始化脚本安装到上下文中的每个文档（包括 iframe）。已安装相同或更高版本时不做任何事。
+RUNTIME_SCRIPT = """
+(() => {
+  const version = %(version)d;
+  const current = window.__browserRuntime;
+  if (current && current.version >= version) return;
+  const streams = {};
+%(fields)s
+%(text)s
+%(suggest)s
+  const helpers = {
+%(helpers)s
+  };
+  Object.defineProperty(window, "__browserRuntime", {
+    value: {version, helpers},
+    configurable: true,
+    enumerable: false,
+  });
+})()
+""" % {
+    "version": RUNTIME_VERSION,
+    "fields": _FIELDS,
+    "text": _TEXT,
+    "suggest": _SUGGEST,
+    "helpers": ",\n".join(f"    {name}: {source.strip()}" for name, source in _HELPERS.items()),
+}
+
+# 按名称调用辅助函数，只传输名称和参数。运行时缺失或版本过旧时返回标记，由调用方安装后重试。
+_CALL_SCRIPT = """
+([version, name, args]) => {
+  const runtime = window.__browserRuntime;
+  if (!runtime || runtime.version < version) return {%(missing)s: true};
+  return runtime.helpers[name](...args);
+}
+""" % {"missing": _MISSING}
+
+_ELEMENT_CALL_SCRIPT = """
+(el, [version, name, args]) => {
+  const runtime = window.__browserRuntime;
+  if (!runtime || runtime.version < version) return {%(missing)s: true};
+  return runtime.helpers[name](el, ...args);
+}
+""" % {"missing": _MISSING}
+
+_installed_contexts = weakref.WeakSet()  # 已添加运行时初始化脚本的上下文
+
+
+def install(context):
+    """为上下文添加运行时初始化脚本，之后创建的文档都会自动安装运行时。每个上下文只添加一次。"""
+    if context in _installed_contexts:
+        return
+    context.add_init_script(script=RUNTIME_SCRIPT)
+    _installed_contexts.add(context)
+
+
+def call(target, name: str, *args) -> Any:
+    """在页面或 frame 中按名称调用辅助函数并返回结果。
+
+    第一次调用时为所在的上下文安装运行时；安装之前已经加载的文档在第一次调用时单独安装。
+
+    :param target: Page 或 Frame。
+    :param name: 辅助函数名称，见 `_HELPERS`。
+    :param args: 辅助函数的参数，需要可以序列化。
+    """
+    page = target.page if type(target).__name__ == "Frame" else target
+    install(page.context)
+    result = target.evaluate(_CALL_SCRIPT, [RUNTIME_VERSION, name, list(args)])
+    if _missing(result):
+        target.evaluate(RUNTIME_SCRIPT)
+        result = target.evaluate(_CALL_SCRIPT, [RUNTIME_VERSION, name, list(args)])
+    return result
+
+
+def call_handle(target, name: str, *args):
+    """与 `call` 相同，但返回 JSHandle，用于返回元素的辅助函数。"""
+    page = target.page if type(target).__name__ == "Frame" else target
+    install(page.context)
+    handle = target.evaluate_handle(_CALL_SCRIPT, [RUNTIME_VERSION, name, list(args)])
+    if handle.as_element() is None and _missing(handle.json_value()):
+        handle.dispose()
+        target.evaluate(RUNTIME_SCRIPT)
+        handle = target.evaluate_handle(_CALL_SCRIPT, [RUNTIME_VERSION, name, list(args)])
+    return handle
+
+
+def call_on_element(element, name: str, *args) -> Any:
+    """以元素作为第一个参数调用辅助函数。元素所在的文档一定已经加载，运行时缺失时直接在该文档中安装。"""
+    result = element.evaluate(_ELEMENT_CALL_SCRIPT, [RUNTIME_VERSION, name, list(args)])
+    if _missing(result):
+        element.evaluate(f"() => {RUNTIME_SCRIPT}")
+        result = element.evaluate(_ELEMENT_CALL_SCRIPT, [RUNTIME_VERSION, name, list(args)])
+    return result
+
+
+def _missing(result) -> bool:
+    return isinstance(result, dict) and result.get(_MISSING) is True
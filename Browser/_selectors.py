@@ -0,0 +1,199 @@
+import json
+import re
+import time
+from typing import Any, Dict, List, Optional
+
+from ._api_types import Error
+from ._invoke import resolve_frame
+from ._middleware import InteractionCall
+from ._runtime import call as call_helper, call_on_element
+from ._waits import in_page_selector
+
+# 参数名中包含选择器的参数。
+SELECTOR_ARGUMENTS = ("selector", "source", "target", "item_selector", "ready_selector", "load_more")
+
+# 静态检查：这些写法需要遍历或布局整个 DOM。
+_COSTLY_PATTERNS = [
+    (re.compile(r"(^|>>\s*)text\s*=|:text\(|:has-text\(|:text-is\(|:text-matches\(|^[\"']"),
+     "文本选择器需要读取所有候选元素的文本"),
+    (re.compile(r":(right-of|left-of|above|below|near)\("), "布局选择器需要计算所有候选元素的位置"),
+    (re.compile(r":has\("), ":has() 需要检查每个候选元素的子树"),
+    (re.compile(r"^(xpath=)?//\*|contains\(|//[a-z*]+\[.*text\(\)"), "XPath 从文档根部扫描并比较文本"),
+    (re.compile(r"(^|[\s>+~])\*(?![=\]])"), "通配符 * 会匹配所有元素"),
+    (re.compile(r"visible\s*=\s*true"), "visible=true 需要计算所有候选元素的样式和位置"),
+]
+
+
+class SelectorStats:
+    def __init__(self, selector: str):
+        """一个选择器的耗时和匹配数量统计。"""
+        self.selector = selector
+        self.engine: Optional[str] = None  # css、xpath，或 playwright（Playwright 特有的选择器引擎）
+        self.uses = 0  # 通过 Interaction 使用的次数
+        self.samples: List[float] = []  # 每次测量的查询耗时（以毫秒为单位）
+        self.matches: Optional[int] = None  # 最近一次测量的匹配数量
+        self.methods = set()
+        self.suggestion: Optional[str] = None
+        self.reasons = lint_selector(selector)
+        self.errors = 0  # 无法测量的次数（元素所在的 frame 不存在等）
+
+    @property
+    def mean(self) -> Optional[float]:
+        return sum(self.samples) / len(self.samples) if self.samples else None
+
+    @property
+    def max(self) -> Optional[float]:
+        return max(self.samples) if self.samples else None
+
+    def as_dict(self, slow_threshold: float) -> Dict[str, Any]:
+        mean = self.mean
+        slow = mean is not None and mean >= slow_threshold
+        return {
+            "selector": self.selector,
+            "engine": self.engine,
+            "uses": self.uses,
+            "samples": len(self.samples),
+            "mean": mean,
+            "max": self.max,
+            "estimated_total": mean * self.uses if mean is not None else None,
+            "matches": self.matches,
+            "methods": sorted(self.methods),
+            "slow": slow,
+            "reasons": self.reasons,
+            "suggestion": self.suggestion if slow or self.reasons else None,
+        }
+
+
+def lint_selector(selector: str) -> List[str]:
+    """返回选择器中代价较高的写法的说明。"""
+    element_selector = selector.split(" >>> ")[-1]
+    return [reason for pattern, reason in _COSTLY_PATTERNS if pattern.search(element_selector)]
+
+
+class SelectorProfiler:
+    def __init__(
+            self,
+            *,
+            samples_per_selector: int = 3,
+            repeat: int = 5,
+            slow_threshold: float = 2,
+            suggest: bool = True,
+    ):
+        """测量通过 Interaction 使用的每个选择器在浏览器中的查询耗时和匹配数量，汇总后标记慢选择器并推荐更便宜的写法。
+
+        作为中间件使用（`PlaywrightManager.start_selector_profiling`）。每个选择器只测量前 `samples_per_selector` 次，
+        之后只计数，因此开销有限。CSS 和 XPath 选择器在页面内重复查询 `repeat` 次取平均；
+        Playwright 特有的选择器（text=、:has-text()、布局选择器等）无法在页面内执行，
+        改为测量 `locator.count()` 的耗时并减去一次空 evaluate 的往返时间。
+        等待类方法在调用之后测量（元素此时才出现），其他方法在调用之前测量。
+
+        :param samples_per_selector: 每个选择器测量的次数。
+        :param repeat: 页面内每次测量重复查询的次数。
+        :param slow_threshold: 平均查询耗时不低于该值（以毫秒为单位）时标记为慢选择器。
+        :param suggest: 是否为慢选择器或代价较高的写法推荐替代的选择器。
+        """
+        self.samples_per_selector = samples_per_selector
+        self.repeat = repeat
+        self.slow_threshold = slow_threshold
+        self.suggest = suggest
+        self.stats: Dict[str, SelectorStats] = {}
+
+    def __call__(self, call: InteractionCall, proceed):
+        selectors = self._selectors(call)
+        if not selectors or call.method.startswith("wait_for"):
+            result = proceed()
+            self._measure(call, selectors)
+            return result
+        self._measure(call, selectors)
+        return proceed()
+
+    @staticmethod
+    def _selectors(call: InteractionCall) -> List[str]:
+        selectors = [call.arguments[name] for name in SELECTOR_ARGUMENTS if isinstance(call.arguments.get(name), str)]
+        if isinstance(call.arguments.get("selectors"), (list, tuple)):
+            selectors.extend(selector for selector in call.arguments["selectors"] if isinstance(selector, str))
+        return selectors
+
+    def _measure(self, call: InteractionCall, selectors: List[str]):
+        for selector in selectors:
+            stats = self.stats.get(selector)
+            if stats is None:
+                stats = self.stats[selector] = SelectorStats(selector)
+            stats.uses += 1
+            stats.methods.add(call.method)
+            if len(stats.samples) >= self.samples_per_selector:
+                continue
+            try:
+                self._sample(call.target, stats)
+            except (Error, AssertionError, ValueError):
+                # frame 不存在（find_frame 抛出 AssertionError）、无法解析的选择器（ValueError）、页面正在导航等，
+                # 测量失败不影响调用本身
+                stats.errors += 1
+
+    def _sample(self, target, stats: SelectorStats):
+        frame, element_selector = resolve_frame(target, stats.selector)
+        suggest = self.suggest and stats.suggestion is None
+        try:
+            in_page = in_page_selector(element_selector)
+        except Error:
+            in_page = None
+        if in_page is not None:
+            stats.engine = in_page["kind"]
+            result = call_helper(frame, "selectorCost", {"selector": in_page, "repeat": self.repeat, "suggest": suggest})
+            stats.samples.append(result["elapsed"])
+            stats.matches = result["matches"]
+            suggestion = result["suggestion"]
+        else:
+            stats.engine = "playwright"
+            started = time.perf_counter()
+            frame.evaluate("1")
+            baseline = time.perf_counter() - started
+            locator = frame.locator(element_selector)
+            started = time.perf_counter()
+            stats.matches = locator.count()
+            stats.samples.append(max(time.perf_counter() - started - baseline, 0.0) * 1000)
+            suggestion = None
+            if suggest and stats.matches:
+                element = locator.first.element_handle()
+                try:
+                    suggestion = call_on_element(element, "suggestSelector")
+                finally:
+                    element.dispose()
+        if suggestion and suggestion != element_selector:
+            prefix = stats.selector[:len(stats.selector) - len(element_selector)]
+            stats.suggestion = prefix + suggestion
+
+    def report(self, *, flagged_only: bool = False) -> List[Dict[str, Any]]:
+        """按估计的总耗时（平均耗时 × 使用次数）从高到低返回每个选择器的统计。
+
+        :param flagged_only: 只返回慢选择器或包含代价较高写法的选择器。
+        """
+        rows = [stats.as_dict(self.slow_threshold) for stats in self.stats.values()]
+        if flagged_only:
+            rows = [row for row in rows if row["slow"] or row["reasons"]]
+        return sorted(rows, key=lambda row: row["estimated_total"] or 0, reverse=True)
+
+    def format_report(self, *, flagged_only: bool = True) -> str:
+        """返回可以直接打印的报告。"""
+        lines = []
+        for row in self.report(flagged_only=flagged_only):
+            mean = f"{row['mean']:.2f}ms" if row["mean"] is not None else "-"
+            flag = "慢" if row["slow"] else "  "
+            lines.append(f"{flag} {mean:>9} × {row['uses']:<4} 匹配 {row['matches']}  {row['selector']}")
+            for reason in row["reasons"]:
+                lines.append(f"      - {reason}")
+            if row["suggestion"]:
+                lines.append(f"      建议：{row['suggestion']}")
+        return "\n".join(lines)
+
+    def save(self, path: str):
+        """将报告保存为 JSON 文件。"""
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(self.report(), file, ensure_ascii=False, indent=2)
+
+    def reset(self):
+        self.stats.clear()
+
+    def __repr__(self):
+        return f"SelectorProfiler(selectors={len(self.stats)})"
+
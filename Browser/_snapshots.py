@@ -0,0 +1,252 @@
+import collections
+import hashlib
+import io
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Dict, List, Optional
+
+from ._api_structures import FloatRect
+from ._api_types import Error
+from ._invoke import determine_element
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow 是可选依赖，没有安装时只能跳过完全相同的帧
+    Image = None
+
+_STOP = object()  # 通知工作线程退出
+
+
+class CaptureResult:
+    def __init__(self, name: str, kind: str, capture_time: float):
+        """一次截图或 PDF 的处理结果。
+
+        :param name: 文件名（不含扩展名）。
+        :param kind: screenshot 或 pdf。
+        :param capture_time: 在自动化线程中获取图像花费的时间（以毫秒为单位）。
+        """
+        self.name = name
+        self.kind = kind
+        self.capture_time = capture_time
+        self.path: Optional[str] = None
+        self.skipped = False  # 与上一帧相同（按 dedupe_distance 判断），未写入
+        self.dropped = False  # 队列已满，未处理
+        self.error: Optional[str] = None
+        self.done = threading.Event()
+
+    def __repr__(self):
+        state = "skipped" if self.skipped else "dropped" if self.dropped else self.path
+        return f"CaptureResult({self.name!r}, {state})"
+
+
+class CapturePipeline:
+    def __init__(
+            self,
+            output_dir: str,
+            *,
+            workers: int = 2,
+            max_queue: int = 32,
+            overflow: str = "drop",
+            encoding: str = None,
+            quality: int = 80,
+            dedupe: bool = False,
+            dedupe_distance: int = 0,
+    ):
+        """截图和 PDF 的批量处理管道。
+
+        自动化线程只负责从浏览器取回图像数据，编码、压缩、去重和写入磁盘都在后台线程中进行。
+        队列有上限，已满时按 `overflow` 处理：`drop` 丢弃新的截图，`block` 等待队列腾出空间。
+
+        :param output_dir: 输出目录，不存在时自动创建。
+        :param workers: 后台线程数。大于 1 时，去重比较的是最近处理完成的一帧，而不一定是前一帧。
+        :param max_queue: 等待处理的截图数量上限。
+        :param overflow: 队列已满时的处理方式，`drop` 或 `block`。
+        :param encoding: 在后台线程中重新编码的格式，例如 webp、jpeg。需要安装 Pillow。默认直接保存浏览器返回的 PNG。
+        :param quality: 重新编码的质量，0-100。
+        :param dedupe: 是否跳过与同一流中上一帧相同的截图。默认不跳过：输入的值、勾选状态或错误提示的变化
+            在截图中只占很小的区域，审计用的截图不应当因此丢失。
+        :param dedupe_distance: 为 0（默认）时只跳过完全相同的截图。大于 0 时使用 256 位感知哈希，
+            汉明距离不超过该值时视为相同，会跳过只有细小变化的帧。需要安装 Pillow，没有安装时只跳过完全相同的截图。
+        """
+        if overflow not in ("drop", "block"):
+            raise ValueError(f"overflow 应当是 drop 或 block，而不是 {overflow}。")
+        if encoding is not None and Image is None:
+            raise Error("重新编码截图需要安装 Pillow：pip install Pillow")
+        self.output_dir = output_dir
+        self.encoding = encoding
+        self.quality = quality
+        self.dedupe = dedupe
+        self.dedupe_distance = dedupe_distance if Image is not None else 0
+        self._overflow = overflow
+
+        self.results = collections.deque(maxlen=1000)  # 最近的处理结果
+        self.captured = 0
+        self.skipped = 0
+        self.dropped = 0
+        self._last_hashes: Dict[str, int] = {}  # 每个流最近写入的一帧的哈希
+        self._lock = threading.Lock()
+        self._sequence = 0
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        os.makedirs(output_dir, exist_ok=True)
+        self._workers: List[threading.Thread] = [
+            threading.Thread(target=self._work, name=f"capture-{index}", daemon=True) for index in range(workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def screenshot(
+            self,
+            active,
+            name: str = None,
+            *,
+            selector: str = None,
+            clip: FloatRect = None,
+            full_page: bool = None,
+            stream: str = "default",
+    ) -> CaptureResult:
+        """截取页面、元素或指定区域，交给后台线程处理。
+
+        :param active: 当前的 Page 或 Frame。
+        :param name: 文件名（不含扩展名）。默认按序号生成。
+        :param selector: 截取该元素，支持 `>>>`。
+        :param clip: 截取页面的指定区域。
+        :param full_page: 是否截取整个可滚动页面。
+        :param stream: 去重分组，只与同一流中的上一帧比较。
+        """
+        started = time.perf_counter()
+        if selector is not None:
+            element = determine_element(active, selector)
+            if element is None:
+                raise Error(f"未找到匹配选择器 {selector} 的元素")
+            data = element.screenshot(type="png")
+        else:
+            page = active.page if type(active).__name__ == "Frame" else active
+            data = page.screenshot(type="png", clip=clip, full_page=full_page)
+        result = CaptureResult(self._name(name), "screenshot", (time.perf_counter() - started) * 1000)
+        self._submit(result, data, stream)
+        return result
+
+    def pdf(self, page, name: str = None, **options) -> CaptureResult:
+        """生成页面的 PDF，交给后台线程写入。仅支持无头模式的 Chromium。
+
+        :param page: 要生成 PDF 的页面。
+        :param name: 文件名（不含扩展名）。默认按序号生成。
+        :param options: 传递给 page.pdf 的其他选项，例如 format、landscape。
+        """
+        started = time.perf_counter()
+        data = page.pdf(**options)
+        result = CaptureResult(self._name(name), "pdf", (time.perf_counter() - started) * 1000)
+        self._submit(result, data, None)
+        return result
+
+    def flush(self, timeout: float = None) -> bool:
+        """等待队列中的所有截图处理完成。
+
+        :param timeout: 以毫秒为单位的最长时间。默认一直等待。
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout / 1000
+        for result in list(self.results):
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if not result.done.wait(remaining):
+                return False
+        return True
+
+    def close(self):
+        """处理完队列中的截图后停止后台线程。"""
+        for _ in self._workers:
+            self._queue.put(_STOP)
+        for worker in self._workers:
+            worker.join()
+        self._workers = []
+
+    def _name(self, name: Optional[str]) -> str:
+        with self._lock:
+            self._sequence += 1
+            return name or f"capture-{self._sequence:06d}"
+
+    def _submit(self, result: CaptureResult, data: bytes, stream: Optional[str]):
+        self.results.append(result)
+        item = (result, data, stream)
+        if self._overflow == "block":
+            self._queue.put(item)
+        else:
+            try:
+                self._queue.put_nowait(item)
+            except queue.Full:
+                result.dropped = True
+                result.done.set()
+                self.dropped += 1
+                return
+        self.captured += 1
+
+    def _work(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            result, data, stream = item
+            try:
+                self._process(result, data, stream)
+            except Exception as e:
+                result.error = str(e)
+                logging.getLogger(__name__).error(f"处理截图 {result.name} 失败：{e}")
+            finally:
+                result.done.set()
+
+    def _process(self, result: CaptureResult, data: bytes, stream: Optional[str]):
+        if result.kind == "pdf":
+            result.path = self._write(f"{result.name}.pdf", data)
+            return
+        image = Image.open(io.BytesIO(data)) if Image is not None else None
+        if self.dedupe and stream is not None:
+            if image is not None and self.dedupe_distance > 0:
+                fingerprint = _difference_hash(image)
+            else:
+                fingerprint = _digest(data)
+            with self._lock:
+                # 与最近写入的一帧比较：跳过的帧不更新基准，否则缓慢变化的页面会一直被跳过
+                previous = self._last_hashes.get(stream)
+                skip = previous is not None and bin(previous ^ fingerprint).count("1") <= self.dedupe_distance
+                if skip:
+                    self.skipped += 1
+                else:
+                    self._last_hashes[stream] = fingerprint
+            if skip:
+                result.skipped = True
+                return
+        if self.encoding is None:
+            result.path = self._write(f"{result.name}.png", data)
+            return
+        buffer = io.BytesIO()
+        if self.encoding.lower() in ("jpeg", "jpg"):
+            image = image.convert("RGB")
+        image.save(buffer, format=self.encoding.upper(), quality=self.quality)
+        result.path = self._write(f"{result.name}.{self.encoding.lower()}", buffer.getvalue())
+
+    def _write(self, filename: str, data: bytes) -> str:
+        path = os.path.join(self.output_dir, filename)
+        with open(path, "wb") as file:
+            file.write(data)
+        return path
+
+    def __repr__(self):
+        return f"CapturePipeline(captured={self.captured}, skipped={self.skipped}, dropped={self.dropped})"
+
+
+def _difference_hash(image, size: int = 16) -> int:
+    """`size` × `size` 位的差异哈希（dHash），对压缩噪声和微小渲染差异不敏感。"""
+    pixels = list(image.convert("L").resize((size + 1, size)).getdata())
+    fingerprint = 0
+    for row in range(size):
+        for column in range(size):
+            left = pixels[row * (size + 1) + column]
+            right = pixels[row * (size + 1) + column + 1]
+            fingerprint = (fingerprint << 1) | (1 if left > right else 0)
+    return fingerprint
+
+
+def _digest(data: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "big")
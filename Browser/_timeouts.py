@@ -0,0 +1,178 @@
+import collections
+import json
+import math
+import os
+import re
+import time
+from typing import Deque, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+from ._middleware import InteractionCall, NAVIGATION_METHODS
+
+_NUMBER_SEGMENT = re.compile(r"^\d+$")
+_ID_SEGMENT = re.compile(r"^(?:[0-9a-fA-F]{8,}|[0-9a-fA-F-]{32,36})$")
+
+
+def url_pattern(url: str) -> str:
+    """将 URL 归一化为模式：去掉查询参数和片段，路径中的数字和 ID 替换为占位符。
+    例如 https://example.com/orders/123/edit?tab=1 => https://example.com/orders/{n}/edit
+    """
+    if not url:
+        return ""
+    parts = urlsplit(url)
+    segments = []
+    for segment in parts.path.split("/"):
+        if _NUMBER_SEGMENT.match(segment):
+            segments.append("{n}")
+        elif _ID_SEGMENT.match(segment):
+            segments.append("{id}")
+        else:
+            segments.append(segment)
+    if parts.scheme in ("http", "https"):
+        return f"{parts.scheme}://{parts.netloc}{'/'.join(segments)}"
+    return f"{parts.scheme}:{'/'.join(segments)}"
+
+
+class AdaptiveTimeouts:
+    def __init__(
+            self,
+            path: str = None,
+            *,
+            percentile: float = 99,
+            safety_factor: float = 3.0,
+            floor: float = 1000,
+            ceiling: float = None,
+            navigation_floor: float = 5000,
+            navigation_ceiling: float = None,
+            min_samples: int = 20,
+            max_samples: int = 500,
+            autosave_every: int = 100,
+    ):
+        """根据观察到的耗时为每个（方法、选择器、URL 模式）推导超时时间。
+
+        样本足够之前使用调用方传入的超时或默认超时；之后未显式传入 `timeout` 的调用会使用
+        `p{percentile} * safety_factor`，并限制在下限和上限之间。只记录成功调用的耗时：
+        因超时而失败的调用不计入样本，否则反复失败会把超时时间逐步推高到上限，故障反而暴露得更慢。
+
+        :param path: 持久化统计数据的 JSON 文件路径。为空时不持久化。
+        :param percentile: 推导超时时间所用的分位数。默认为 99。
+        :param safety_factor: 分位数乘以的安全系数。默认为 3。
+        :param floor: 普通操作超时时间的下限（以毫秒为单位）。
+        :param ceiling: 普通操作超时时间的上限（以毫秒为单位）。默认为 PlaywrightManager 的 `timeout`。
+        :param navigation_floor: 导航超时时间的下限（以毫秒为单位）。
+        :param navigation_ceiling: 导航超时时间的上限（以毫秒为单位）。默认为 PlaywrightManager 的 `navigation_timeout`。
+        :param min_samples: 开始推导超时时间所需的最少样本数。
+        :param max_samples: 每个键最多保留的样本数，旧样本会被丢弃。
+        :param autosave_every: 每记录多少个样本自动保存一次。传递 0 以禁用自动保存。
+        """
+        self.path = path
+        self.percentile = percentile
+        self.safety_factor = safety_factor
+        self.floor = floor
+        self.ceiling = ceiling
+        self.navigation_floor = navigation_floor
+        self.navigation_ceiling = navigation_ceiling
+        self.min_samples = min_samples
+        self.max_samples = max_samples
+        self.autosave_every = autosave_every
+
+        self._samples: Dict[Tuple[str, str, str], Deque[float]] = {}
+        self._unsaved = 0
+        if path and os.path.exists(path):
+            self.load(path)
+
+    def bind_defaults(self, timeout: float, navigation_timeout: float):
+        """未指定上限时，使用 PlaywrightManager 的默认超时作为上限。"""
+        if self.ceiling is None:
+            self.ceiling = timeout
+        if self.navigation_ceiling is None:
+            self.navigation_ceiling = navigation_timeout
+
+    def __call__(self, call: InteractionCall, proceed):
+        if not call.accepts_timeout:
+            return proceed()
+        key = self.key_for(call)
+        if call.arguments.get("timeout") is None:
+            timeout = self.timeout_for(key, navigation=call.is_navigation)
+            if timeout is not None:
+                call.arguments["timeout"] = timeout
+        started = time.monotonic()
+        result = proceed()  # 失败（包括超时）的调用不记录
+        self.record(key, (time.monotonic() - started) * 1000)
+        return result
+
+    @staticmethod
+    def key_for(call: InteractionCall) -> Tuple[str, str, str]:
+        """返回调用的（方法、选择器、URL 模式）。wait_for_any、wait_for_all 等接受多个选择器的方法，
+        以整组选择器（JSON 数组）作为选择器，不同的选择器组分别统计。"""
+        if call.is_navigation:
+            return call.method, url_pattern(call.selector or ""), ""
+        selector = call.selector
+        selectors = call.arguments.get("selectors")
+        if selector is None and isinstance(selectors, (list, tuple)):
+            selector = json.dumps([str(item) for item in selectors], ensure_ascii=False)
+        return call.method, selector or "", url_pattern(call.url)
+
+    def record(self, key: Tuple[str, str, str], elapsed: float):
+        """记录一次成功调用的耗时（以毫秒为单位）。"""
+        samples = self._samples.get(key)
+        if samples is None:
+            samples = self._samples[key] = collections.deque(maxlen=self.max_samples)
+        samples.append(elapsed)
+        self._unsaved += 1
+        if self.path and self.autosave_every and self._unsaved >= self.autosave_every:
+            self.save()
+
+    def timeout_for(self, key: Tuple[str, str, str], navigation: bool = False) -> Optional[float]:
+        """返回推导出的超时时间。样本不足时返回 None。"""
+        samples = self._samples.get(key)
+        if not samples or len(samples) < self.min_samples:
+            return None
+        ordered = sorted(samples)
+        rank = max(0, math.ceil(len(ordered) * self.percentile / 100) - 1)
+        timeout = ordered[rank] * self.safety_factor
+        floor, ceiling = (
+            (self.navigation_floor, self.navigation_ceiling) if navigation else (self.floor, self.ceiling)
+        )
+        timeout = max(timeout, floor)
+        if ceiling:
+            timeout = min(timeout, ceiling)
+        return round(timeout)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """返回每个键的样本数和推导出的超时时间。"""
+        report = {}
+        for key, samples in self._samples.items():
+            report[" | ".join(key)] = {
+                "samples": len(samples),
+                "max": max(samples),
+                "timeout": self.timeout_for(key, navigation=key[0] in NAVIGATION_METHODS),
+            }
+        return report
+
+    def load(self, path: str = None):
+        """从 JSON 文件加载统计数据，与已有样本合并。"""
+        with open(path or self.path, encoding="utf-8") as file:
+            data = json.load(file)
+        for entry in data.get("entries", []):
+            key = (entry["method"], entry["selector"], entry["url"])
+            samples = self._samples.setdefault(key, collections.deque(maxlen=self.max_samples))
+            samples.extend(entry["samples"])
+
+    def save(self, path: str = None):
+        """将统计数据写入 JSON 文件。先写临时文件再替换，避免中断时损坏原文件。"""
+        path = path or self.path
+        if not path:
+            return
+        data = {
+            "version": 1,
+            "entries": [
+                {"method": key[0], "selector": key[1], "url": key[2], "samples": [round(s, 1) for s in samples]}
+                for key, samples in self._samples.items()
+            ],
+        }
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump(data, file, ensure_ascii=False)
+        os.replace(temp_path, path)
+        self._unsaved = 0
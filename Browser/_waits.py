@@ -0,0 +1,267 @@
+import re
+from typing import Dict
+
+from ._api_types import Error
+
+# 未指定超时时使用的默认等待时间（以毫秒为单位），与 Playwright 的默认值一致。
+DEFAULT_WAIT_TIMEOUT = 30000
+
+# 在页面内查询 CSS/XPath 选择器并判断状态的公共代码。
+_SELECTOR_PRELUDE = """
+  const query = (sel) => {
+    if (sel.kind === "xpath")
+      return document.evaluate(sel.value, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null)
+        .singleNodeValue;
+    return document.querySelector(sel.value);
+  };
+  const visible = (el) => {
+    const rect = el.getBoundingClientRect();
+    const style = getComputedStyle(el);
+    return rect.width > 0 && rect.height > 0 && style.visibility !== "hidden";
+  };
+  const check = (sel, state) => {
+    const el = query(sel);
+    if (state === "attached") return !!el;
+    if (state === "detached") return !el;
+    if (state === "visible") return !!el && visible(el);
+    return !el || !visible(el);
+  };
+  const evaluate = () => {
+    const results = selectors.map((sel) => check(sel, state));
+    if (mode === "any") return results.indexOf(true);
+    return results.every(Boolean) ? 0 : -1;
+  };
+"""
+
+# 在一个 frame 内用一个 MutationObserver 等待多个选择器中的任意一个/全部满足状态。
+# 可见性可能因样式变化而改变，因此等待 visible/hidden 时还会在每一帧重新检查。
+WAIT_FOR_SELECTORS_SCRIPT = """
+async ({selectors, state, mode, timeout}) => {
+%(prelude)s
+  return await new Promise((resolve) => {
+    let timer = null, raf = null;
+    const observer = new MutationObserver(() => test());
+    const finish = (result) => {
+      observer.disconnect();
+      if (timer !== null) clearTimeout(timer);
+      if (raf !== null) cancelAnimationFrame(raf);
+      resolve(result);
+    };
+    const test = () => {
+      const index = evaluate();
+      if (index >= 0) finish({index});
+      return index >= 0;
+    };
+    const frame = () => {
+      if (!test()) raf = requestAnimationFrame(frame);
+    };
+    if (test()) return;
+    observer.observe(document, {subtree: true, childList: true, attributes: true, characterData: true});
+    if (state === "visible" || state === "hidden") raf = requestAnimationFrame(frame);
+    if (timeout) timer = setTimeout(() => finish({timedOut: true}), timeout);
+  });
+}
+""" % {"prelude": _SELECTOR_PRELUDE}
+
+# 与 WAIT_FOR_SELECTORS_SCRIPT 相同，但不等待结果，而是在满足条件时通过 console.debug 输出 `token:group:index`。
+# 用于同时等待多个 frame 中的选择器。
+WATCH_SELECTORS_SCRIPT = """
+({selectors, state, mode, token, group}) => {
+%(prelude)s
+  const watches = window.__browserWaits = window.__browserWaits || {};
+  let raf = null;
+  const observer = new MutationObserver(() => test());
+  const cancel = () => {
+    observer.disconnect();
+    if (raf !== null) cancelAnimationFrame(raf);
+    delete watches[token];
+  };
+  const test = () => {
+    const index = evaluate();
+    if (index >= 0) {
+      cancel();
+      console.debug(token + ":" + group + ":" + index);
+    }
+    return index >= 0;
+  };
+  const frame = () => {
+    if (!test()) raf = requestAnimationFrame(frame);
+  };
+  watches[token] = {cancel};
+  if (test()) return;
+  observer.observe(document, {subtree: true, childList: true, attributes: true, characterData: true});
+  if (state === "visible" || state === "hidden") raf = requestAnimationFrame(frame);
+}
+""" % {"prelude": _SELECTOR_PRELUDE}
+
+CANCEL_WATCH_SCRIPT = """
+token => window.__browserWaits && window.__browserWaits[token] && window.__browserWaits[token].cancel()
+"""
+
+# 等待 `root` 的子树在 `quiet` 毫秒内没有任何变更。
+DOM_QUIET_SCRIPT = """
+(root, {quiet, timeout}) => new Promise((resolve) => {
+  const started = performance.now();
+  let quietTimer = null, timeoutTimer = null;
+  const finish = (result) => {
+    observer.disconnect();
+    clearTimeout(quietTimer);
+    clearTimeout(timeoutTimer);
+    resolve(result);
+  };
+  const observer = new MutationObserver(() => {
+    clearTimeout(quietTimer);
+    quietTimer = setTimeout(() => finish({elapsed: performance.now() - started}), quiet);
+  });
+  observer.observe(root || document.documentElement,
+    {subtree: true, childList: true, attributes: true, characterData: true});
+  quietTimer = setTimeout(() => finish({elapsed: performance.now() - started}), quiet);
+  if (timeout) timeoutTimer = setTimeout(() => finish({timedOut: true}), timeout);
+})
+"""
+
+# 等待元素的位置和尺寸在连续 `frames` 个动画帧内保持不变。
+ELEMENT_STABLE_SCRIPT = """
+(el, {frames, timeout}) => new Promise((resolve) => {
+  const started = performance.now();
+  let last = null, count = 0, raf = null, timer = null;
+  const finish = (result) => {
+    cancelAnimationFrame(raf);
+    clearTimeout(timer);
+    resolve(result);
+  };
+  const step = () => {
+    if (!el.isConnected) return finish({detached: true});
+    const rect = el.getBoundingClientRect();
+    const key = [rect.x, rect.y, rect.width, rect.height].join(",");
+    if (key === last) {
+      if (++count >= frames) return finish({elapsed: performance.now() - started});
+    } else {
+      last = key;
+      count = 0;
+    }
+    raf = requestAnimationFrame(step);
+  };
+  raf = requestAnimationFrame(step);
+  if (timeout) timer = setTimeout(() => finish({timedOut: true}), timeout);
+})
+"""
+
+# 记录页面中尚未完成的 fetch/XMLHttpRequest 请求。
+# 通过初始化脚本安装后可以覆盖之后创建的所有文档；安装之前已发出的请求无法被跟踪。
+REQUEST_TRACKER_SCRIPT = """
+(() => {
+  if (window.__browserRequestTracker) return;
+  const pending = new Map();
+  const listeners = new Set();
+  let seq = 0;
+  const notify = () => listeners.forEach((listener) => listener());
+  const resolveUrl = (url) => {
+    try {
+      return new URL(String(url), location.href).href;
+    } catch (e) {
+      return String(url);
+    }
+  };
+  const begin = (url) => {
+    const id = ++seq;
+    pending.set(id, resolveUrl(url));
+    notify();
+    return () => {
+      pending.delete(id);
+      notify();
+    };
+  };
+  const originalFetch = window.fetch;
+  if (originalFetch) {
+    window.fetch = function (input, init) {
+      const end = begin(input && input.url ? input.url : input);
+      return originalFetch.apply(this, arguments).finally(end);
+    };
+  }
+  const open = XMLHttpRequest.prototype.open;
+  const send = XMLHttpRequest.prototype.send;
+  XMLHttpRequest.prototype.open = function (method, url) {
+    this.__browserUrl = url;
+    return open.apply(this, arguments);
+  };
+  XMLHttpRequest.prototype.send = function () {
+    this.addEventListener("loadend", begin(this.__browserUrl), {once: true});
+    return send.apply(this, arguments);
+  };
+  window.__browserRequestTracker = {
+    pending: (pattern) => [...pending.values()].filter((url) => !pattern || new RegExp(pattern).test(url)),
+    listen: (listener) => {
+      listeners.add(listener);
+      return () => listeners.delete(listener);
+    },
+  };
+})()
+"""
+
+# 等待没有匹配 `pattern` 的未完成请求，并保持 `idle` 毫秒。
+REQUESTS_IDLE_SCRIPT = """
+({pattern, idle, timeout}) => new Promise((resolve) => {
+  const tracker = window.__browserRequestTracker;
+  const started = performance.now();
+  let idleTimer = null, timeoutTimer = null;
+  const finish = (result) => {
+    stop();
+    clearTimeout(idleTimer);
+    clearTimeout(timeoutTimer);
+    resolve(result);
+  };
+  const check = () => {
+    clearTimeout(idleTimer);
+    if (!tracker.pending(pattern).length)
+      idleTimer = setTimeout(() => finish({elapsed: performance.now() - started}), idle);
+  };
+  const stop = tracker.listen(check);
+  if (timeout) timeoutTimer = setTimeout(() => finish({timedOut: true, pending: tracker.pending(pattern)}), timeout);
+  check();
+})
+"""
+
+_ENGINE_PATTERN = re.compile(r"^([a-zA-Z_-]+)=(.*)$", re.S)
+
+
+def in_page_selector(selector: str) -> Dict[str, str]:
+    """将选择器转换为可以在页面内直接查询的 CSS 或 XPath 选择器。
+    页面内无法使用 Playwright 特有的选择器引擎（例如 text=、:has-text()、>>），这类选择器会引发异常。
+    """
+    selector = selector.strip()
+    if selector.startswith("//") or selector.startswith(".."):
+        return {"kind": "xpath", "value": selector}
+    matched = _ENGINE_PATTERN.match(selector)
+    if matched:
+        engine, body = matched.group(1), matched.group(2)
+        if body.startswith("'") or body.startswith('"'):
+            body = body[1:-1]
+        if engine == "css":
+            return {"kind": "css", "value": body}
+        if engine == "xpath":
+            return {"kind": "xpath", "value": body}
+        if engine == "id":
+            return {"kind": "css", "value": f'[id="{body}"]'}
+        if engine in ("data-testid", "data-test-id", "data-test"):
+            return {"kind": "css", "value": f'[{engine}="{body}"]'}
+        raise Error(f"页面内等待不支持选择器引擎 {engine}=，请使用 CSS 或 XPath 选择器：{selector}")
+    if " >> " in selector or ":has-text(" in selector or ":text(" in selector:
+        raise Error(f"页面内等待不支持 Playwright 扩展选择器，请使用 CSS 或 XPath 选择器：{selector}")
+    return {"kind": "css", "value": selector}
+
+
+def effective_timeout(timeout: float = None, default: float = None) -> float:
+    """返回页面内等待使用的超时时间：显式传入的 `timeout`，其次是 `default`（管理器的默认超时），最后是 30 秒。"""
+    if timeout is not None:
+        return timeout
+    return DEFAULT_WAIT_TIMEOUT if default is None else default
+
+
+def pattern_source(url_pattern) -> str:
+    """返回正则表达式的源码，供页面内的 RegExp 使用。"""
+    if url_pattern is None:
+        return None
+    if isinstance(url_pattern, re.Pattern):
+        return url_pattern.pattern
+    return url_pattern
@@ -0,0 +1,245 @@
+import logging
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from ._api_types import Error
+from ._middleware import InteractionCall
+
+try:
+    import psutil
+except ImportError:  # psutil 是可选依赖，没有安装时在 Linux 上读取 /proc
+    psutil = None
+
+_MB = 1024 * 1024
+
+# 非 Chromium 浏览器无法使用 CDP，只能在页面内粗略估计。
+_PAGE_METRICS_SCRIPT = """
+() => ({
+  jsHeap: performance.memory ? performance.memory.usedJSHeapSize : null,
+  nodes: document.getElementsByTagName("*").length,
+})
+"""
+
+
+class MemoryWatchdog:
+    def __init__(
+            self,
+            manager,
+            *,
+            max_js_heap: float = 512,
+            max_dom_nodes: int = 200000,
+            max_listeners: int = 100000,
+            max_rss: float = None,
+            check_every: int = 50,
+            min_interval: float = 10,
+            on_recycle: Callable[[Dict[str, Any]], None] = None,
+    ):
+        """监控浏览器内存，超过阈值时回收上下文。
+
+        作为中间件注册到 PlaywrightManager，每隔 `check_every` 次调用（且距上次检查至少 `min_interval` 秒）采样一次。
+        Chromium 通过 CDP 的 Performance.getMetrics 采集 JS 堆、DOM 节点和事件监听器数量；
+        Firefox 和 WebKit 只能在页面内统计 DOM 节点数量。浏览器进程的常驻内存需要 psutil 或 Linux 的 /proc。
+
+        :param manager: PlaywrightManager 实例。
+        :param max_js_heap: 单个页面 JS 堆使用量的上限（以 MB 为单位）。
+        :param max_dom_nodes: 单个页面 DOM 节点数量的上限。
+        :param max_listeners: 单个页面事件监听器数量的上限。
+        :param max_rss: 浏览器进程常驻内存总量的上限（以 MB 为单位）。默认不检查。
+        :param check_every: 每隔多少次调用检查一次。
+        :param min_interval: 两次检查之间的最短间隔（以秒为单位）。
+        :param on_recycle: 回收上下文后调用，参数为回收事件。
+        """
+        self._manager = manager
+        self.max_js_heap = max_js_heap
+        self.max_dom_nodes = max_dom_nodes
+        self.max_listeners = max_listeners
+        self.max_rss = max_rss
+        self.check_every = check_every
+        self.min_interval = min_interval
+        self.on_recycle = on_recycle
+
+        self.events: List[Dict[str, Any]] = []  # 回收事件
+        self.last_sample: Optional[Dict[str, Any]] = None
+        self._calls = 0
+        self._last_check = time.monotonic()
+        self._sessions: Dict[Any, Any] = {}  # 每个页面的 CDPSession
+
+    def __call__(self, call: InteractionCall, proceed):
+        result = proceed()
+        self._calls += 1
+        if self._calls >= self.check_every and time.monotonic() - self._last_check >= self.min_interval:
+            if self.check() is not None:
+                # 让调用方持有的 Interaction 对象指向回收后的页面
+                call.interaction._bind(self._manager._interaction)
+                call.interaction._change_feed = None
+        return result
+
+    def sample(self) -> Dict[str, Any]:
+        """采样当前上下文中每个页面的指标以及浏览器进程的常驻内存。"""
+        context = self._manager._context
+        pages = context.pages if context is not None else []
+        sample = {
+            "time": time.time(),
+            "pages": [self._page_metrics(page) for page in pages],
+            "rss": _browser_rss(self._executable_path()),
+        }
+        self.last_sample = sample
+        return sample
+
+    def check(self) -> Optional[Dict[str, Any]]:
+        """采样并与阈值比较，超过时回收上下文。返回回收事件，未回收时返回 None。"""
+        self._calls = 0
+        self._last_check = time.monotonic()
+        sample = self.sample()
+        reasons = self._violations(sample)
+        if not reasons:
+            return None
+        started = time.perf_counter()
+        self._sessions.clear()
+        try:
+            snapshot = self._manager.recycle_context()
+        except Error as e:
+            logging.getLogger(__name__).warning(f"内存超过阈值（{'；'.join(reasons)}），但无法回收上下文：{e}")
+            return None
+        event = {
+            "time": time.time(),
+            "reasons": reasons,
+            "sample": sample,
+            "urls": snapshot["urls"],
+            "elapsed": (time.perf_counter() - started) * 1000,
+        }
+        self.events.append(event)
+        logging.getLogger(__name__).info(f"已回收浏览器上下文：{'；'.join(reasons)}，耗时 {event['elapsed']:.0f}ms")
+        if self.on_recycle is not None:
+            self.on_recycle(event)
+        return event
+
+    def _executable_path(self) -> Optional[str]:
+        """返回当前浏览器的可执行文件路径，用于区分同一个驱动启动的多个浏览器。"""
+        manager = self._manager
+        if manager._launch_options is not None and manager._launch_options.get("executable_path"):
+            return str(manager._launch_options["executable_path"])
+        if manager._browser is not None:
+            try:
+                return manager._browser.browser_type.executable_path
+            except Error:
+                ...
+        return None
+
+    def _violations(self, sample: Dict[str, Any]) -> List[str]:
+        reasons = []
+        for metrics in sample["pages"]:
+            url = metrics["url"]
+            if metrics.get("js_heap") is not None and metrics["js_heap"] / _MB > self.max_js_heap:
+                reasons.append(f"{url} 的 JS 堆为 {metrics['js_heap'] / _MB:.0f}MB")
+            if metrics.get("nodes") is not None and metrics["nodes"] > self.max_dom_nodes:
+                reasons.append(f"{url} 的 DOM 节点数为 {metrics['nodes']}")
+            if metrics.get("listeners") is not None and metrics["listeners"] > self.max_listeners:
+                reasons.append(f"{url} 的事件监听器数为 {metrics['listeners']}")
+        if self.max_rss is not None and sample["rss"] is not None and sample["rss"] / _MB > self.max_rss:
+            reasons.append(f"浏览器进程常驻内存为 {sample['rss'] / _MB:.0f}MB")
+        return reasons
+
+    def _page_metrics(self, page) -> Dict[str, Any]:
+        metrics = {"url": page.url, "js_heap": None, "nodes": None, "listeners": None}
+        try:
+            if page.context.browser is not None and page.context.browser.browser_type.name == "chromium":
+                session = self._sessions.get(page)
+                if session is None:
+                    session = self._sessions[page] = page.context.new_cdp_session(page)
+                    session.send("Performance.enable")
+                    page.once("close", lambda _: self._sessions.pop(page, None))
+                values = {item["name"]: item["value"] for item in session.send("Performance.getMetrics")["metrics"]}
+                metrics["js_heap"] = values.get("JSHeapUsedSize")
+                metrics["nodes"] = values.get("Nodes")
+                metrics["listeners"] = values.get("JSEventListeners")
+            else:
+                values = page.evaluate(_PAGE_METRICS_SCRIPT)
+                metrics["js_heap"] = values["jsHeap"]
+                metrics["nodes"] = values["nodes"]
+        except Error:  # 页面正在导航或已经关闭
+            ...
+        return metrics
+
+
+def _browser_rss(executable_path: str = None) -> Optional[int]:
+    """返回当前进程的 Playwright 驱动启动的浏览器进程树的常驻内存总和（以字节为单位）。
+
+    驱动进程本身和当前进程的其他子进程不计入。找不到浏览器进程（例如通过 CDP 连接的浏览器）时返回 None。
+
+    :param executable_path: 浏览器可执行文件的路径。指定时只统计以该文件启动的浏览器进程及其子孙进程。
+    """
+    table = _process_table()
+    if table is None:
+        return None
+    pids = _browser_processes(table, os.getpid(), executable_path)
+    if not pids:
+        return None
+    return sum(table[pid][1] for pid in pids)
+
+
+def _process_table() -> Optional[Dict[int, Tuple[int, int, List[str]]]]:
+    """返回当前进程所有子孙进程的父进程号、常驻内存和命令行。无法读取进程信息时返回 None。"""
+    table: Dict[int, Tuple[int, int, List[str]]] = {}
+    if psutil is not None:
+        for child in psutil.Process().children(recursive=True):
+            try:
+                table[child.pid] = (child.ppid(), child.memory_info().rss, child.cmdline())
+            except psutil.Error:
+                ...
+        return table
+    if not os.path.isdir("/proc"):
+        return None
+    page_size = os.sysconf("SC_PAGE_SIZE")
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as file:
+                fields = file.read().rsplit(")", 1)[1].split()
+            with open(f"/proc/{entry}/cmdline", "rb") as file:
+                cmdline = file.read().decode("utf-8", "replace").split("\0")[:-1]
+            table[int(entry)] = (int(fields[1]), int(fields[21]) * page_size, cmdline)
+        except (OSError, IndexError, ValueError):
+            ...
+    return table
+
+
+def _browser_processes(
+        table: Dict[int, Tuple[int, int, List[str]]],
+        root: int,
+        executable_path: str = None,
+) -> List[int]:
+    """从进程表中找出 `root` 的 Playwright 驱动（命令行包含 run-driver）启动的浏览器进程及其子孙进程。
+
+    :param table: 进程号到（父进程号、常驻内存、命令行）的映射。
+    :param root: 启动驱动的进程，通常是当前进程。
+    :param executable_path: 浏览器可执行文件的路径。指定时只保留以该文件启动的浏览器主进程。
+    """
+    children: Dict[int, List[int]] = {}
+    for pid, (parent, _, _) in table.items():
+        children.setdefault(parent, []).append(pid)
+
+    def descendants(pid: int) -> List[int]:
+        found, pending = [], list(children.get(pid, []))
+        while pending:
+            child = pending.pop()
+            found.append(child)
+            pending.extend(children.get(child, []))
+        return found
+
+    # 驱动可能经过 shell 脚本启动，脚本和 node 进程的命令行都包含 run-driver
+    drivers = {pid for pid in descendants(root) if "run-driver" in table[pid][2]}
+    expected = os.path.normcase(os.path.realpath(executable_path)) if executable_path else None
+    browsers = []
+    for driver in drivers:
+        for pid in children.get(driver, []):
+            if pid in drivers:
+                continue
+            cmdline = table[pid][2]
+            if expected is not None and (not cmdline or os.path.normcase(os.path.realpath(cmdline[0])) != expected):
+                continue
+            browsers.append(pid)
+            browsers.extend(descendants(pid))
+    return browsers
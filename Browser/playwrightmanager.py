@@ -1,12 +1,36 @@
+import contextlib
+import functools
+import inspect
+import logging
 import os
 import pathlib
 import typing
+import urllib.parse
 
 from playwright.sync_api._context_manager import PlaywrightContextManager
 
-from ._api_structures import ProxySettings, HttpCredentials, StorageState, ViewportSize
+from ._api_structures import FloatRect, ProxySettings, HttpCredentials, StorageState, ViewportSize
+from ._api import ApiClient
 from ._api_types import Error
+from ._bulk import BulkExecutor
+from ._capture import NetworkCapture
+from ._cdp import CdpFastPath
+from ._concurrency import gather as gather_actions
+from ._density import LaunchProfile, apply_context_profile
+from ._downloads import DownloadManager, DownloadRecord
+from ._fanout import FanOut, FanOutReport
 from ._interaction import Interaction
+from ._mutation import ChangeFeed
+from ._plan import Plan, PlanPlayer, PlanRecorder
+from ._prefetch import PrefetchPool
+from ._profiles import ProfileDirectory
+from ._profiling import StepProfiler
+from ._readiness import NavigationTiming, navigation_timings
+from ._recovery import CrashRecovery, IDEMPOTENT_METHODS
+from ._selectors import SelectorProfiler
+from ._snapshots import CapturePipeline, CaptureResult
+from ._timeouts import AdaptiveTimeouts
+from ._watchdog import MemoryWatchdog
 from .data_types import SupportedBrowsers
 
 
@@ -17,6 +41,7 @@ class PlaywrightManager:
             navigation_timeout: float = 1200000,
             enable_playwright_debug: bool = False,
             external_browser_executable: typing.Optional[typing.Dict[SupportedBrowsers, str]] = None,
+            adaptive_timeouts: AdaptiveTimeouts = None,
     ):
         """对Playwright方法的封装。
 
@@ -24,6 +49,7 @@ class PlaywrightManager:
         :param navigation_timeout: 将更改触发导航的方法和相关快捷方式的默认最长导航时间。
         :param enable_playwright_debug: 启用playwright的调试模式，输出详细日志。
         :param external_browser_executable: 浏览器可执行路径。
+        :param adaptive_timeouts: 根据观察到的耗时为每个操作推导超时时间。未显式传入 `timeout` 的调用将使用推导出的值。
         """
         self.external_browser_executable: typing.Dict[SupportedBrowsers, str] = (
                 external_browser_executable or {}
@@ -42,10 +68,82 @@ class PlaywrightManager:
         self._page = None  # 激活的page实例
         self._frame = None  # 激活的frame实例
         self._interaction = None  # 实际与浏览器交互的对象
+        self._cached_interaction: typing.Optional[Interaction] = None  # interaction 属性返回的对象，交互对象变化时重建
+        self._change_feeds: typing.Dict[typing.Any, ChangeFeed] = {}  # 每个页面的 DOM 变更订阅
+        self._middlewares: typing.List[typing.Callable] = []  # interaction 的每次调用依次经过的中间件
+        self._network_captures: typing.List[NetworkCapture] = []  # 正在进行的网络捕获
+        self._download_manager: typing.Optional[DownloadManager] = None  # 当前上下文的下载管理器
+        self._capture_pipeline: typing.Optional[CapturePipeline] = None  # 截图和 PDF 的后台处理管道
+        self._launch_options: typing.Optional[typing.Dict[str, typing.Any]] = None  # 启动当前浏览器的选项
+        self._cdp_options: typing.Optional[typing.Dict[str, typing.Any]] = None  # 通过 CDP 连接当前浏览器的选项
+        self._context_options: typing.Optional[typing.Dict[str, typing.Any]] = None  # 创建当前上下文的选项
+        self._profile: typing.Optional[ProfileDirectory] = None  # 持久化上下文的配置文件目录
+        self._launch_profile: typing.Optional[LaunchProfile] = None  # 当前浏览器的高密度启动配置
+        self._fast_paths: typing.Optional[typing.Dict[typing.Any, CdpFastPath]] = None  # 每个页面的 CDP 快速通道，None 表示未启用
+        self.memory_watchdog: typing.Optional[MemoryWatchdog] = None  # 内存监控
+        self.profiler: typing.Optional[StepProfiler] = None  # 浏览器端性能录制
+        self.selector_profiler: typing.Optional[SelectorProfiler] = None  # 选择器耗时统计
+        self._recorder: typing.Optional[PlanRecorder] = None  # 正在录制的交互计划
+        self.crash_recovery: typing.Optional[CrashRecovery] = None  # 崩溃和断线恢复
+        self._prefetch_pool: typing.Optional[PrefetchPool] = None  # 当前上下文的预取页面
+
+        self.adaptive_timeouts = adaptive_timeouts  # 自适应超时
+        if adaptive_timeouts is not None:
+            adaptive_timeouts.bind_defaults(timeout, navigation_timeout)
+            self.use(adaptive_timeouts)
 
     @property
-    def interaction(self):
-        return Interaction(self._interaction)
+    def interaction(self) -> Interaction:
+        """与当前页面或 frame 交互的 Interaction。
+
+        同一个对象会被重复使用，直到切换页面或 frame、订阅 DOM 变更或启用 CDP 快速通道后才重建。
+        在中间件内部访问时（缓存的对象正在执行中间件链）返回新的对象，使内部调用仍然经过中间件。
+        """
+        change_feed = self._change_feeds.get(self._page) if self._change_feeds else None
+        fast_path = self._fast_path() if self._fast_paths is not None else None
+        cached = self._cached_interaction
+        if (
+                cached is not None
+                and cached._obj is self._interaction
+                and cached._change_feed is change_feed
+                and cached._fast_path is fast_path
+                and cached._default_timeout == self.default_timeout
+                and not cached._dispatching
+        ):
+            return cached
+        interaction = Interaction(
+            self._interaction,
+            change_feed=change_feed,
+            middlewares=self._middlewares,
+            fast_path=fast_path,
+            default_timeout=self.default_timeout
+        )
+        if cached is None or not cached._dispatching:
+            self._cached_interaction = interaction
+        return interaction
+
+    def _fast_path(self, page=None) -> typing.Optional[CdpFastPath]:
+        """返回页面（默认为当前页面）的 CDP 快速通道，首次使用时创建。"""
+        if page is None:
+            page = self._page
+        if self._fast_paths is None or page is None:
+            return None
+        fast_path = self._fast_paths.get(page)
+        if fast_path is None and CdpFastPath.supports(page):
+            fast_path = self._fast_paths[page] = CdpFastPath(page)
+            page.once("close", lambda closed: self._fast_paths and self._fast_paths.pop(closed, None))
+        return fast_path
+
+    def use(self, middleware: typing.Callable):
+        """添加 interaction 的中间件。中间件是可调用对象 `middleware(call, proceed)`，
+        可以读取或修改 `call.arguments`，必须调用 `proceed()` 并返回它的结果。先添加的中间件在外层。
+        """
+        self._middlewares.append(middleware)
+
+    def remove_middleware(self, middleware: typing.Callable):
+        """移除 interaction 的中间件。"""
+        if middleware in self._middlewares:
+            self._middlewares.remove(middleware)
 
     def start_playwright(self):
         """启动Playwright进程。"""
@@ -54,6 +152,12 @@ class PlaywrightManager:
         os.environ["PLAYWRIGHT_BROWSERS_PATH"] = "0"
         self._playwright_process = PlaywrightContextManager().start()
 
+    def stop_playwright(self):
+        """停止Playwright进程。需要先关闭浏览器。"""
+        if self._playwright_process is not None:
+            self._playwright_process.stop()
+            self._playwright_process = None
+
     def connect_over_cdp(
             self,
             endpoint_url: str,
@@ -71,13 +175,16 @@ class PlaywrightManager:
         :param slow_mo: 将 Playwright 操作减慢指定的毫秒数。很有用，以便看到正在发生的事情。 默认为 0。
         :param timeout: 等待建立连接的最长时间（以毫秒为单位）。默认为 30000（30 秒）。 传递 0 以禁用超时。
         """
-        browser_type = self._playwright_process.chromium
-        self._browser = browser_type.connect_over_cdp(
+        # 记录连接选项，断线后以相同的选项重新连接
+        self._cdp_options = dict(
             endpoint_url=endpoint_url,
             headers=headers,
             slow_mo=slow_mo,
             timeout=timeout
         )
+        self._launch_options = None
+        self._context_options = None
+        self._browser = self._playwright_process.chromium.connect_over_cdp(**self._cdp_options)
         self._context = self._browser.contexts[0]
         self._page = self._context.pages[0]
         self._interaction = self._page
@@ -94,6 +201,7 @@ class PlaywrightManager:
             proxy: ProxySettings = None,
             slow_mo: float = None,
             timeout: float = None,
+            profile: LaunchProfile = None,
     ):
         """创建具有指定选项的浏览器实例。
 
@@ -112,7 +220,14 @@ class PlaywrightManager:
             `password` 如果 HTTP 代理需要身份验证，则使用的可选密码。
         :param slow_mo: 将 Playwright 操作减慢指定的毫秒数。很有用，可以看到正在发生的事情。
         :param timeout: 等待浏览器实例启动的最长时间（以毫秒为单位）。 默认为 30000（30 秒）。 传递 0 以禁用超时。
+        :param profile: 启动配置，例如用于服务器高密度运行的 `DENSITY`。未显式传入的 headless 和 args 使用配置中的值，
+            之后创建的上下文和页面也会应用配置中的视口等设置。
         """
+        if profile is not None:
+            if args is None:
+                args = profile.launch_args(browser)
+            if headless is None:
+                headless = profile.headless
         if args is None:
             args = ['--start-maximized']
         if headless is None:
@@ -123,8 +238,9 @@ class PlaywrightManager:
         browser_path = self.external_browser_executable.get(browser)
         if browser_path:
             executable_path = browser_path
-        browser_type = getattr(self._playwright_process, browser.name)
-        self._browser = browser_type.launch(
+        # 记录启动选项，浏览器崩溃后以相同的选项重新启动
+        self._launch_options = dict(
+            browser=browser,
             args=args,
             downloads_path=downloads_path,
             env=env,
@@ -134,18 +250,167 @@ class PlaywrightManager:
             slow_mo=slow_mo,
             timeout=timeout
         )
+        if profile is not None and browser is SupportedBrowsers.firefox:
+            self._launch_options["firefox_user_prefs"] = profile.firefox_user_prefs()
+        self._launch_profile = profile
+        self._cdp_options = None
+        self._launch_browser()
+
+    def _launch_browser(self):
+        """以记录的选项启动浏览器，或重新连接到 CDP 端点。"""
+        if self._cdp_options is not None:
+            self._browser = self._playwright_process.chromium.connect_over_cdp(**self._cdp_options)
+        elif self._launch_options is not None:
+            options = dict(self._launch_options)
+            browser_type = getattr(self._playwright_process, options.pop("browser").name)
+            self._browser = browser_type.launch(**options)
+        else:
+            raise Error("没有通过 new_browser 或 connect_over_cdp 打开过浏览器。")
 
     def close_browser(self):
         """如果此浏览器是使用 `new_browser` 获得的，则关闭浏览器及其所有页面（如果有的话）。
         如果连接到此浏览器，则清除所有创建的属于此浏览器的上下文并断开与浏览器服务器的连接。
         Browser 对象本身被认为已被释放，不能再使用。
         """
-        self._browser.close()
-        # 重置所有活动对象
-        self._browser = None
-        self._context = None
-        self._page = None
-        self._interaction = None
+        # 停止捕获等后台任务时可能抛出异常（例如 sink 写入失败）。每一步单独执行并记录日志，
+        # 其余步骤和浏览器仍然需要关闭，第一个异常在关闭之后抛出
+        error = None
+        for name, step in [
+            ("停止网络捕获", self.stop_network_capture),
+            ("停止截图处理管道", self.stop_capture_pipeline),
+            ("停止性能录制", self.stop_profiling),
+            ("停止下载管理", self._stop_download_manager),
+        ]:
+            try:
+                step()
+            except Exception as e:
+                logging.getLogger(__name__).warning(f"关闭浏览器时{name}失败：{e}")
+                error = error or e
+        self._prefetch_pool = None
+        try:
+            if self._browser is not None:
+                self._browser.close()
+            elif self._context is not None:  # 持久化上下文没有 Browser 对象
+                self._context.close()
+        finally:
+            if self._profile is not None:
+                self._profile.cleanup()
+                self._profile = None
+            if self.adaptive_timeouts is not None:
+                self.adaptive_timeouts.save()
+            # 重置所有活动对象
+            self._browser = None
+            self._context = None
+            self._page = None
+            self._frame = None
+            self._interaction = None
+            self._cached_interaction = None
+            self._change_feeds.clear()
+            self._fast_paths = None
+            self._launch_profile = None
+        if error is not None:
+            raise error
+
+    def _stop_download_manager(self):
+        """等待下载处理完成（最长为默认超时时间）后停止下载管理。"""
+        download_manager, self._download_manager = self._download_manager, None
+        if download_manager is not None:
+            download_manager.stop()
+
+    def new_persistent_context(
+            self,
+            user_data_dir: typing.Union[str, pathlib.Path] = None,
+            *,
+            browser: SupportedBrowsers = SupportedBrowsers.chromium,
+            template_dir: typing.Union[str, pathlib.Path] = None,
+            cache_dir: typing.Union[str, pathlib.Path] = None,
+            cache_size: float = None,
+            update_template: bool = False,
+            args: typing.List[str] = None,
+            executable_path: typing.Union[str, pathlib.Path] = None,
+            headless: bool = None,
+            proxy: ProxySettings = None,
+            slow_mo: float = None,
+            timeout: float = None,
+            accept_downloads: bool = None,
+            base_url: str = None,
+            extra_http_headers: typing.Optional[typing.Dict[str, str]] = None,
+            http_credentials: HttpCredentials = None,
+            ignore_https_errors: bool = None,
+            no_viewport: bool = None,
+            user_agent: str = None,
+            viewport: ViewportSize = None,
+    ):
+        """以持久化上下文（用户数据目录）启动浏览器，HTTP 缓存、cookie 和 localStorage 保存在磁盘上，下次启动时仍然有效。
+        持久化上下文没有单独的 Browser 对象，使用 `close_browser` 关闭。
+
+        并行的工作进程不能共用同一个用户数据目录。此时应当指定 `template_dir`、不指定 `user_data_dir`：
+        每个工作进程从模板复制一份临时的配置文件，关闭后删除；配合 `update_template=True` 把预热后的缓存写回模板。
+
+        :param user_data_dir: 用户数据目录。默认创建临时目录，关闭后删除。
+        :param browser: 打开指定的浏览器。默认为 chromium。
+        :param template_dir: 模板配置文件目录，用户数据目录为空时从模板复制。
+        :param cache_dir: HTTP 缓存目录（仅 Chromium）。
+        :param cache_size: HTTP 缓存的大小上限（以 MB 为单位）。
+        :param update_template: 关闭后是否用本次的配置文件替换模板。
+        :param args: 传递给浏览器实例的附加参数。
+        :param executable_path: 要运行的浏览器可执行文件的路径。
+        :param headless: 是否在无头模式下运行浏览器。默认为 false。
+        :param proxy: 网络代理设置。
+        :param slow_mo: 将 Playwright 操作减慢指定的毫秒数。
+        :param timeout: 等待浏览器实例启动的最长时间（以毫秒为单位）。
+        :param accept_downloads: 是否自动下载所有附件。
+        :param base_url: 导航等方法使用的基础 URL，参见 `new_context`。
+        :param extra_http_headers: 包含每个请求都要发送的附加HTTP头的对象。
+        :param http_credentials: HTTP 身份验证的凭据。
+        :param ignore_https_errors: 是否在导航过程中忽略 HTTPS 错误。
+        :param no_viewport: 不强制固定视口，允许在有头模式下调整窗口大小。
+        :param user_agent: 在此上下文中使用的特定用户代理。
+        :param viewport: 为每个页面设置一致的视窗。
+        """
+        if self._browser is not None or self._context is not None:
+            print("已有打开的浏览器，请勿重复打开。")
+            return
+        if args is None:
+            args = ['--start-maximized']
+        if headless is None:
+            headless = False
+        if no_viewport is None:
+            no_viewport = True
+        browser_path = self.external_browser_executable.get(browser)
+        if browser_path:
+            executable_path = browser_path
+        self._profile = ProfileDirectory(
+            str(user_data_dir) if user_data_dir is not None else None,
+            browser=browser.name,
+            template_dir=str(template_dir) if template_dir is not None else None,
+            cache_dir=str(cache_dir) if cache_dir is not None else None,
+            cache_size=cache_size,
+            update_template=update_template
+        )
+        browser_type = getattr(self._playwright_process, browser.name)
+        self._context = browser_type.launch_persistent_context(
+            self._profile.prepare(),
+            args=args + self._profile.launch_args(),
+            executable_path=executable_path,
+            headless=headless,
+            proxy=proxy,
+            slow_mo=slow_mo,
+            timeout=timeout,
+            accept_downloads=accept_downloads,
+            base_url=base_url,
+            extra_http_headers=extra_http_headers,
+            http_credentials=http_credentials,
+            ignore_https_errors=ignore_https_errors,
+            no_viewport=no_viewport,
+            user_agent=user_agent,
+            viewport=viewport
+        )
+        self._context.set_default_navigation_timeout(self.default_navigation_timeout)
+        self._context.set_default_timeout(self.default_timeout)
+        # 持久化上下文启动时已经打开了一个页面
+        self._page = self._context.pages[0] if self._context.pages else self._context.new_page()
+        self._interaction = self._page
 
     def new_context(
             self,
@@ -203,9 +468,10 @@ class PlaywrightManager:
             width <int> 以像素为单位的页面宽度。
             height <int> 以像素为单位的页面高度。
         """
-        if no_viewport is None:
+        if no_viewport is None and self._launch_profile is None:
             no_viewport = True
-        self._context = self._browser.new_context(
+        # 记录创建选项，回收上下文时以相同的选项重建
+        self._context_options = apply_context_profile(dict(
             accept_downloads=accept_downloads,
             base_url=base_url,
             bypass_csp=bypass_csp,
@@ -219,7 +485,8 @@ class PlaywrightManager:
             strict_selectors=strict_selectors,
             user_agent=user_agent,
             viewport=viewport
-        )
+        ), self._launch_profile)
+        self._context = self._browser.new_context(**self._context_options)
         self._context.set_default_navigation_timeout(self.default_navigation_timeout)
         self._context.set_default_timeout(self.default_timeout)
 
@@ -229,8 +496,17 @@ class PlaywrightManager:
         无法关闭默认浏览器上下文。
         """
         if self._context is not None:
+            self._stop_download_manager()
+            self._prefetch_pool = None
             self._context.close()
-            if self._browser.contexts:
+            if self._browser is None:  # 持久化上下文关闭后浏览器也随之关闭
+                self._context = None
+                self._page = None
+                self._interaction = None
+                if self._profile is not None:
+                    self._profile.cleanup()
+                    self._profile = None
+            elif self._browser.contexts:
                 self._context = self._browser.contexts[-1]
                 self._page = None
                 self._interaction = None
@@ -295,9 +571,9 @@ class PlaywrightManager:
         if self._context is not None:
             self._page = self._context.new_page()
         else:
-            if no_viewport is None:
+            if no_viewport is None and self._launch_profile is None:
                 no_viewport = True
-            self._page = self._browser.new_page(
+            self._page = self._browser.new_page(**apply_context_profile(dict(
                 accept_downloads=accept_downloads,
                 base_url=base_url,
                 bypass_csp=bypass_csp,
@@ -311,7 +587,7 @@ class PlaywrightManager:
                 strict_selectors=strict_selectors,
                 user_agent=user_agent,
                 viewport=viewport
-            )
+            ), self._launch_profile))
             self._page.context.set_default_timeout(self.default_timeout)
             self._page.context.set_default_navigation_timeout(self.default_navigation_timeout)
         self._interaction = self._page
@@ -362,6 +638,87 @@ class PlaywrightManager:
             self._page.bring_to_front()
             self._interaction = self._page
 
+    def page_interaction(self, page: typing.Union[int, typing.Any]) -> Interaction:
+        """返回与指定页面交互的 Interaction，不切换活动页面。
+
+        返回的对象使用该页面自己的 DOM 变更订阅和 CDP 快速通道，可以在 `gather` 或 `map_pages` 中
+        与其他页面的 Interaction 同时使用。它经过与 `interaction` 相同的中间件，但不经过崩溃恢复和内存监控：
+        它们会重启浏览器或回收整个上下文，在并发执行时会关闭其他函数正在使用的页面，或者被每个函数各触发一次。
+        这两者只在通过 `interaction` 的调用中生效。
+
+        :param page: Page 对象，或当前上下文中页面的索引（从 0 开始）。
+        """
+        if isinstance(page, int):
+            page = self._open_pages()[page]
+        return Interaction(
+            page,
+            change_feed=self._change_feeds.get(page),
+            middlewares=[
+                middleware for middleware in self._middlewares
+                if middleware is not self.crash_recovery and middleware is not self.memory_watchdog
+            ],
+            fast_path=self._fast_path(page),
+            default_timeout=self.default_timeout
+        )
+
+    def gather(self, *actions: typing.Callable[[], typing.Any]) -> typing.List[typing.Any]:
+        """同时执行多个函数，按顺序返回结果。
+
+        所有函数在当前线程中交替运行：一个函数等待浏览器响应时切换到其他函数，
+        因此操作多个页面的总耗时接近最慢的一个，而不是所有页面之和。
+        任何一个函数抛出异常时，等待所有函数结束后抛出第一个异常。
+        同一个 Interaction 对象不应同时在多个函数中使用，每个页面使用自己的 `page_interaction`
+        （它不经过崩溃恢复和内存监控，见 `page_interaction`）。
+
+        ```py
+        popups = [pm.page_interaction(i) for i in (1, 2)]
+        pm.gather(
+            lambda: popups[0].fill("#name", "a"),
+            lambda: popups[1].fill("#name", "b"),
+        )
+        ```
+
+        :param actions: 不接受参数的函数。
+        """
+        if self._context is not None:
+            anchor = self._context
+        elif self._page is not None:
+            anchor = self._page.context
+        else:
+            raise Error("没有打开的上下文或页面。")
+        return gather_actions(anchor, list(actions))
+
+    def map_pages(
+            self,
+            action: typing.Callable[[Interaction], typing.Any],
+            pages: typing.Iterable[typing.Union[int, typing.Any]] = None,
+    ) -> typing.List[typing.Any]:
+        """对多个页面同时执行 `action(interaction)`，按页面的顺序返回结果。不切换活动页面。
+
+        ```py
+        def poll(interaction):
+            interaction.reload()
+            return interaction.inner_text("#status")
+
+        statuses = pm.map_pages(poll)
+        ```
+
+        :param action: 接受一个页面的 Interaction 的函数。
+        :param pages: Page 对象或当前上下文中页面的索引。默认为当前上下文中的所有页面。
+        """
+        if pages is None:
+            pages = self._open_pages()
+        interactions = [self.page_interaction(page) for page in pages]
+        return self.gather(*[functools.partial(action, interaction) for interaction in interactions])
+
+    def _open_pages(self) -> typing.List[typing.Any]:
+        """返回当前上下文中打开的页面。"""
+        if self._context is not None:
+            return self._context.pages
+        if self._page is not None:
+            return self._page.context.pages
+        return []
+
     def switch_frame_by_index(self, index: int):
         """根据索引选择frame。"""
         self._frame = self._page.frames[index]
@@ -391,3 +748,787 @@ class PlaywrightManager:
             self._interaction = self._frame.page
         else:
             self._interaction = self._frame
+
+    def navigation_timings(self) -> typing.List[NavigationTiming]:
+        """返回当前页面最近的带就绪条件的导航（见 `Interaction.goto` 的 ready_* 参数）的耗时，最早的在前。
+        `NavigationTiming.saved` 是相比等待 load 事件节省的毫秒数。
+        """
+        if self._page is None:
+            return []
+        return navigation_timings(self._page)
+
+    def enable_cdp_fast_path(self):
+        """为 Chromium 页面启用 CDP 快速通道。之后 `force=True` 的 click、fill 和 evaluate_batch
+        直接通过 CDPSession 发送 Input 和 Runtime 命令，跳过可操作性检查；不支持的选择器、frame 中的元素
+        或找不到的元素仍使用常规方式。对其他浏览器没有影响。
+        """
+        if self._fast_paths is None:
+            self._fast_paths = {}
+
+    def disable_cdp_fast_path(self):
+        """停用 CDP 快速通道并断开 CDPSession。"""
+        if self._fast_paths is not None:
+            for fast_path in self._fast_paths.values():
+                fast_path.detach()
+            self._fast_paths = None
+
+    def start_profiling(
+            self,
+            output_dir: str,
+            *,
+            playwright_trace: bool = True,
+            cpu_profile: bool = False,
+            chrome_trace: bool = False,
+            window: float = 30,
+            latency_threshold: float = None,
+            methods: typing.Iterable[str] = None,
+    ) -> StepProfiler:
+        """在每次 interaction 调用期间录制浏览器端的性能数据，只保留失败或超过耗时阈值的步骤。
+        平时按 `window` 秒滚动丢弃，开销很小。也可以用 `profile` 录制一段代码。
+
+        :param output_dir: 输出目录。
+        :param playwright_trace: 录制 Playwright trace。
+        :param cpu_profile: 录制 JS CPU profile（仅 Chromium）。
+        :param chrome_trace: 录制 Chromium 性能跟踪（仅 Chromium）。
+        :param window: 滚动窗口的长度（以秒为单位）。
+        :param latency_threshold: 步骤耗时超过该值（以毫秒为单位）时保留。默认只保留失败的步骤。
+        :param methods: 只录制这些 Interaction 方法。默认为所有方法。
+        """
+        self.stop_profiling()
+        self.profiler = StepProfiler(
+            self,
+            output_dir,
+            playwright_trace=playwright_trace,
+            cpu_profile=cpu_profile,
+            chrome_trace=chrome_trace,
+            window=window,
+            latency_threshold=latency_threshold,
+            methods=methods
+        ).start()
+        self.use(self.profiler)
+        return self.profiler
+
+    def stop_profiling(self):
+        """停止性能录制。"""
+        profiler, self.profiler = self.profiler, None
+        if profiler is not None:
+            self.remove_middleware(profiler)
+            profiler.stop()
+
+    def start_selector_profiling(
+            self,
+            *,
+            samples_per_selector: int = 3,
+            repeat: int = 5,
+            slow_threshold: float = 2,
+            suggest: bool = True,
+    ) -> SelectorProfiler:
+        """测量之后通过 interaction 使用的每个选择器的查询耗时和匹配数量，参见 `SelectorProfiler`。
+
+        ```py
+        profiler = pm.start_selector_profiling()
+        run_flow(pm)
+        print(profiler.format_report())
+        ```
+
+        :param samples_per_selector: 每个选择器测量的次数。
+        :param repeat: 页面内每次测量重复查询的次数。
+        :param slow_threshold: 平均查询耗时不低于该值（以毫秒为单位）时标记为慢选择器。
+        :param suggest: 是否推荐替代的选择器。
+        """
+        self.stop_selector_profiling()
+        self.selector_profiler = SelectorProfiler(
+            samples_per_selector=samples_per_selector,
+            repeat=repeat,
+            slow_threshold=slow_threshold,
+            suggest=suggest,
+        )
+        self.use(self.selector_profiler)
+        return self.selector_profiler
+
+    def stop_selector_profiling(self) -> typing.Optional[SelectorProfiler]:
+        """停止测量选择器，返回已收集的统计。"""
+        profiler = self.selector_profiler
+        if profiler is not None:
+            self.remove_middleware(profiler)
+            self.selector_profiler = None
+        return profiler
+
+    @contextlib.contextmanager
+    def profile(self, name: str, *, keep: bool = False):
+        """录制一段代码的浏览器端性能数据。需要先调用 `start_profiling`。
+
+        ```py
+        with pm.profile("提交订单", keep=True):
+            pm.interaction.click("#submit")
+            pm.interaction.wait_for_selector(".result")
+        ```
+
+        :param name: 代码块的名称。
+        :param keep: 是否总是保留。默认只在失败或超过耗时阈值时保留。
+        """
+        if self.profiler is None:
+            raise Error("没有启动性能录制，请先调用 start_profiling。")
+        with self.profiler.block(name, keep=keep):
+            yield
+
+    def start_recording(self) -> PlanRecorder:
+        """开始将之后的 interaction 调用录制为计划。"""
+        self.stop_recording()
+        self._recorder = PlanRecorder()
+        self.use(self._recorder)
+        return self._recorder
+
+    def stop_recording(self) -> typing.Optional[Plan]:
+        """停止录制，返回录制的计划。没有在录制时返回 None。"""
+        if self._recorder is None:
+            return None
+        self.remove_middleware(self._recorder)
+        plan, self._recorder = self._recorder.plan, None
+        return plan
+
+    def replay(
+            self,
+            plan: typing.Union[Plan, str, pathlib.Path],
+            *,
+            batch_fills: bool = True,
+            batch_reads: bool = True,
+            replace_sleeps: bool = True,
+            quiet_time: float = 100,
+            skip_failed: bool = False,
+    ) -> typing.Dict[str, typing.Any]:
+        """在当前页面或 frame 中加速回放录制的计划，返回每个步骤的结果和统计信息。参见 `PlanPlayer`。
+
+        :param plan: Plan 对象或保存的计划文件路径。
+        :param batch_fills: 是否合并同一 frame 中连续的 fill。
+        :param batch_reads: 是否合并同一 frame 中连续的只读调用。
+        :param replace_sleeps: 是否将固定等待替换为等待 DOM 安静。
+        :param quiet_time: 替换固定等待时要求的 DOM 安静时间（以毫秒为单位）。
+        :param skip_failed: 是否跳过录制时失败的步骤。默认执行这些步骤并容忍失败。
+        """
+        if not isinstance(plan, Plan):
+            plan = Plan.load(str(plan))
+        player = PlanPlayer(
+            self,
+            batch_fills=batch_fills,
+            batch_reads=batch_reads,
+            replace_sleeps=replace_sleeps,
+            quiet_time=quiet_time,
+            skip_failed=skip_failed
+        )
+        return player.run(plan)
+
+    def prefetch(self, urls: typing.Union[str, typing.List[str]], *, max_pages: int = None) -> PrefetchPool:
+        """在当前上下文的后台页面中提前加载接下来要访问的 URL，不等待加载完成。
+        之后用 `goto_prefetched` 访问这些 URL 时直接切换到已经加载的页面。
+
+        ```py
+        pm.interaction.goto("/orders")
+        pm.prefetch(["/orders/1", "/orders/1/edit"])
+        ...  # 在列表页上的操作
+        pm.goto_prefetched("/orders/1")
+        ```
+
+        :param urls: 要预取的 URL，相对 URL 基于上下文的 base_url 或当前页面的 URL。
+        :param max_pages: 同时保留的预取页面数量上限。默认为 3，超过时关闭最早的预取页面。
+        """
+        pool = self._prefetcher()
+        if max_pages is not None:
+            pool.max_pages = max_pages
+        for url in [urls] if isinstance(urls, str) else urls:
+            pool.prefetch(self._absolute_url(url))
+        return pool
+
+    def goto_prefetched(
+            self,
+            url: str,
+            *,
+            wait_until: str = "load",
+            timeout: float = None,
+            close_current: bool = False,
+    ):
+        """访问 `url`。已经预取时切换到预取的页面并等待它达到 `wait_until` 状态（命中），
+        否则在当前页面中正常导航（未命中）。返回切换后的页面。
+
+        :param url: 要访问的 URL，与 `prefetch` 时的写法相同。
+        :param wait_until: <"commit"|"domcontentloaded"|"load"|"networkidle"> 预取页面需要达到的加载状态，
+            未命中时作为 goto 的 wait_until。
+        :param timeout: 等待加载的最长时间（以毫秒为单位）。
+        :param close_current: 命中时是否关闭原来的页面。
+        """
+        target = self._absolute_url(url)
+        page = self._prefetcher().take(target)
+        if page is None:
+            self.interaction.goto(url, wait_until=wait_until, timeout=timeout)
+            return self._page
+        # 尚未提交导航的预取页面仍停留在 about:blank，而 about:blank 已经触发过 load，
+        # 因此先等待导航提交（URL 离开 about:blank，允许重定向），再等待加载状态
+        try:
+            page.wait_for_url(
+                lambda current: current != "about:blank" or target == "about:blank",
+                wait_until=wait_until,
+                timeout=timeout
+            )
+        except Error:  # 预取的页面已经取出，不再属于预取池，失败时关闭它
+            page.close()
+            raise
+        previous = self._page
+        self._page = page
+        self._interaction = page
+        page.bring_to_front()
+        if close_current and previous is not None and previous is not page:
+            previous.close()
+        return page
+
+    def cancel_prefetch(self, url: str = None):
+        """取消 `url` 的预取并关闭后台页面。默认取消所有预取。"""
+        if self._prefetch_pool is not None:
+            self._prefetch_pool.cancel(self._absolute_url(url) if url is not None else None)
+
+    def prefetch_stats(self) -> typing.Dict[str, typing.Any]:
+        """返回预取的命中、未命中、取消和淘汰次数，以及命中页面提前加载的总毫秒数。"""
+        return self._prefetcher().stats()
+
+    def _prefetcher(self) -> PrefetchPool:
+        context = self._context if self._context is not None else self._page.context
+        if self._prefetch_pool is None or self._prefetch_pool.context is not context:
+            if self._prefetch_pool is not None:
+                self._prefetch_pool.close()
+            self._prefetch_pool = PrefetchPool(
+                context,
+                timeout=self.default_timeout,
+                navigation_timeout=self.default_navigation_timeout
+            )
+        return self._prefetch_pool
+
+    def _absolute_url(self, url: str) -> str:
+        """按 Playwright goto 的规则解析相对 URL：优先使用上下文的 base_url，其次是当前页面的 URL。"""
+        base_url = (self._context_options or {}).get("base_url")
+        if base_url is None and self._page is not None:
+            base_url = self._page.url
+        return urllib.parse.urljoin(base_url, url) if base_url else url
+
+    def api_client(
+            self,
+            *,
+            base_url: str = None,
+            headers: typing.Dict[str, str] = None,
+            max_concurrent: int = 8,
+            timeout: float = None,
+            fail_on_status_code: bool = False,
+    ) -> ApiClient:
+        """返回与当前上下文共享 cookie 和请求头的 HTTP 客户端，适合不需要渲染页面的准备和清理步骤。
+
+        ```py
+        api = pm.api_client(base_url="https://example.com")
+        api.post("/api/fixtures", data={"name": "test"})
+        api.batch([{"method": "DELETE", "url": f"/api/orders/{order}"} for order in orders])
+        ```
+
+        :param base_url: 相对 URL 的基础地址。默认使用上下文的 base_url。
+        :param headers: 每个请求附加的请求头。
+        :param max_concurrent: `batch` 中同时进行的请求数量上限。
+        :param timeout: 每个请求的超时时间（以毫秒为单位）。
+        :param fail_on_status_code: 响应状态码不是 2xx 或 3xx 时是否抛出异常。
+        """
+        context = self._context if self._context is not None else self._page.context if self._page else None
+        if context is None:
+            raise Error("没有打开的上下文，请先调用 new_context。")
+        return ApiClient(
+            context,
+            base_url=base_url,
+            headers=headers,
+            max_concurrent=max_concurrent,
+            timeout=timeout,
+            fail_on_status_code=fail_on_status_code
+        )
+
+    def fan_out(
+            self,
+            script: typing.Callable[["PlaywrightManager"], typing.Any],
+            *,
+            browsers: typing.Iterable[SupportedBrowsers] = tuple(SupportedBrowsers),
+            browser_options: typing.Dict[str, typing.Any] = None,
+            context_options: typing.Dict[str, typing.Any] = None,
+    ) -> FanOutReport:
+        """在多个浏览器引擎上同时运行 `script`，每个引擎在独立的线程中使用新的 PlaywrightManager，
+        超时设置和浏览器可执行路径与当前管理器相同。当前管理器的浏览器不受影响。参见 `FanOut`。
+
+        :param script: 在每个引擎上执行的函数 `script(manager)`。
+        :param browsers: 要运行的浏览器引擎。默认为所有支持的引擎。
+        :param browser_options: `new_browser` 的参数（browser 除外）。默认以无头模式启动。
+        :param context_options: `new_context` 的参数。默认使用当前上下文的选项。
+        """
+        return FanOut(
+            script,
+            browsers=browsers,
+            manager_options=dict(
+                timeout=self.default_timeout,
+                navigation_timeout=self.default_navigation_timeout,
+                enable_playwright_debug=self.enable_playwright_debug,
+                external_browser_executable=self.external_browser_executable,
+            ),
+            browser_options=browser_options,
+            context_options=context_options if context_options is not None else self._new_context_options(),
+        ).run()
+
+    def _new_context_options(self) -> typing.Optional[typing.Dict[str, typing.Any]]:
+        """返回当前上下文的选项中 `new_context` 接受的部分（启动配置添加的选项由子管理器自己的配置决定）。"""
+        if self._context_options is None:
+            return None
+        accepted = inspect.signature(self.new_context).parameters
+        return {name: value for name, value in self._context_options.items() if name in accepted}
+
+    def run_bulk(
+            self,
+            source: str,
+            task: typing.Callable[[Interaction, typing.Dict[str, typing.Any]], typing.Any],
+            results_path: str,
+            *,
+            format: str = None,
+            workers: int = 4,
+            isolation: str = "page",
+            max_retries: int = 2,
+            checkpoint_path: str = None,
+            checkpoint_every: int = 100,
+            progress_every: float = 10,
+            on_progress: typing.Callable = None,
+    ) -> typing.Dict[str, typing.Any]:
+        """对 CSV 或 JSONL 文件中的每一行执行 `task(interaction, row)`，多个页面并发处理，结果逐行写入 `results_path`。
+        指定 `checkpoint_path` 后可以从中断处恢复。参见 `BulkExecutor`。
+
+        ```py
+        def submit(interaction, row):
+            interaction.goto("https://example.com/form")
+            interaction.fill("#name", row["name"])
+            interaction.click("#submit")
+            return interaction.inner_text(".result")
+
+        pm.run_bulk("rows.csv", submit, "results.jsonl", workers=8, checkpoint_path="rows.checkpoint")
+        ```
+
+        :param source: CSV 或 JSONL 输入文件。
+        :param task: 处理一行的函数，返回值需要可以序列化为 JSON。
+        :param results_path: 结果文件（JSONL）。
+        :param format: csv 或 jsonl。默认根据扩展名判断。
+        :param workers: 并发的页面数量。
+        :param isolation: page 在当前上下文中打开工作页面，context 为每个工作页面创建独立的上下文。
+        :param max_retries: 每行失败后最多重试的次数。
+        :param checkpoint_path: 检查点文件路径。
+        :param checkpoint_every: 每完成多少行保存一次检查点。
+        :param progress_every: 每隔多少秒报告一次进度。
+        :param on_progress: 报告进度时调用。默认写入日志。
+        """
+        executor = BulkExecutor(
+            self,
+            task,
+            workers=workers,
+            isolation=isolation,
+            max_retries=max_retries,
+            checkpoint_path=checkpoint_path,
+            checkpoint_every=checkpoint_every,
+            progress_every=progress_every,
+            on_progress=on_progress
+        )
+        return executor.run(source, results_path, format=format)
+
+    def observe_changes(
+            self,
+            selectors: typing.List[str] = None,
+            *,
+            callback: typing.Callable = None,
+            root: str = None,
+            interval: float = None,
+            flush_on_read: bool = None,
+    ) -> ChangeFeed:
+        """在当前页面上订阅 DOM 变更。订阅后，`interaction` 的只读方法会缓存结果，直到相关子树发生变化。
+        重复调用时返回同一个订阅，追加关注的选择器，并用传入的 root、interval 和 flush_on_read 替换原来的设置。
+
+        :param selectors: 关注的选择器。选择器所在子树变化时，只有与之相关的缓存会失效。
+        :param callback: 每收到一个变更批次时调用。
+        :param root: 关注的根元素的 CSS 选择器，默认为整个文档。只有包含 root 内变更的批次才会通知 callback。
+        :param interval: 合并变更记录的时间窗口（以毫秒为单位），默认为 50。
+        :param flush_on_read: 读取缓存之前是否先让页面推送尚未发送的变更，默认为 True。
+        """
+        if self._page is None:
+            raise Error("没有打开的页面。")
+        feed = self._change_feeds.get(self._page)
+        if feed is None:
+            feed = ChangeFeed(
+                self._page,
+                selectors=selectors,
+                root=root,
+                interval=interval if interval is not None else 50,
+                flush_on_read=flush_on_read if flush_on_read is not None else True
+            )
+            self._change_feeds[self._page] = feed
+            self._page.once("close", lambda _: self._change_feeds.pop(feed.page, None))
+        else:
+            for selector in selectors or []:
+                feed.watch(selector)
+            feed.configure(root=root, interval=interval)
+            if flush_on_read is not None:
+                feed.flush_on_read = flush_on_read
+        if callback is not None:
+            feed.subscribe(callback)
+        return feed.start()
+
+    def stop_observing_changes(self):
+        """停止当前页面上的 DOM 变更订阅。"""
+        feed = self._change_feeds.get(self._page)
+        if feed is not None:
+            feed.stop()
+
+    def start_network_capture(
+            self,
+            sink,
+            *,
+            url: typing.Union[str, typing.Pattern, typing.Callable[[str], bool]] = None,
+            content_types: typing.List[str] = None,
+            resource_types: typing.List[str] = None,
+            include_requests: bool = False,
+            include_bodies: bool = False,
+            max_body_size: int = 1024 * 1024,
+            queue_size: int = 1000,
+            overflow: str = "drop",
+    ) -> NetworkCapture:
+        """将当前上下文中匹配的请求和响应以流的方式写入 `sink`。
+
+        :param sink: JsonlSink、GzipJsonlSink、RingBufferSink，或任何实现了 write(record) 和 close() 的对象。
+        :param url: URL 过滤条件：glob 模式、正则表达式或接收 URL 的函数。默认为所有 URL。
+        :param content_types: 只捕获 Content-Type 以其中任意一项开头的响应，例如 ["application/json"]。
+        :param resource_types: 只捕获这些资源类型，例如 ["xhr", "fetch"]。
+        :param include_requests: 是否同时记录请求（包括请求体）。默认只记录响应。
+        :param include_bodies: 是否记录响应体。
+        :param max_body_size: 响应体的最大字节数，超过时只记录大小。
+        :param queue_size: 等待写入的记录数上限。
+        :param overflow: 队列已满时的处理方式：`drop` 丢弃新记录，`block` 阻塞直到写入跟上。
+        """
+        context = self._context or (self._page.context if self._page is not None else None)
+        if context is None:
+            raise Error("没有打开的浏览器上下文。")
+        capture = NetworkCapture(
+            context,
+            sink,
+            url=url,
+            content_types=content_types,
+            resource_types=resource_types,
+            include_requests=include_requests,
+            include_bodies=include_bodies,
+            max_body_size=max_body_size,
+            queue_size=queue_size,
+            overflow=overflow
+        )
+        self._network_captures.append(capture.start())
+        return capture
+
+    def stop_network_capture(self, capture: NetworkCapture = None):
+        """停止网络捕获并关闭其 sink。不指定 `capture` 时停止所有捕获。"""
+        captures = [capture] if capture is not None else list(self._network_captures)
+        error = None
+        for item in captures:
+            if item in self._network_captures:
+                self._network_captures.remove(item)
+            try:
+                item.stop()
+            except Exception as e:  # sink 写入失败等，继续停止其余的捕获，最后抛出第一个异常
+                error = error or e
+        if error is not None:
+            raise error
+
+    def manage_downloads(
+            self,
+            target_dir: typing.Union[str, pathlib.Path],
+            *,
+            max_concurrent: int = 8,
+            max_size: int = None,
+            deduplicate: bool = True,
+    ) -> DownloadManager:
+        """跟踪当前上下文中的所有下载，同时处理并保存到 `target_dir`，按内容去重。
+        上下文需要以 `accept_downloads=True` 创建。关闭上下文之前，下载的文件已经保存在目标目录中，不会被删除。
+
+        :param target_dir: 保存下载文件的目录。
+        :param max_concurrent: 同时进行的下载数量上限，超过时新的下载会被取消。
+        :param max_size: 单个文件的最大字节数，超过时删除文件。默认不限制。
+        :param deduplicate: 是否按 SHA-256 去重，内容相同的文件只保存一份。
+        """
+        context = self._context or (self._page.context if self._page is not None else None)
+        if context is None:
+            raise Error("没有打开的浏览器上下文。")
+        if self._download_manager is not None:
+            self._download_manager.stop()
+        self._download_manager = DownloadManager(
+            context,
+            str(target_dir),
+            max_concurrent=max_concurrent,
+            max_size=max_size,
+            deduplicate=deduplicate,
+            timeout=self.default_timeout
+        ).start()
+        return self._download_manager
+
+    def wait_for_downloads(self, timeout: float = None) -> typing.List[DownloadRecord]:
+        """等待当前所有下载处理完成，返回全部下载记录，包括每个文件的耗时。
+
+        :param timeout: 以毫秒为单位的最长时间。默认一直等待。
+        """
+        if self._download_manager is None:
+            raise Error("没有启用下载管理，请先调用 manage_downloads。")
+        return self._download_manager.wait_for_downloads(timeout)
+
+    def start_capture_pipeline(
+            self,
+            output_dir: typing.Union[str, pathlib.Path],
+            *,
+            workers: int = 2,
+            max_queue: int = 32,
+            overflow: str = "drop",
+            encoding: str = None,
+            quality: int = 80,
+            dedupe: bool = False,
+            dedupe_distance: int = 0,
+    ) -> CapturePipeline:
+        """启动截图和 PDF 的后台处理管道。之后 `capture_screenshot` 和 `capture_pdf` 只在自动化线程中取回图像数据，
+        编码、去重和写入磁盘都在后台线程中进行。
+
+        :param output_dir: 输出目录。
+        :param workers: 后台线程数。
+        :param max_queue: 等待处理的截图数量上限。
+        :param overflow: 队列已满时的处理方式：`drop` 丢弃新的截图，`block` 等待队列腾出空间。
+        :param encoding: 在后台线程中重新编码的格式，例如 webp、jpeg。需要安装 Pillow。
+        :param quality: 重新编码的质量，0-100。
+        :param dedupe: 是否跳过与上一帧相同的截图。默认不跳过。
+        :param dedupe_distance: 为 0 时只跳过完全相同的截图，大于 0 时感知哈希的汉明距离不超过该值时视为相同。
+        """
+        self.stop_capture_pipeline()
+        self._capture_pipeline = CapturePipeline(
+            str(output_dir),
+            workers=workers,
+            max_queue=max_queue,
+            overflow=overflow,
+            encoding=encoding,
+            quality=quality,
+            dedupe=dedupe,
+            dedupe_distance=dedupe_distance
+        )
+        return self._capture_pipeline
+
+    def stop_capture_pipeline(self):
+        """处理完队列中的截图后停止后台处理管道。"""
+        pipeline, self._capture_pipeline = self._capture_pipeline, None
+        if pipeline is not None:
+            pipeline.close()
+
+    def capture_screenshot(
+            self,
+            name: str = None,
+            *,
+            selector: str = None,
+            clip: FloatRect = None,
+            full_page: bool = None,
+            stream: str = "default",
+    ) -> CaptureResult:
+        """将当前页面、元素或指定区域的截图放入后台处理管道。
+
+        :param name: 文件名（不含扩展名）。默认按序号生成。
+        :param selector: 截取该元素，支持 `>>>`。
+        :param clip: 截取页面的指定区域。
+        :param full_page: 是否截取整个可滚动页面。
+        :param stream: 去重分组，只与同一流中的上一帧比较。
+        """
+        if self._capture_pipeline is None:
+            raise Error("没有启动截图管道，请先调用 start_capture_pipeline。")
+        return self._capture_pipeline.screenshot(
+            self._interaction,
+            name,
+            selector=selector,
+            clip=clip,
+            full_page=full_page,
+            stream=stream
+        )
+
+    def capture_pdf(self, name: str = None, **options) -> CaptureResult:
+        """将当前页面的 PDF 放入后台处理管道。仅支持无头模式的 Chromium。
+
+        :param name: 文件名（不含扩展名）。默认按序号生成。
+        :param options: 传递给 page.pdf 的其他选项，例如 format、landscape。
+        """
+        if self._capture_pipeline is None:
+            raise Error("没有启动截图管道，请先调用 start_capture_pipeline。")
+        return self._capture_pipeline.pdf(self._page, name, **options)
+
+    def enable_memory_watchdog(
+            self,
+            *,
+            max_js_heap: float = 512,
+            max_dom_nodes: int = 200000,
+            max_listeners: int = 100000,
+            max_rss: float = None,
+            check_every: int = 50,
+            min_interval: float = 10,
+            on_recycle: typing.Callable = None,
+    ) -> MemoryWatchdog:
+        """启用内存监控。每隔一定数量的 interaction 调用采样一次各页面的 JS 堆、DOM 节点数和事件监听器数量，
+        以及浏览器进程的常驻内存；超过阈值时调用 `recycle_context` 回收上下文。
+
+        :param max_js_heap: 单个页面 JS 堆使用量的上限（以 MB 为单位）。
+        :param max_dom_nodes: 单个页面 DOM 节点数量的上限。
+        :param max_listeners: 单个页面事件监听器数量的上限。仅 Chromium 可以采集。
+        :param max_rss: 浏览器进程常驻内存总量的上限（以 MB 为单位）。默认不检查。
+        :param check_every: 每隔多少次 interaction 调用检查一次。
+        :param min_interval: 两次检查之间的最短间隔（以秒为单位）。
+        :param on_recycle: 回收上下文后调用，参数为回收事件。
+        """
+        if self.memory_watchdog is not None:
+            self.remove_middleware(self.memory_watchdog)
+        self.memory_watchdog = MemoryWatchdog(
+            self,
+            max_js_heap=max_js_heap,
+            max_dom_nodes=max_dom_nodes,
+            max_listeners=max_listeners,
+            max_rss=max_rss,
+            check_every=check_every,
+            min_interval=min_interval,
+            on_recycle=on_recycle
+        )
+        self.use(self.memory_watchdog)
+        return self.memory_watchdog
+
+    def disable_memory_watchdog(self):
+        """停用内存监控。"""
+        if self.memory_watchdog is not None:
+            self.remove_middleware(self.memory_watchdog)
+            self.memory_watchdog = None
+
+    def recycle_context(self) -> typing.Dict[str, typing.Any]:
+        """以相同的选项重建当前上下文，并恢复 cookie、localStorage 和所有页面的 URL。
+        sessionStorage 和页面内的运行时状态不会保留。返回回收前的会话快照。
+        """
+        if self._context is None or self._context_options is None:
+            raise Error("只能回收通过 new_context 创建的上下文。")
+        snapshot = self._snapshot_session()
+        self._context.close()
+        self._restore_session(snapshot)
+        return snapshot
+
+    def enable_crash_recovery(
+            self,
+            *,
+            max_restarts: int = 3,
+            retry_methods: typing.Iterable[str] = IDEMPOTENT_METHODS,
+            snapshot_every: int = 20,
+            on_restart: typing.Callable = None,
+    ) -> CrashRecovery:
+        """启用崩溃和断线恢复。浏览器崩溃、CDP 连接断开或当前页面崩溃时，以原来的选项重新启动浏览器和上下文，
+        恢复 cookie、localStorage、所有页面的 URL 和当前 frame，然后重试失败的幂等操作。
+
+        :param max_restarts: 最多恢复的次数，超过后不再恢复，直接抛出原来的异常。
+        :param retry_methods: 恢复后可以安全重试的方法。默认为读取、等待、导航和 fill 等幂等操作。
+        :param snapshot_every: 每隔多少次调用刷新一次存储状态。浏览器崩溃后无法再读取存储状态，只能使用最近的快照。
+        :param on_restart: 恢复后调用，参数为恢复事件。
+        """
+        if self.crash_recovery is not None:
+            self.remove_middleware(self.crash_recovery)
+        self.crash_recovery = CrashRecovery(
+            self,
+            max_restarts=max_restarts,
+            retry_methods=retry_methods,
+            snapshot_every=snapshot_every,
+            on_restart=on_restart
+        )
+        # 恢复应当在最外层，这样重试也会经过其他中间件
+        self._middlewares.insert(0, self.crash_recovery)
+        return self.crash_recovery
+
+    def disable_crash_recovery(self):
+        """停用崩溃和断线恢复。"""
+        if self.crash_recovery is not None:
+            self.remove_middleware(self.crash_recovery)
+            self.crash_recovery = None
+
+    def _restart_browser(self, snapshot: typing.Dict[str, typing.Any]):
+        """浏览器崩溃或连接断开后重新启动（或重新连接）浏览器，并按快照恢复会话。"""
+        try:
+            self._browser.close()
+        except Error:  # 浏览器已经不可用
+            ...
+        self._change_feeds.clear()
+        self._launch_browser()
+        if self._cdp_options is not None:
+            self._context = self._browser.contexts[0]
+        elif self._context_options is None:  # 通过 new_page 直接创建的页面
+            self._context = self._browser.new_context(no_viewport=True)
+        self._restore_session(snapshot)
+
+    def _restart_page(self, snapshot: typing.Dict[str, typing.Any]):
+        """当前页面崩溃后用新页面替换，上下文中的 cookie 和存储不受影响。"""
+        crashed = self._page
+        context = crashed.context
+        self._change_feeds.pop(crashed, None)
+        index = context.pages.index(crashed) if crashed in context.pages else None
+        try:
+            crashed.close()
+        except Error:
+            ...
+        self._page = context.new_page()
+        url = snapshot["urls"][index] if index is not None and index < len(snapshot["urls"]) else crashed.url
+        if url and url != "about:blank":
+            self._page.goto(url)
+        self._select_frame(snapshot.get("frame"))
+
+    def _snapshot_session(self, storage_state: StorageState = None) -> typing.Dict[str, typing.Any]:
+        """记录恢复会话所需的状态：存储状态、页面 URL、当前页面和当前 frame。
+
+        :param storage_state: 已知的存储状态。默认从上下文读取，浏览器已经崩溃时应传入之前保存的存储状态。
+        """
+        context = self._context if self._context is not None else self._page.context
+        pages = context.pages
+        frame = None
+        if self._frame is not None and self._frame.parent_frame is not None:
+            frame = {"name": self._frame.name, "url": self._frame.url}
+        return {
+            "storage_state": storage_state if storage_state is not None else context.storage_state(),
+            "urls": [page.url for page in pages],
+            "active_page": pages.index(self._page) if self._page in pages else len(pages) - 1,
+            "frame": frame,
+        }
+
+    def _restore_session(self, snapshot: typing.Dict[str, typing.Any]):
+        """新建上下文并按快照恢复页面。下载管理和网络捕获会转移到新的上下文。
+        通过 CDP 连接的浏览器沿用默认上下文，只能恢复 cookie，已经打开的同一 URL 的页面会被复用。
+        """
+        if self._context_options is not None:
+            options = dict(self._context_options)
+            options["storage_state"] = snapshot["storage_state"] or options["storage_state"]
+            self._context = self._browser.new_context(**options)
+        elif snapshot["storage_state"]:
+            self._context.add_cookies(snapshot["storage_state"].get("cookies", []))
+        self._context.set_default_navigation_timeout(self.default_navigation_timeout)
+        self._context.set_default_timeout(self.default_timeout)
+        for capture in self._network_captures:
+            capture.rebind(self._context)
+        if self._download_manager is not None:
+            self._download_manager.rebind(self._context)
+        existing = list(self._context.pages)
+        pages = []
+        for url in snapshot["urls"] or ["about:blank"]:
+            page = next((page for page in existing if page.url == url), None)
+            if page is not None:
+                existing.remove(page)
+            else:
+                page = self._context.new_page()
+                if url and url != "about:blank":
+                    page.goto(url)
+            pages.append(page)
+        self._page = pages[min(snapshot["active_page"], len(pages) - 1)]
+        self._page.bring_to_front()
+        self._select_frame(snapshot.get("frame"))
+
+    def _select_frame(self, frame: typing.Optional[typing.Dict[str, str]]):
+        """在当前页面中重新选择快照记录的 frame，找不到时使用主 frame。"""
+        self._frame = None
+        self._interaction = self._page
+        if frame is not None:
+            self._frame = self._page.frame(name=frame["name"] or None, url=None if frame["name"] else frame["url"])
+            if self._frame is not None:
+                self._interaction = self._frame
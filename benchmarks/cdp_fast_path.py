@@ -0,0 +1,82 @@
+"""比较 CDP 快速通道与常规路径的单次操作耗时。
+
+    python benchmarks/cdp_fast_path.py --fields 200 --rounds 3
+
+在同一个页面中分别用常规方式和 `force=True`（CDP 快速通道）填充所有输入框、点击所有按钮并批量读取值，
+输出每种操作的平均耗时。需要已安装 Chromium。
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+# 直接以脚本运行时 sys.path 中只有 benchmarks 目录，加入仓库根目录以导入 Browser
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Browser import PlaywrightManager
+
+
+def build_form(fields: int) -> str:
+    rows = "".join(
+        f'<div><input id="f{index}"><button id="b{index}" onclick="this.dataset.n=(+this.dataset.n||0)+1">+</button></div>'
+        for index in range(fields)
+    )
+    return f"<html><body><form onsubmit='return false'>{rows}</form></body></html>"
+
+
+def measure(label: str, fields: int, action) -> float:
+    started = time.perf_counter()
+    for index in range(fields):
+        action(index)
+    per_action = (time.perf_counter() - started) * 1000 / fields
+    print(f"  {label:<28}{per_action:8.3f} ms/次")
+    return per_action
+
+
+def run(fields: int, rounds: int, headless: bool):
+    pm = PlaywrightManager()
+    pm.start_playwright()
+    pm.new_browser(headless=headless, args=[])
+    pm.new_context()
+    pm.new_page()
+    pm.enable_cdp_fast_path()
+    results = {}
+    try:
+        for round_index in range(rounds):
+            print(f"第 {round_index + 1} 轮")
+            pm._page.set_content(build_form(fields))
+            interaction = pm.interaction
+            for label, action in [
+                ("fill", lambda i: interaction.fill(f"#f{i}", f"value {i}")),
+                ("fill force=True (CDP)", lambda i: interaction.fill(f"#f{i}", f"value {i}", force=True)),
+                ("click", lambda i: interaction.click(f"#b{i}")),
+                ("click force=True (CDP)", lambda i: interaction.click(f"#b{i}", force=True)),
+                ("input_value", lambda i: interaction.input_value(f"#f{i}")),
+            ]:
+                results.setdefault(label, []).append(measure(label, fields, action))
+            expressions = [f"document.getElementById('f{i}').value" for i in range(fields)]
+            for label, force in [("evaluate_batch", None), ("evaluate_batch force=True", True)]:
+                started = time.perf_counter()
+                interaction.evaluate_batch(expressions, force=force)
+                per_value = (time.perf_counter() - started) * 1000 / fields
+                print(f"  {label:<28}{per_value:8.3f} ms/值")
+                results.setdefault(label, []).append(per_value)
+    finally:
+        pm.close_browser()
+    print("中位数")
+    for label, values in results.items():
+        print(f"  {label:<28}{statistics.median(values):8.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fields", type=int, default=200, help="输入框和按钮的数量")
+    parser.add_argument("--rounds", type=int, default=3, help="重复的轮数")
+    parser.add_argument("--headed", action="store_true", help="显示浏览器窗口")
+    args = parser.parse_args()
+    run(args.fields, args.rounds, not args.headed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""比较默认启动设置与高密度启动配置（`DENSITY`）下每个页面的内存和吞吐量。
+
+    python benchmarks/density.py --pages 1 4 8 16 --rounds 20
+
+对每个并发数分别用默认设置和高密度配置启动浏览器，打开相应数量的上下文和页面，
+测量浏览器进程的常驻内存，然后在所有页面上同时执行填充、点击和读取，输出每个页面的内存、
+每 GB 可以容纳的页面数和每秒完成的操作数。需要已安装 Chromium。
+"""
+import argparse
+import os
+import sys
+import time
+
+# 直接以脚本运行时 sys.path 中只有 benchmarks 目录，加入仓库根目录以导入 Browser
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Browser import DENSITY, PlaywrightManager
+from Browser._concurrency import gather
+from Browser._watchdog import _browser_rss
+
+FORM = """<html><body><form onsubmit='return false'>
+<input id="name"><button id="submit" onclick="document.getElementById('out').textContent = 'ok ' + document.getElementById('name').value">go</button>
+<p id="out"></p></form></body></html>"""
+
+
+def launch(profile, headless: bool) -> PlaywrightManager:
+    pm = PlaywrightManager()
+    pm.start_playwright()
+    if profile is None:
+        pm.new_browser(headless=headless)
+    else:
+        pm.new_browser(headless=headless, profile=profile)
+    return pm
+
+
+def open_pages(pm: PlaywrightManager, count: int) -> list:
+    pages = []
+    for _ in range(count):
+        pm.new_context()
+        pm.new_page()
+        pm._page.set_content(FORM)
+        pages.append(pm._page)
+    return pages
+
+
+def workload(page, rounds: int):
+    def run():
+        for index in range(rounds):
+            page.fill("#name", f"value {index}")
+            page.click("#submit")
+            page.inner_text("#out")
+    return run
+
+
+def measure(label: str, profile, count: int, rounds: int, headless: bool) -> dict:
+    pm = launch(profile, headless)
+    try:
+        idle = _browser_rss() or 0
+        pages = open_pages(pm, count)
+        time.sleep(0.5)  # 等待渲染进程完成初始化
+        rss = (_browser_rss() or 0) - idle
+        started = time.perf_counter()
+        gather(pages[0], [workload(page, rounds) for page in pages])
+        elapsed = time.perf_counter() - started
+    finally:
+        pm.close_browser()
+        pm.stop_playwright()
+    per_page = rss / count / 2 ** 20
+    return {
+        "label": label,
+        "pages": count,
+        "rss_per_page": per_page,
+        "pages_per_gb": 1024 / per_page if per_page > 0 else float("inf"),
+        "actions_per_second": count * rounds * 3 / elapsed,
+    }
+
+
+def run(page_counts, rounds: int, headless: bool):
+    print(f"{'配置':<10}{'页面数':>6}{'MB/页':>10}{'页/GB':>10}{'操作/秒':>10}")
+    for count in page_counts:
+        for label, profile in [("default", None), ("density", DENSITY)]:
+            row = measure(label, profile, count, rounds, headless)
+            print(f"{row['label']:<10}{row['pages']:>6}{row['rss_per_page']:>10.1f}"
+                  f"{row['pages_per_gb']:>10.1f}{row['actions_per_second']:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 2, 4, 8, 16], help="并发的页面数量")
+    parser.add_argument("--rounds", type=int, default=20, help="每个页面执行操作的轮数")
+    parser.add_argument("--headed", action="store_true", help="显示浏览器窗口")
+    args = parser.parse_args()
+    run(args.pages, args.rounds, not args.headed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""测量 `PlaywrightManager.interaction` 和 Interaction 包装层每次调用的额外开销。
+
+    python benchmarks/interaction_overhead.py --calls 200000
+
+交互对象是一个什么也不做的 Page 替身，因此测得的时间只包含 Python 层的开销，不需要启动浏览器。
+分别测量直接调用交互对象、取得 interaction、经 `__getattr__` 委托的方法、经 `instrumented` 包装的方法
+（无中间件和一个空中间件），以及每次都新建 Interaction 的旧做法，输出每次调用的纳秒数。
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+# 直接以脚本运行时 sys.path 中只有 benchmarks 目录，加入仓库根目录以导入 Browser
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Browser import PlaywrightManager
+from Browser._interaction import Interaction
+
+
+class Page:
+    """什么也不做的页面替身。类名必须是 Page，Interaction 据此判断交互对象的类型。"""
+
+    def title(self):
+        return ""
+
+    def wait_for_timeout(self, timeout):
+        return None
+
+
+def measure(calls: int, action) -> float:
+    started = time.perf_counter()
+    for _ in range(calls):
+        action()
+    return (time.perf_counter() - started) * 1e9 / calls
+
+
+def run(calls: int, rounds: int):
+    pm = PlaywrightManager()
+    pm._page = pm._interaction = Page()
+    page = pm._page
+    interaction = pm.interaction
+
+    def passthrough_middleware(call, proceed):
+        return proceed()
+
+    cases = [
+        ("直接调用 page.title()", lambda: page.title()),
+        ("pm.interaction", lambda: pm.interaction),
+        ("新建 Interaction（旧做法）", lambda: Interaction(page, middlewares=pm._middlewares)),
+        ("interaction.title()（委托）", lambda: interaction.title()),
+        ("pm.interaction.title()", lambda: pm.interaction.title()),
+        ("直接调用 page.wait_for_timeout(0)", lambda: page.wait_for_timeout(0)),
+        ("interaction.wait_for_timeout(0)", lambda: interaction.wait_for_timeout(0)),
+    ]
+    results = {}
+    for _ in range(rounds):
+        for label, action in cases:
+            results.setdefault(label, []).append(measure(calls, action))
+    pm.use(passthrough_middleware)
+    for _ in range(rounds):
+        label = "wait_for_timeout(0) + 1 个中间件"
+        results.setdefault(label, []).append(measure(calls, lambda: interaction.wait_for_timeout(0)))
+    print(f"每次调用的中位数（{calls} 次 × {rounds} 轮）")
+    for label, values in results.items():
+        print(f"  {label:<36}{statistics.median(values):10.1f} ns")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=200000, help="每轮调用的次数")
+    parser.add_argument("--rounds", type=int, default=5, help="重复的轮数")
+    args = parser.parse_args()
+    run(args.calls, args.rounds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+import os
+import sys
+
+import pytest
+
+# 直接在仓库根目录运行 pytest 时 Browser 不在 sys.path 中
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Browser import PlaywrightManager  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def browser_manager():
+    """启动无头 Chromium 的 PlaywrightManager，同一个模块中的测试共用。没有安装 Chromium 时跳过。"""
+    pm = PlaywrightManager(timeout=5000, navigation_timeout=10000)
+    pm.start_playwright()
+    try:
+        pm.new_browser(headless=True, args=[])
+    except Exception as e:
+        pm.stop_playwright()
+        pytest.skip(f"无法启动 Chromium：{e}")
+    yield pm
+    pm.close_browser()
+    pm.stop_playwright()
+
+
+@pytest.fixture
+def pm(browser_manager):
+    """在新的上下文中打开一个页面，测试结束后关闭上下文。"""
+    browser_manager.new_context()
+    browser_manager.new_page()
+    yield browser_manager
+    browser_manager.close_context()
@@ -0,0 +1,190 @@
+import json
+import os
+
+import pytest
+
+from Browser._api_types import Error
+from Browser._bulk import BulkExecutor, read_rows
+
+
+class Page:
+    def __init__(self, context):
+        self.context = context
+        self.closed = False
+        self.handlers = []
+
+    def once(self, event, handler):
+        self.handlers.append(handler)
+
+    def crash(self):
+        handlers, self.handlers = self.handlers, []
+        for handler in handlers:
+            handler(self)
+
+    def is_closed(self):
+        return self.closed
+
+    def close(self):
+        self.closed = True
+
+    def set_default_timeout(self, timeout):
+        ...
+
+    def set_default_navigation_timeout(self, timeout):
+        ...
+
+    def wait_for_timeout(self, timeout):
+        ...
+
+
+class Context:
+    def __init__(self):
+        self.pages = []
+        self.closed = False
+
+    def new_page(self):
+        if self.closed:
+            raise Error("上下文已经关闭")
+        page = Page(self)
+        self.pages.append(page)
+        return page
+
+
+class Manager:
+    default_timeout = 1000
+    default_navigation_timeout = 1000
+    _browser = None
+    _context_options = None
+
+    def __init__(self):
+        self._context = Context()
+
+
+def write_rows(path, count):
+    with open(path, "w", encoding="utf-8") as file:
+        for index in range(count):
+            file.write(json.dumps({"id": index}) + "\n")
+    return str(path)
+
+
+def read_results(path):
+    with open(path, encoding="utf-8") as file:
+        return [json.loads(line) for line in file]
+
+
+def executor(task, tmp_path, **options):
+    options.setdefault("workers", 1)
+    return BulkExecutor(Manager(), task, checkpoint_path=str(tmp_path / "checkpoint.json"),
+                        checkpoint_every=1, on_progress=lambda stats: None, **options)
+
+
+def test_read_rows(tmp_path):
+    path = tmp_path / "rows.csv"
+    path.write_text("id,name\n1,a\n2,b\n", encoding="utf-8")
+    assert list(read_rows(str(path))) == [(0, {"id": "1", "name": "a"}), (1, {"id": "2", "name": "b"})]
+    with pytest.raises(ValueError):
+        list(read_rows(str(path), "xml"))
+
+
+def test_retries_then_fails(tmp_path):
+    source = write_rows(tmp_path / "rows.jsonl", 3)
+    results = str(tmp_path / "results.jsonl")
+
+    def task(interaction, row):
+        if row["id"] == 1:
+            raise ValueError("bad row")
+        return row["id"]
+
+    stats = executor(task, tmp_path, max_retries=2).run(source, results)
+    assert (stats["succeeded"], stats["failed"], stats["retried"]) == (2, 1, 2)
+    failed = [record for record in read_results(results) if record["status"] == "failed"]
+    assert failed == [dict(failed[0], row=1, attempts=3, error="ValueError: bad row")]
+
+
+def test_resume_after_interrupt(tmp_path):
+    source = write_rows(tmp_path / "rows.jsonl", 10)
+    results = str(tmp_path / "results.jsonl")
+
+    def interrupted(interaction, row):
+        if row["id"] == 5:
+            raise KeyboardInterrupt
+        return row["id"]
+
+    with pytest.raises(KeyboardInterrupt):
+        executor(interrupted, tmp_path).run(source, results)
+    with open(tmp_path / "checkpoint.json", encoding="utf-8") as file:
+        checkpoint = json.load(file)
+    assert checkpoint["watermark"] == 5
+    assert checkpoint["stats"]["succeeded"] == 5
+
+    resumed = executor(lambda interaction, row: row["id"], tmp_path)
+    stats = resumed.run(source, results)
+    assert resumed.skipped == 5
+    assert stats["succeeded"] == 10
+    # 吞吐量只按本次运行完成的行计算
+    assert stats["rows_per_second"] * stats["elapsed"] == pytest.approx(5)
+    assert sorted(record["row"] for record in read_results(results)) == list(range(10))
+
+
+def test_resume_skips_rows_done_above_watermark(tmp_path):
+    source = write_rows(tmp_path / "rows.jsonl", 6)
+    results = tmp_path / "results.jsonl"
+    results.write_text("", encoding="utf-8")
+    with open(tmp_path / "checkpoint.json", "w", encoding="utf-8") as file:
+        json.dump({"version": 1, "source": os.path.abspath(source), "watermark": 2, "done_above": [3, 4],
+                   "stats": {"succeeded": 4, "failed": 0, "retried": 1}}, file)
+
+    seen = []
+    resumed = executor(lambda interaction, row: seen.append(row["id"]), tmp_path)
+    stats = resumed.run(source, str(results))
+    assert seen == [2, 5]
+    assert (resumed.skipped, stats["succeeded"], stats["retried"]) == (4, 6, 1)
+    with open(tmp_path / "checkpoint.json", encoding="utf-8") as file:
+        checkpoint = json.load(file)
+    assert (checkpoint["watermark"], checkpoint["done_above"]) == (6, [])
+
+
+def test_checkpoint_of_other_source_is_rejected(tmp_path):
+    source = write_rows(tmp_path / "rows.jsonl", 1)
+    with open(tmp_path / "checkpoint.json", "w", encoding="utf-8") as file:
+        json.dump({"version": 1, "source": "/elsewhere.jsonl", "watermark": 0}, file)
+    with pytest.raises(Error):
+        executor(lambda interaction, row: None, tmp_path).run(source, str(tmp_path / "results.jsonl"))
+
+
+def test_crashed_page_is_replaced(tmp_path):
+    source = write_rows(tmp_path / "rows.jsonl", 5)
+    results = str(tmp_path / "results.jsonl")
+    pages = []
+
+    def task(interaction, row):
+        pages.append(interaction._obj)
+        if row["id"] == 2 and len(set(pages)) == 1:
+            interaction._obj.crash()
+            raise Error("Target crashed")
+        return row["id"]
+
+    bulk = executor(task, tmp_path)
+    stats = bulk.run(source, results)
+    assert bulk.replaced_pages == 1
+    assert stats["succeeded"] == 5 and stats["failed"] == 0
+    assert pages[0] is not pages[-1]
+    assert all(page.closed for page in pages)
+
+
+def test_worker_retires_when_page_cannot_be_replaced(tmp_path):
+    source = write_rows(tmp_path / "rows.jsonl", 5)
+    results = str(tmp_path / "results.jsonl")
+
+    def task(interaction, row):
+        if row["id"] == 2:
+            interaction._obj.context.closed = True
+            interaction._obj.crash()
+            raise Error("Target crashed")
+        return row["id"]
+
+    bulk = executor(task, tmp_path)
+    stats = bulk.run(source, results)
+    assert stats["succeeded"] == 2 and stats["failed"] == 0
+    with open(tmp_path / "checkpoint.json", encoding="utf-8") as file:
+        assert json.load(file)["watermark"] == 2
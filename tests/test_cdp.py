@@ -0,0 +1,39 @@
+import pytest
+
+from Browser._api_types import Error
+
+FORM = """
+<input id="name">
+<select id="city"><option>上海</option></select>
+<input id="disabled" disabled>
+<input id="agree" type="checkbox">
+<div id="plain">text</div>
+"""
+
+
+@pytest.fixture
+def fast(pm):
+    pm._page.set_content(FORM)
+    pm.enable_cdp_fast_path()
+    yield pm
+    pm.disable_cdp_fast_path()
+
+
+def test_fill_uses_cdp_for_text_input(fast):
+    fast.interaction.fill("#name", "张三", force=True)
+    assert fast._page.input_value("#name") == "张三"
+    assert fast._fast_path().commands > 0
+
+
+@pytest.mark.parametrize("selector", ["#city", "#disabled", "#agree", "#plain"])
+def test_fill_does_not_type_into_previously_focused_element(fast, selector):
+    fast._page.focus("#name")
+    assert not fast._fast_path().fill(selector, "value")
+    assert fast._page.input_value("#name") == ""
+
+
+def test_fill_on_select_falls_back_to_regular_fill(fast):
+    fast._page.focus("#name")
+    with pytest.raises(Error):
+        fast.interaction.fill("#city", "value", force=True, timeout=1000)
+    assert fast._page.input_value("#name") == ""
@@ -0,0 +1,87 @@
+import time
+
+import pytest
+
+from Browser._api_types import TimeoutError
+from Browser._deadline import Deadline
+from Browser._interaction import Interaction
+
+
+class Element:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.timeouts = []
+
+    def fill(self, value, force=None, no_wait_after=None, timeout=None):
+        self.timeouts.append(timeout)
+        time.sleep(self.delay)
+
+
+class Page:
+    """Interaction 根据类名判断交互对象的类型。"""
+
+    def __init__(self, element):
+        self.element = element
+        self.waits = []
+
+    def query_selector_all(self, selector):
+        return [self.element]
+
+    def wait_for_timeout(self, timeout):
+        self.waits.append(timeout)
+
+
+def test_clamp_limits_timeout_to_remaining():
+    deadline = Deadline(1000)
+    assert deadline.clamp(500) == 500
+    assert 900 < deadline.clamp(5000) <= 1000
+    assert 900 < deadline.clamp(None) <= 1000
+    assert 900 < deadline.clamp(0) <= 1000
+
+
+def test_clamp_raises_when_expired():
+    deadline = Deadline(0)
+    assert deadline.expired
+    with pytest.raises(TimeoutError):
+        deadline.clamp(1000, "fill")
+
+
+def test_nested_deadlines_use_the_earlier():
+    with Deadline(10000):
+        with Deadline(100) as inner:
+            assert Deadline.current() is inner
+            with Deadline(5000):
+                assert Deadline.current() is inner
+        assert Deadline.current().timeout == 10000
+    assert Deadline.current() is None
+
+
+def test_steps_share_one_budget():
+    element = Element(delay=0.05)
+    interaction = Interaction(Page(element)).within(1000)
+    interaction.fill("#name", "value")
+    first, second = element.timeouts
+    assert first <= 1000
+    assert second <= first - 40
+
+
+def test_fill_fails_at_deadline_between_steps():
+    element = Element(delay=0.08)
+    interaction = Interaction(Page(element)).within(50)
+    with pytest.raises(TimeoutError):
+        interaction.fill("#name", "value")
+    assert len(element.timeouts) == 1
+
+
+def test_expired_deadline_fails_before_driver_call():
+    page = Page(Element())
+    with Deadline(0):
+        with pytest.raises(TimeoutError):
+            Interaction(page).wait_for_timeout(10)
+    assert page.waits == []
+
+
+def test_without_deadline_timeout_is_unchanged():
+    element = Element()
+    Interaction(Page(element)).fill("#name", "value", timeout=1234)
+    assert element.timeouts == [1234, 1234]
@@ -0,0 +1,46 @@
+from Browser._density import DENSITY, LaunchProfile, apply_context_profile
+from Browser.data_types import SupportedBrowsers
+
+
+def test_without_profile_options_are_unchanged():
+    options = {"viewport": None, "user_agent": "agent"}
+    assert apply_context_profile(options, None) is options
+
+
+def test_profile_fills_unset_options():
+    merged = apply_context_profile({"viewport": None, "no_viewport": None, "user_agent": "agent"}, DENSITY)
+    assert merged == {
+        "viewport": {"width": 800, "height": 600},
+        "no_viewport": False,
+        "device_scale_factor": 1,
+        "reduced_motion": "reduce",
+        "service_workers": "block",
+        "user_agent": "agent",
+    }
+
+
+def test_explicit_options_win():
+    options = {"viewport": {"width": 1920, "height": 1080}, "no_viewport": True}
+    merged = apply_context_profile(options, DENSITY)
+    assert merged["viewport"] == {"width": 1920, "height": 1080}
+    assert merged["no_viewport"] is True
+    assert options == {"viewport": {"width": 1920, "height": 1080}, "no_viewport": True}
+
+
+def test_disabled_settings_are_not_applied():
+    profile = LaunchProfile(reduced_motion=False, block_service_workers=False)
+    merged = apply_context_profile({}, profile)
+    assert "reduced_motion" not in merged and "service_workers" not in merged
+
+
+def test_launch_args():
+    profile = LaunchProfile(background_throttling=False, renderer_process_limit=4, js_heap_size=256,
+                            extra_args=["--lang=zh-CN"])
+    args = profile.launch_args(SupportedBrowsers.chromium)
+    assert "--disable-gpu" in args
+    assert "--disable-renderer-backgrounding" in args
+    assert "--renderer-process-limit=4" in args
+    assert "--js-flags=--max-old-space-size=256" in args
+    assert args[-1] == "--lang=zh-CN"
+    assert profile.launch_args(SupportedBrowsers.firefox) == ["--lang=zh-CN"]
+    assert profile.launch_options(SupportedBrowsers.firefox)["firefox_user_prefs"]["dom.ipc.processCount"] == 4
@@ -0,0 +1,55 @@
+from Browser._fanout import EngineResult, FanOutReport
+from Browser.data_types import SupportedBrowsers
+
+
+def report(**outcomes):
+    """outcomes: 浏览器名 => 返回值，或 Exception 表示失败。"""
+    results = {}
+    for name, value in outcomes.items():
+        result = EngineResult(SupportedBrowsers[name])
+        if isinstance(value, Exception):
+            result.error = f"{type(value).__name__}: {value}"
+        else:
+            result.ok = True
+            result.result = value
+        result.launch_time = 100
+        result.elapsed = 50
+        results[result.browser] = result
+    return FanOutReport(results, wall_time=200)
+
+
+def test_no_divergence_when_results_agree():
+    assert report(chromium={"a": 1}, firefox={"a": 1}, webkit={"a": 1}).divergent() == {}
+
+
+def test_minority_result_is_divergent():
+    divergent = report(chromium=[1, 2], firefox=[1, 2], webkit=[2, 1]).divergent()
+    assert list(divergent) == [SupportedBrowsers.webkit]
+
+
+def test_key_order_does_not_matter():
+    assert report(chromium={"a": 1, "b": 2}, firefox={"b": 2, "a": 1}).divergent() == {}
+
+
+def test_without_majority_first_success_is_expected():
+    divergent = report(chromium="a", firefox="b", webkit="c").divergent()
+    assert list(divergent) == [SupportedBrowsers.firefox, SupportedBrowsers.webkit]
+
+
+def test_failures_are_not_divergent():
+    outcome = report(chromium="a", firefox=RuntimeError("crash"), webkit="a")
+    assert outcome.divergent() == {}
+    assert not outcome.ok
+    assert list(outcome.failures) == [SupportedBrowsers.firefox]
+
+
+def test_all_failed():
+    assert report(chromium=RuntimeError("x"), firefox=RuntimeError("y")).divergent() == {}
+
+
+def test_table_and_summary():
+    outcome = report(chromium="a", firefox="a", webkit="b")
+    assert outcome.sequential_time == 450
+    lines = outcome.table().splitlines()
+    assert "divergent" in lines[3]
+    assert outcome.as_dict()["divergent"] == ["webkit"]
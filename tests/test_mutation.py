@@ -0,0 +1,100 @@
+from Browser._mutation import ChangeFeed
+
+
+class Page:
+    """只记录调用的页面替身，变更由测试直接通过 `_on_message` 推送。"""
+
+    def __init__(self):
+        self.frames = []
+
+    def expose_binding(self, name, callback):
+        self.binding = callback
+
+    def add_init_script(self, script):
+        ...
+
+    def evaluate(self, expression, *args):
+        ...
+
+
+def push(feed, selectors=(), scoped=True):
+    feed._on_message({"frame": None}, {"url": "about:blank", "batch": {
+        "added": 1, "selectors": list(selectors), "scoped": scoped,
+    }})
+
+
+def test_batches_outside_root_still_invalidate_memo():
+    feed = ChangeFeed(Page(), root="#panel").start()
+    values = iter(["a", "b"])
+    read = lambda: feed.memoize(None, "inner_text", "#outside", (), lambda: next(values))  # noqa: E731
+    assert read() == "a"
+    assert read() == "a"
+
+    received = []
+    feed.subscribe(received.append)
+    push(feed, scoped=False)
+    assert read() == "b"
+    assert received == []
+    assert len(feed.batches) == 0
+
+
+def test_scoped_batches_are_recorded_and_notified():
+    feed = ChangeFeed(Page(), root="#panel").start()
+    received = []
+    feed.subscribe(received.append)
+    push(feed)
+    assert [batch["generation"] for batch in received] == [1]
+    assert len(feed.batches) == 1
+
+
+def test_watched_selector_only_invalidated_by_its_subtree():
+    feed = ChangeFeed(Page(), selectors=["#list"]).start()
+    values = iter([1, 2])
+    read = lambda: feed.memoize(None, "inner_text", "#list", (), lambda: next(values))  # noqa: E731
+    assert read() == 1
+    push(feed, selectors=[])
+    assert read() == 1
+    push(feed, selectors=["#list"])
+    assert read() == 2
+
+
+def test_configure_keeps_existing_subscription_settings():
+    feed = ChangeFeed(Page(), root="#panel", interval=50).start()
+    feed.configure(interval=200)
+    assert feed._config()["root"] == "#panel"
+    assert feed._config()["interval"] == 200
+    feed.configure(root="#main")
+    assert feed._config()["root"] == "#main"
+
+
+def test_hello_after_stop_does_not_restart_observer():
+    feed = ChangeFeed(Page()).start()
+    assert feed._on_message({}, {"type": "hello"}) is not None
+    feed.stop()
+    assert feed._on_message({}, {"type": "hello"}) is None
+
+
+def test_memo_with_root_sees_changes_outside_root(pm):
+    pm._page.set_content('<div id="panel">p</div><div id="outside">a</div>')
+    received = []
+    pm.observe_changes(root="#panel", callback=received.append)
+    assert pm.interaction.inner_text("#outside") == "a"
+    pm._page.evaluate("document.getElementById('outside').textContent = 'b'")
+    assert pm.interaction.inner_text("#outside") == "b"
+    assert received == []
+
+    pm._page.evaluate("document.getElementById('panel').textContent = 'q'")
+    assert pm.interaction.inner_text("#panel") == "q"
+    assert len(received) == 1
+    pm.stop_observing_changes()
+
+
+def test_repeated_observe_changes_applies_new_root(pm):
+    pm._page.set_content('<div id="panel">p</div><div id="outside">a</div>')
+    received = []
+    pm.observe_changes(root="#panel", callback=received.append)
+    pm.observe_changes(root="#outside")
+    pm._page.evaluate("document.getElementById('outside').textContent = 'b'")
+    assert pm.interaction.inner_text("#outside") == "b"
+    assert len(received) == 1
+    pm.stop_observing_changes()
@@ -0,0 +1,163 @@
+import re
+
+import pytest
+
+from Browser._api_types import Error, TimeoutError
+from Browser._interaction import Interaction
+from Browser._plan import Plan, PlanPlayer, PlanRecorder
+from Browser._timeouts import AdaptiveTimeouts
+
+
+class Element:
+    def __init__(self, page, selector):
+        self.page = page
+        self.selector = selector
+
+    def fill(self, value, force=None, no_wait_after=None, timeout=None):
+        if self.selector in self.page.missing:
+            raise TimeoutError(f"等待 {self.selector} 超时")
+        self.page.values[self.selector] = value
+
+
+class Page:
+    url = "https://example.com/form"
+
+    def __init__(self, missing=()):
+        self.missing = set(missing)
+        self.values = {}
+        self.waits = []
+        self.batches = []
+
+    def query_selector_all(self, selector):
+        return [Element(self, selector)]
+
+    def wait_for_timeout(self, timeout):
+        self.waits.append(timeout)
+
+    def evaluate(self, script, items):
+        self.batches.append([item["selector"]["value"] for item in items])
+        for item in items:
+            self.values[item["selector"]["value"]] = item["value"]
+        return len(items)
+
+
+class Manager:
+    def __init__(self, page):
+        self._interaction = page
+
+    @property
+    def interaction(self):
+        return Interaction(self._interaction)
+
+
+def record(page, actions, middlewares=()):
+    recorder = PlanRecorder()
+    interaction = Interaction(page, middlewares=list(middlewares) + [recorder])
+    actions(interaction)
+    return recorder.plan
+
+
+def fill_form(interaction):
+    interaction.fill("#name", "张三")
+    try:
+        interaction.fill("#popup", "x")
+    except TimeoutError:
+        ...
+    interaction.wait_for_timeout(500)
+    interaction.fill("#city", "上海")
+
+
+def test_records_steps_and_failures():
+    plan = record(Page(missing=["#popup"]), fill_form)
+    assert [step["method"] for step in plan.steps] == ["fill", "fill", "wait_for_timeout", "fill"]
+    assert plan.steps[0]["arguments"] == {"selector": "#name", "value": "张三"}
+    assert plan.steps[1]["error"].startswith("TimeoutError")
+    assert all(step["url"] == Page.url for step in plan.steps)
+    assert plan.recorded_time >= plan.steps[-1]["started"]
+
+
+def test_records_caller_arguments_not_middleware_changes():
+    timeouts = AdaptiveTimeouts(min_samples=1, floor=0, ceiling=60000)
+    plan = record(Page(), lambda interaction: [interaction.fill("#name", "a") for _ in range(2)], [timeouts])
+    assert all("timeout" not in step["arguments"] for step in plan.steps)
+
+
+def test_retried_call_keeps_only_last_attempt():
+    page = Page(missing=["#name"])
+
+    def retry_once(call, proceed):
+        try:
+            return proceed()
+        except TimeoutError:
+            page.missing.clear()
+            return proceed()
+
+    plan = record(page, lambda interaction: interaction.fill("#name", "a"), [retry_once])
+    assert len(plan.steps) == 1
+    assert "error" not in plan.steps[0]
+
+
+def test_save_and_load(tmp_path):
+    plan = record(Page(), lambda interaction: interaction.fill("#name", "a"))
+    plan.steps.append({"method": "wait_for_url", "arguments": {"url": {"$regex": "done$", "flags": re.I}},
+                       "frame": None, "url": "", "started": 0, "elapsed": 0})
+    path = str(tmp_path / "plan.json")
+    plan.save(path)
+    loaded = Plan.load(path)
+    assert loaded.steps == plan.steps
+
+
+def test_load_rejects_other_versions(tmp_path):
+    path = tmp_path / "plan.json"
+    path.write_text('{"version": 0, "steps": []}', encoding="utf-8")
+    with pytest.raises(Error):
+        Plan.load(str(path))
+
+
+def test_replay_tolerates_steps_that_failed_when_recorded():
+    plan = record(Page(missing=["#popup"]), fill_form)
+    page = Page(missing=["#popup"])
+    report = PlanPlayer(Manager(page), replace_sleeps=False).run(plan)
+    assert list(report["errors"]) == [1]
+    assert page.values == {"#name": "张三", "#city": "上海"}
+    assert page.waits == [500]
+
+
+def test_replay_runs_failed_steps_that_now_succeed():
+    plan = record(Page(missing=["#popup"]), fill_form)
+    page = Page()
+    report = PlanPlayer(Manager(page), replace_sleeps=False).run(plan)
+    assert report["errors"] == {}
+    assert page.values["#popup"] == "x"
+
+
+def test_replay_skip_failed():
+    plan = record(Page(missing=["#popup"]), fill_form)
+    page = Page()
+    report = PlanPlayer(Manager(page), replace_sleeps=False, skip_failed=True).run(plan)
+    assert report["skipped"] == [1]
+    assert "#popup" not in page.values
+
+
+def test_batched_fills_exclude_failed_steps():
+    def actions(interaction):
+        interaction.fill("#name", "a")
+        interaction.fill("#city", "b")
+        try:
+            interaction.fill("#popup", "c")
+        except TimeoutError:
+            ...
+
+    plan = record(Page(missing=["#popup"]), actions)
+    page = Page(missing=["#popup"])
+    report = PlanPlayer(Manager(page)).run(plan)
+    assert page.batches == [["#name", "#city"]]
+    assert report["batched"] == 2
+    assert list(report["errors"]) == [2]
+
+
+def test_replay_rejects_opaque_arguments():
+    plan = Plan([{"method": "evaluate", "arguments": {"expression": {"$opaque": "<function>"}},
+                  "frame": None, "url": "", "started": 0, "elapsed": 0}])
+    with pytest.raises(Error):
+        PlanPlayer(Manager(Page())).run(plan)
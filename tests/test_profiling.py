@@ -0,0 +1,129 @@
+import json
+import os
+
+import pytest
+
+from Browser._api_types import Error, TimeoutError
+from Browser._interaction import Interaction
+from Browser._middleware import InteractionCall
+from Browser._profiling import StepProfiler
+
+
+class Tracing:
+    def __init__(self):
+        self.closed = False
+        self.calls = []
+
+    def _record(self, name):
+        if self.closed:
+            raise Error("Target page, context or browser has been closed")
+        self.calls.append(name)
+
+    def start(self, **options):
+        self._record("start")
+
+    def start_chunk(self):
+        self._record("start_chunk")
+
+    def stop_chunk(self, path=None):
+        self._record("stop_chunk")
+        if path is not None:
+            with open(path, "wb") as file:
+                file.write(b"trace")
+
+    def stop(self):
+        self._record("stop")
+
+
+class Context:
+    browser = None
+
+    def __init__(self):
+        self.tracing = Tracing()
+
+
+class Page:
+    url = "about:blank"
+
+    def __init__(self, context):
+        self.context = context
+
+
+class Manager:
+    _context = None
+
+    def __init__(self, page):
+        self._page = page
+
+
+def step(page, method="click"):
+    return InteractionCall(Interaction(page), method, {"selector": "#submit"}, True)
+
+
+def fail():
+    raise ValueError("失败")
+
+
+def test_page_switch_after_context_closed(tmp_path):
+    first = Page(Context())
+    manager = Manager(first)
+    profiler = StepProfiler(manager, str(tmp_path)).start()
+    profiler(step(first), lambda: None)
+    assert first.context.tracing.calls == ["start"]
+
+    first.context.tracing.closed = True
+    second = Page(Context())
+    manager._page = second
+    assert profiler(step(second), lambda: "ok") == "ok"
+
+    # 重置之后在新页面的上下文中重新开始录制，失败的步骤仍然可以保留
+    with pytest.raises(ValueError):
+        profiler(step(second), fail)
+    assert second.context.tracing.calls[0] == "start"
+    entry = profiler.retained[-1]
+    assert os.path.exists(entry["files"]["playwright_trace"])
+    with open(os.path.join(str(tmp_path), "steps.jsonl"), encoding="utf-8") as file:
+        assert json.loads(file.readline())["error"] == "ValueError: 失败"
+
+
+def test_stop_after_context_closed(tmp_path):
+    page = Page(Context())
+    profiler = StepProfiler(Manager(page), str(tmp_path)).start()
+    profiler(step(page), lambda: None)
+    page.context.tracing.closed = True
+    profiler.stop()
+    calls = list(page.context.tracing.calls)
+    page.context.tracing.closed = False
+    profiler(step(page), lambda: None)
+    assert page.context.tracing.calls == calls
+
+
+def test_retain_failure_does_not_break_step(tmp_path):
+    page = Page(Context())
+    profiler = StepProfiler(Manager(page), str(tmp_path)).start()
+    profiler(step(page), lambda: None)
+    page.context.tracing.closed = True
+    with pytest.raises(ValueError):
+        profiler(step(page), fail)
+    assert profiler.retained == []
+    page.context.tracing.closed = False
+    profiler(step(page), lambda: None)
+    assert page.context.tracing.calls[-1] == "start"
+
+
+def test_profiler_survives_page_switch(pm, tmp_path):
+    pm._page.set_content('<p id="text">a</p>')
+    profiler = pm.start_profiling(str(tmp_path))
+    assert pm.interaction.inner_text("#text") == "a"
+
+    old_context = pm._context
+    pm.new_context()
+    pm.new_page()
+    old_context.close()
+    pm._page.set_content('<p id="text">b</p>')
+    assert pm.interaction.inner_text("#text") == "b"
+    with pytest.raises(TimeoutError):
+        pm.interaction.wait_for_selector("#missing", timeout=200)
+    assert profiler.retained
+    assert os.path.exists(profiler.retained[-1]["files"]["playwright_trace"])
+    pm.stop_profiling()
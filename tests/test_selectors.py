@@ -0,0 +1,43 @@
+import pytest
+
+from Browser._selectors import SelectorStats, lint_selector
+
+
+@pytest.mark.parametrize("selector", [
+    "#submit",
+    "form .field > input[name='email']",
+    "[class*=button]",
+    "xpath=//form[@id='login']/input",
+    "iframe:has(.editor) >>> #body",
+])
+def test_cheap_selectors(selector):
+    assert lint_selector(selector) == []
+
+
+@pytest.mark.parametrize("selector, reason", [
+    ("text=登录", "文本"),
+    ("button:has-text('登录')", "文本"),
+    ('"登录"', "文本"),
+    ("div:right-of(#name)", "布局"),
+    ("li:has(.selected)", ":has()"),
+    ("//*[@id='name']", "XPath"),
+    ("//button[contains(text(), '登录')]", "XPath"),
+    ("#list > *", "通配符"),
+    ("button >> visible=true", "visible=true"),
+    ("#frame >>> text=登录", "文本"),
+])
+def test_costly_selectors(selector, reason):
+    reasons = lint_selector(selector)
+    assert any(reason in item for item in reasons), reasons
+
+
+def test_stats_report_reasons_and_suggestion():
+    stats = SelectorStats("text=登录")
+    stats.uses = 4
+    stats.samples = [10, 30]
+    stats.suggestion = "#login"
+    report = stats.as_dict(slow_threshold=50)
+    assert report["mean"] == 20 and report["max"] == 30 and report["estimated_total"] == 80
+    assert not report["slow"]
+    assert report["reasons"] and report["suggestion"] == "#login"
+    assert SelectorStats("#login").as_dict(slow_threshold=50)["suggestion"] is None
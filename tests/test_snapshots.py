@@ -0,0 +1,88 @@
+import io
+import os
+import struct
+import zlib
+
+import pytest
+
+from Browser._snapshots import CapturePipeline, _difference_hash
+
+
+def png(width, height, pixel):
+    """生成灰度 PNG。`pixel(x, y)` 返回 0-255 的灰度值。"""
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xffffffff)
+
+    rows = b"".join(b"\x00" + bytes(pixel(x, y) for x in range(width)) for y in range(height))
+    return (b"\x89PNG\r\n\x1a\n"
+            + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 0, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(rows))
+            + chunk(b"IEND", b""))
+
+
+def gradient(x, y):
+    return (x * 4 + y * 2) % 256
+
+
+def with_dot(x, y):
+    return 0 if (x, y) == (10, 10) else gradient(x, y)
+
+
+class Page:
+    def __init__(self, frames):
+        self.frames = list(frames)
+
+    def screenshot(self, **options):
+        return self.frames.pop(0)
+
+
+def capture(pipeline, frames):
+    page = Page(frames)
+    results = [pipeline.screenshot(page) for _ in range(len(page.frames))]
+    assert pipeline.flush(5000)
+    pipeline.close()
+    return results
+
+
+def test_identical_frames_are_kept_by_default(tmp_path):
+    frame = png(64, 64, gradient)
+    pipeline = CapturePipeline(str(tmp_path), workers=1)
+    results = capture(pipeline, [frame, frame])
+    assert [result.skipped for result in results] == [False, False]
+    assert all(os.path.exists(result.path) for result in results)
+
+
+def test_exact_dedupe_keeps_small_changes(tmp_path):
+    frame = png(64, 64, gradient)
+    changed = png(64, 64, with_dot)
+    pipeline = CapturePipeline(str(tmp_path), workers=1, dedupe=True)
+    results = capture(pipeline, [frame, frame, changed])
+    assert [result.skipped for result in results] == [False, True, False]
+    assert pipeline.skipped == 1
+
+
+def test_streams_are_compared_separately(tmp_path):
+    frame = png(16, 16, gradient)
+    pipeline = CapturePipeline(str(tmp_path), workers=1, dedupe=True)
+    first = pipeline.screenshot(Page([frame]), stream="a")
+    second = pipeline.screenshot(Page([frame]), stream="b")
+    third = pipeline.screenshot(Page([frame]), stream="a")
+    assert pipeline.flush(5000)
+    pipeline.close()
+    assert [first.skipped, second.skipped, third.skipped] == [False, False, True]
+
+
+def test_difference_hash_has_256_bits():
+    Image = pytest.importorskip("PIL.Image")
+    image = Image.open(io.BytesIO(png(64, 64, gradient)))
+    assert _difference_hash(image).bit_length() <= 256
+    assert _difference_hash(image) == _difference_hash(image.copy())
+
+
+def test_distance_skips_near_identical_frames(tmp_path):
+    pytest.importorskip("PIL")
+    frame = png(64, 64, gradient)
+    changed = png(64, 64, with_dot)
+    pipeline = CapturePipeline(str(tmp_path), workers=1, dedupe=True, dedupe_distance=8)
+    results = capture(pipeline, [frame, changed])
+    assert [result.skipped for result in results] == [False, True]
@@ -0,0 +1,119 @@
+import pytest
+
+from Browser._api_types import TimeoutError
+from Browser._interaction import Interaction
+from Browser._middleware import InteractionCall
+from Browser._timeouts import AdaptiveTimeouts, url_pattern
+
+
+class Element:
+    def __init__(self):
+        self.timeouts = []
+        self.error = None
+
+    def fill(self, value, force=None, no_wait_after=None, timeout=None):
+        if self.error is not None:
+            raise self.error
+        self.timeouts.append(timeout)
+
+
+class Page:
+    url = "https://example.com/orders/123/edit?tab=1"
+
+    def __init__(self):
+        self.element = Element()
+
+    def query_selector_all(self, selector):
+        return [self.element]
+
+
+def call_for(method, **arguments):
+    return InteractionCall(Interaction(Page()), method, arguments, True)
+
+
+def test_url_pattern():
+    assert url_pattern("https://example.com/orders/123/edit?tab=1#top") == "https://example.com/orders/{n}/edit"
+    assert url_pattern("https://example.com/u/0123456789abcdef") == "https://example.com/u/{id}"
+    assert url_pattern("") == ""
+
+
+def test_no_timeout_before_min_samples():
+    timeouts = AdaptiveTimeouts(min_samples=5, floor=0)
+    key = ("click", "#submit", "")
+    for _ in range(4):
+        timeouts.record(key, 100)
+    assert timeouts.timeout_for(key) is None
+    timeouts.record(key, 100)
+    assert timeouts.timeout_for(key) == 300
+
+
+def test_timeout_is_clamped_to_floor_and_ceiling():
+    timeouts = AdaptiveTimeouts(min_samples=1, floor=1000, ceiling=2000)
+    timeouts.record(("fill", "#a", ""), 10)
+    timeouts.record(("fill", "#b", ""), 5000)
+    assert timeouts.timeout_for(("fill", "#a", "")) == 1000
+    assert timeouts.timeout_for(("fill", "#b", "")) == 2000
+
+
+def test_navigation_uses_navigation_bounds():
+    timeouts = AdaptiveTimeouts(min_samples=1, navigation_floor=5000, navigation_ceiling=8000)
+    timeouts.record(("goto", "https://example.com/", ""), 10)
+    assert timeouts.timeout_for(("goto", "https://example.com/", ""), navigation=True) == 5000
+
+
+def test_middleware_learns_and_injects_timeout():
+    timeouts = AdaptiveTimeouts(min_samples=3, floor=0, ceiling=60000)
+    page = Page()
+    interaction = Interaction(page, middlewares=[timeouts])
+    for _ in range(3):
+        interaction.fill("#name", "value")
+    # 样本足够之前使用默认超时
+    assert page.element.timeouts[:6] == [None] * 6
+    interaction.fill("#name", "value")
+    learned = page.element.timeouts[-1]
+    assert learned is not None and learned >= 0
+    interaction.fill("#name", "value", timeout=1234)
+    assert page.element.timeouts[-1] == 1234
+
+
+def test_failed_calls_are_not_recorded():
+    timeouts = AdaptiveTimeouts(min_samples=1)
+    page = Page()
+    page.element.error = TimeoutError("超时")
+    interaction = Interaction(page, middlewares=[timeouts])
+    with pytest.raises(TimeoutError):
+        interaction.fill("#name", "value")
+    assert timeouts.stats() == {}
+
+
+def test_key_uses_url_pattern():
+    method, selector, url = AdaptiveTimeouts.key_for(call_for("fill", selector="#name", value="x"))
+    assert (method, selector, url) == ("fill", "#name", "https://example.com/orders/{n}/edit")
+
+
+def test_selector_sets_are_keyed_separately():
+    first = AdaptiveTimeouts.key_for(call_for("wait_for_any", selectors=["#ok", "#error"]))
+    second = AdaptiveTimeouts.key_for(call_for("wait_for_any", selectors=["#done"]))
+    assert first != second
+    assert first[1] == '["#ok", "#error"]'
+    assert AdaptiveTimeouts.key_for(call_for("wait_for_any", selectors=["#ok", "#error"])) == first
+
+
+def test_save_and_load(tmp_path):
+    path = str(tmp_path / "timeouts.json")
+    timeouts = AdaptiveTimeouts(path, min_samples=2, floor=0)
+    key = ("click", "#submit", "https://example.com/")
+    timeouts.record(key, 100)
+    timeouts.record(key, 200)
+    timeouts.save()
+    loaded = AdaptiveTimeouts(path, min_samples=2, floor=0)
+    assert loaded.timeout_for(key) == timeouts.timeout_for(key) == 600
+
+
+def test_autosave(tmp_path):
+    path = tmp_path / "timeouts.json"
+    timeouts = AdaptiveTimeouts(str(path), autosave_every=2)
+    timeouts.record(("click", "#a", ""), 10)
+    assert not path.exists()
+    timeouts.record(("click", "#a", ""), 10)
+    assert path.exists()